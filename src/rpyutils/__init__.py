@@ -1,6 +1,29 @@
 __version__ = "0.1.4"
 
-from . import r_utils
-from .map_with_pbar import map_tqdm
+import importlib
 
-__all__ = ["map_tqdm", "r_utils"]
+# Public attributes and the submodule that defines them. They are imported on first
+# access (PEP 562) so `import rpyutils` does not pay for tqdm, multiprocessing, etc.
+_lazy_attributes = {
+    "map_json_lines": "map_with_pbar",
+    "map_tqdm": "map_with_pbar",
+    "r_utils": None,
+}
+
+__all__ = ["map_json_lines", "map_tqdm", "r_utils"]
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name = _lazy_attributes[name]
+    if module_name is None:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
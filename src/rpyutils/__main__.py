@@ -6,7 +6,7 @@ from . import app
 
 
 def main():
-    app.run(sys.argv)
+    sys.exit(app.run(sys.argv))
 
 
 if __name__ == "__main__":
@@ -1,34 +1,411 @@
 """This file defines the entry point of the commandline app.
 
-This file provides the app function which shows a sample output of the program at its current state.
+This file provides the app function which shows a sample output of the program at its current state,
+the `rpyutils jsonl` subcommands that stream json lines files from shell pipelines
+and the `rpyutils bench` subcommand that checks for performance regressions.
 """
 
+import argparse
+import os
+import sys
 from typing import List, Union
 
 from . import ex_prettifier as prettifier
 
 
-def run(argv: Union[List, None] = None) -> None:
+def print_demo() -> None:
+    """Show examples of key value and json pretty printing."""
+    print("An example of key value pretty printing is shown below.")
+    sample_mapping = {
+        "string": "This is a sample string",
+        "false boolean": False,
+        "true boolean": True,
+        "integer": 12345,
+        "float": 12.34,
+    }
+    prettifier.pretty_key_value(sample_mapping)
+    print("\nAn example of json pretty printing by rich library.")
+    prettifier.pretty_json(sample_mapping)
+
+
+def _write_lines(lines, out_path: str) -> None:
+    from .r_utils import open_file
+
+    with open_file(out_path, "w") as f:
+        f.writelines(lines)
+
+
+def _jsonl_count(args) -> None:
+    from .jsonl_ops import count_lines
+
+    counts = [count_lines(path, workers=args.jobs) for path in args.files]
+    for path, count in zip(args.files, counts):
+        print(f"{count}\t{path}" if len(args.files) > 1 else count)
+    if len(args.files) > 1:
+        print(f"{sum(counts)}\ttotal")
+
+
+def _jsonl_head(args) -> None:
+    from .jsonl_ops import head_lines
+
+    _write_lines(head_lines(args.file, args.n), args.output)
+
+
+def _jsonl_tail(args) -> None:
+    from .jsonl_ops import tail_lines
+
+    _write_lines(tail_lines(args.file, args.n), args.output)
+
+
+def _jsonl_follow(args) -> None:
+    import json
+
+    from .r_utils import follow_json_lines
+
+    offset = 0 if args.from_start else None
+    records = follow_json_lines(args.file, offset=offset, max_interval=args.interval)
+    try:
+        for record in records:
+            print(json.dumps(record), flush=True)
+    except KeyboardInterrupt:
+        # Following stops with Ctrl-C.
+        pass
+
+
+def _jsonl_sample(args) -> None:
+    import json
+
+    from .jsonl_ops import sample_json_lines, sample_lines
+
+    if args.key is None and args.weight is None:
+        lines = sample_lines(args.file, args.k, seed=args.seed, workers=args.jobs)
+    else:
+        records = sample_json_lines(
+            args.file,
+            args.k,
+            seed=args.seed,
+            key=args.key,
+            weight=args.weight,
+            workers=args.jobs,
+        )
+        lines = [json.dumps(r) + "\n" for r in records]
+    _write_lines(lines, args.output)
+
+
+def _jsonl_split(args) -> None:
+    from .jsonl_ops import split_lines
+
+    out_paths = split_lines(args.file, args.output, lines=args.lines, parts=args.parts)
+    for path in out_paths:
+        print(path)
+
+
+def _jsonl_cat(args) -> None:
+    from .jsonl_ops import cat_lines
+
+    _write_lines(cat_lines(args.files), args.output)
+
+
+def _jsonl_sort(args) -> None:
+    from .jsonl_ops import sort_json_lines
+
+    fields = [f for field in args.key for f in field.split(",") if f]
+    sort_json_lines(
+        args.file,
+        args.output,
+        key=fields[0] if len(fields) == 1 else fields,
+        reverse=args.reverse,
+        unique=args.unique,
+        max_memory=args.memory << 20,
+        workers=args.jobs,
+        tmp_dir=args.tmp_dir,
+    )
+
+
+def _jsonl_partition(args) -> None:
+    from .jsonl_ops import partition_json_lines
+
+    fields = [f for field in args.key for f in field.split(",") if f]
+    manifest = partition_json_lines(
+        args.files,
+        fields[0] if len(fields) == 1 else fields,
+        args.buckets,
+        args.output,
+        workers=args.jobs,
+        suffix=args.suffix,
+    )
+    print(f"{manifest['records']} records in {args.buckets} buckets in {args.output}")
+
+
+def _jsonl_from_json(args) -> None:
+    from .json_stream import json_to_json_lines
+
+    json_to_json_lines(args.file, args.output, prefix=args.prefix)
+
+
+def _map_records(func, args) -> None:
+    """Apply `func` to every record, in worker processes if more than one job is asked."""
+    from .jsonl_ops import iter_lines, map_records
+
+    if args.jobs > 1:
+        from .map_with_pbar import map_json_lines
+
+        map_json_lines(
+            func,
+            args.file,
+            args.output,
+            pool_size=args.jobs,
+            drop_none=True,
+            progress=False,
+        )
+    else:
+        _write_lines(map_records(func, iter_lines(args.file)), args.output)
+
+
+def _jsonl_select(args) -> None:
+    from .jsonl_ops import FieldSelector
+
+    fields = [f for field in args.fields for f in field.split(",") if f]
+    _map_records(FieldSelector(fields), args)
+
+
+def _jsonl_filter(args) -> None:
+    from .jsonl_ops import RecordFilter
+
+    _map_records(RecordFilter(args.expr), args)
+
+
+def _bench(args) -> int:
+    import json
+
+    from . import benchmarks
+
+    names = args.only.split(",") if args.only else None
+    results = benchmarks.run_suite(names, repeat=args.repeat)
+    for key, value in results["metrics"].items():
+        print(f"{key:<40} {value:>12.6f}")
+    if args.output is not None:
+        from .r_utils import write_json
+
+        write_json(results, args.output, indent=2)
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = benchmarks.compare_results(
+        results, baseline, threshold=args.threshold, min_seconds=args.min_seconds
+    )
+    for key, r in regressions.items():
+        print(
+            f"REGRESSION {key}: {r['baseline']:.6f}s -> {r['current']:.6f}s"
+            f" ({r['ratio']:.2f}x)",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create the parser of the commandline arguments."""
+    parser = argparse.ArgumentParser(
+        prog="rpyutils", description="Run without arguments to see a demo."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    jsonl = commands.add_parser(
+        "jsonl",
+        help="stream json lines files",
+        description="Stream json lines files. Use '-' for stdin or stdout."
+        " Files ending in .gz, .bz2, .xz or .lzma are (de)compressed on the fly.",
+    )
+    jsonl_commands = jsonl.add_subparsers(dest="jsonl_command", required=True)
+    jobs_kw = dict(
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes (default: number of CPUs)",
+    )
+    out_kw = dict(default="-", help="output file (default: stdout)")
+
+    p = jsonl_commands.add_parser("count", help="count lines")
+    p.add_argument("files", nargs="*", default=["-"])
+    p.add_argument("-j", "--jobs", **jobs_kw)
+    p.set_defaults(func=_jsonl_count)
+
+    for name, help_ in [("head", "first lines"), ("tail", "last lines")]:
+        p = jsonl_commands.add_parser(name, help=f"print the {help_}")
+        p.add_argument("file", nargs="?", default="-")
+        p.add_argument("-n", type=int, default=10, help="number of lines")
+        p.add_argument("-o", "--output", **out_kw)
+        p.set_defaults(func=_jsonl_head if name == "head" else _jsonl_tail)
+
+    p = jsonl_commands.add_parser(
+        "follow", help="print records as they are appended, like 'tail -F'"
+    )
+    p.add_argument("file")
+    p.add_argument(
+        "--from-start", action="store_true", help="print the existing records first"
+    )
+    p.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="longest wait between checks in seconds (default: 1)",
+    )
+    p.set_defaults(func=_jsonl_follow)
+
+    p = jsonl_commands.add_parser("sample", help="print random lines")
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument("-k", type=int, default=10, help="sample size (per stratum)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--key", help="dotted field path to stratify by, e.g. 'meta.lang'")
+    p.add_argument("--weight", help="dotted field path of the sampling weights")
+    p.add_argument("-j", "--jobs", **jobs_kw)
+    p.add_argument("-o", "--output", **out_kw)
+    p.set_defaults(func=_jsonl_sample)
+
+    p = jsonl_commands.add_parser("split", help="split a file into several files")
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="output path pattern with '{index}', e.g. 'part-{index:03d}.jsonl.gz'",
+    )
+    size = p.add_mutually_exclusive_group(required=True)
+    size.add_argument("--lines", type=int, help="lines per output file")
+    size.add_argument("--parts", type=int, help="number of output files")
+    p.set_defaults(func=_jsonl_split)
+
+    p = jsonl_commands.add_parser("cat", help="concatenate files")
+    p.add_argument("files", nargs="*", default=["-"])
+    p.add_argument("-o", "--output", **out_kw)
+    p.set_defaults(func=_jsonl_cat)
+
+    p = jsonl_commands.add_parser(
+        "sort", help="sort by a key, also files larger than memory"
+    )
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument(
+        "-k",
+        "--key",
+        action="append",
+        required=True,
+        help="dotted field path to sort by, repeat or separate with commas for more",
+    )
+    p.add_argument("-r", "--reverse", action="store_true", help="descending order")
+    p.add_argument(
+        "-u", "--unique", action="store_true", help="keep the first record of each key"
+    )
+    p.add_argument(
+        "-S",
+        "--memory",
+        type=int,
+        default=512,
+        help="memory budget in MiB (default: 512)",
+    )
+    p.add_argument("-T", "--tmp-dir", help="directory of the temporary files")
+    p.add_argument("-o", "--output", **out_kw)
+    p.add_argument("-j", "--jobs", **jobs_kw)
+    p.set_defaults(func=_jsonl_sort)
+
+    p = jsonl_commands.add_parser(
+        "partition", help="hash partition records into buckets by a key"
+    )
+    p.add_argument("files", nargs="*", default=["-"])
+    p.add_argument(
+        "-k",
+        "--key",
+        action="append",
+        required=True,
+        help="dotted field path to partition by, repeat or separate with commas for more",
+    )
+    p.add_argument("-n", "--buckets", type=int, required=True, help="number of buckets")
+    p.add_argument("-o", "--output", required=True, help="output directory")
+    p.add_argument(
+        "--suffix",
+        default=".jsonl",
+        help="suffix of the bucket files (default: .jsonl)",
+    )
+    p.add_argument("-j", "--jobs", **jobs_kw)
+    p.set_defaults(func=_jsonl_partition)
+
+    p = jsonl_commands.add_parser(
+        "from-json", help="convert a large json document to json lines"
+    )
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument(
+        "-p",
+        "--prefix",
+        default="item",
+        help="path of the records, e.g. 'data.item' (default: 'item',"
+        " the items of a top-level array)",
+    )
+    p.add_argument("-o", "--output", **out_kw)
+    p.set_defaults(func=_jsonl_from_json)
+
+    p = jsonl_commands.add_parser("select", help="keep some fields of each record")
+    p.add_argument(
+        "fields", nargs="+", help="dotted field paths, e.g. 'id' 'user.name,tags.0'"
+    )
+    p.add_argument("-i", "--input", dest="file", default="-", help="default: stdin")
+    p.add_argument("-o", "--output", **out_kw)
+    p.add_argument("-j", "--jobs", **{**jobs_kw, "default": 1})
+    p.set_defaults(func=_jsonl_select)
+
+    p = jsonl_commands.add_parser("filter", help="keep records matching an expression")
+    p.add_argument(
+        "expr",
+        help="Python expression with the record bound to 'r',"
+        " e.g. \"r['score'] > 0.5 and get('meta.lang') == 'en'\"",
+    )
+    p.add_argument("file", nargs="?", default="-")
+    p.add_argument("-o", "--output", **out_kw)
+    p.add_argument("-j", "--jobs", **jobs_kw)
+    p.set_defaults(func=_jsonl_filter)
+
+    p = commands.add_parser(
+        "bench",
+        help="run the benchmark suite",
+        description="Run the benchmark suite and compare it with a baseline."
+        " Exits with status 1 if a timing regressed past the threshold.",
+    )
+    p.add_argument("--only", help="comma separated benchmarks to run (default: all)")
+    p.add_argument("--repeat", type=int, default=3, help="keep the best of N runs")
+    p.add_argument("-o", "--output", help="save the results to this json file")
+    p.add_argument("--baseline", help="json results of an earlier run")
+    p.add_argument(
+        "--threshold", type=float, default=0.2, help="allowed slowdown (default: 0.2)"
+    )
+    p.add_argument(
+        "--min-seconds",
+        type=float,
+        default=1e-3,
+        help="ignore timings below this in both runs (default: 0.001)",
+    )
+    p.set_defaults(func=_bench)
+    return parser
+
+
+def run(argv: Union[List, None] = None) -> int:
     """The entry point for the commandline use.
 
     You can see :py:func:`fcpp.utils.calculator.add_two` in the link.
 
     Args:
         argv (Union[List, None]): List of commandline arguments.
+
+    Returns:
+        int: The exit status.
     """
-    if argv is None or len(argv) <= 1:
-        print("An example of key value pretty printing is shown below.")
-        sample_mapping = {
-            "string": "This is a sample string",
-            "false boolean": False,
-            "true boolean": True,
-            "integer": 12345,
-            "float": 12.34,
-        }
-        prettifier.pretty_key_value(sample_mapping)
-        print("\nAn example of json pretty printing by rich library.")
-        prettifier.pretty_json(sample_mapping)
-    else:
-        print("I am not ready for custom input now. The input is shown below.")
-        for a in argv[1:]:
-            print(a)
+    try:
+        if argv is None or len(argv) <= 1:
+            print_demo()
+        else:
+            args = build_parser().parse_args(argv[1:])
+            return args.func(args) or 0
+    except BrokenPipeError:
+        # The reader of stdout exited early, e.g. 'rpyutils jsonl cat big.jsonl | head'.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    return 0
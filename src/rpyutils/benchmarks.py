@@ -0,0 +1,522 @@
+"""Benchmarks for rpyutils.
+
+Each benchmark function runs a small, self-contained workload and returns a dict of the
+measured metrics. Times are wall clock seconds measured with `time.perf_counter`.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, Optional
+
+from .map_with_pbar import map_tqdm
+
+
+def _sleep_task(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def skewed_durations(
+    n_tasks: int = 64, n_long: int = 4, long: float = 0.5, short: float = 0.02
+):
+    """Task durations where a few long tasks sit next to each other at the start.
+
+    This is the worst case for static chunking: all the long tasks land in the same chunk.
+    """
+    n_long = min(n_long, n_tasks)
+    return [long] * n_long + [short] * (n_tasks - n_long)
+
+
+def bench_map_tqdm_skewed(
+    n_tasks: int = 64,
+    n_long: int = 4,
+    long: float = 0.5,
+    short: float = 0.02,
+    pool_size: Optional[int] = None,
+) -> Dict[str, float]:
+    """Compare the makespan of static chunking and cost-aware scheduling in `map_tqdm`.
+
+    Tasks sleep, so the result does not depend on the number of physical cores.
+
+    Args:
+        n_tasks: total number of tasks.
+        n_long: number of long tasks.
+        long: duration of a long task in seconds.
+        short: duration of a short task in seconds.
+        pool_size: number of worker processes. Defaults to `max(4, os.cpu_count())`.
+
+    Returns:
+        Makespan of both schedules in seconds and the speedup of the cost-aware one.
+    """
+    if pool_size is None:
+        pool_size = max(4, os.cpu_count())
+    durations = skewed_durations(n_tasks, n_long, long, short)
+    args = [(d,) for d in durations]
+
+    start = time.perf_counter()
+    static_out = map_tqdm(_sleep_task, args, pool_size=pool_size)
+    static_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lpt_out = map_tqdm(_sleep_task, args, pool_size=pool_size, costs=durations)
+    lpt_s = time.perf_counter() - start
+
+    assert static_out == lpt_out == durations
+    return {"static_s": static_s, "lpt_s": lpt_s, "speedup": static_s / lpt_s}
+
+
+def _matmul_task(size: int, repeat: int) -> float:
+    import numpy as np
+
+    a = np.random.default_rng(0).random((size, size))
+    for _ in range(repeat):
+        a = a @ a
+        a /= np.abs(a).max()
+    return float(a[0, 0])
+
+
+def bench_map_tqdm_blas_scaling(
+    pool_sizes=None,
+    worker_threads_options=(None, 1),
+    n_tasks: int = 32,
+    size: int = 256,
+    repeat: int = 8,
+) -> Dict[str, float]:
+    """Measure how NumPy heavy `map_tqdm` jobs scale with and without BLAS thread caps.
+
+    Without a cap every worker starts one BLAS thread per CPU, so large pools oversubscribe
+    the machine. Requires NumPy.
+
+    Args:
+        pool_sizes: pool sizes to try. Defaults to 1, 2, 4, ... up to `os.cpu_count()`.
+        worker_threads_options: values of the `worker_threads` argument to compare.
+        n_tasks: number of matrix tasks.
+        size: size of the square matrices.
+        repeat: matrix products per task.
+
+    Returns:
+        Wall time in seconds keyed by 'pool{pool_size}_threads{worker_threads}'.
+    """
+    if pool_sizes is None:
+        n_cpus = os.cpu_count()
+        pool_sizes = sorted({min(2**i, n_cpus) for i in range(n_cpus.bit_length() + 1)})
+    args = [(size, repeat) for _ in range(n_tasks)]
+    results = dict()
+    for pool_size in pool_sizes:
+        for worker_threads in worker_threads_options:
+            start = time.perf_counter()
+            map_tqdm(
+                _matmul_task, args, pool_size=pool_size, worker_threads=worker_threads
+            )
+            elapsed = time.perf_counter() - start
+            results[f"pool{pool_size}_threads{worker_threads}"] = elapsed
+    return results
+
+
+# Modules that `import rpyutils` must not load. They are imported on first use.
+HEAVY_MODULES = (
+    "tqdm",
+    "multiprocessing",
+    "subprocess",
+    "inspect",
+    "psutil",
+    "pyrootutils",
+    "pandas",
+    "IPython",
+    "rich",
+    "numpy",
+)
+
+
+def import_time_report(module: str = "rpyutils") -> Dict[str, float]:
+    """Import `module` in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        Cumulative import time in seconds of every module imported along with `module`.
+    """
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True).stderr
+    report = dict()
+    for line in output.splitlines():
+        # 'import time: self [us] | cumulative | imported package'
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        report[name.strip()] = int(cumulative) / 1e6
+    return report
+
+
+def bench_import_time(module: str = "rpyutils", repeat: int = 5) -> Dict[str, float]:
+    """Best of `repeat` cold import times of `module` in seconds."""
+    times = [import_time_report(module)[module] for _ in range(repeat)]
+    return {"import_s": min(times)}
+
+
+def check_import_budget(
+    module: str = "rpyutils",
+    budget_s: float = 0.02,
+    forbidden: Iterable[str] = HEAVY_MODULES,
+    repeat: int = 5,
+) -> float:
+    """Fail if importing `module` is slower than `budget_s` or loads a forbidden module.
+
+    Raises:
+        RuntimeError: if the budget is exceeded or a forbidden module is imported.
+
+    Returns:
+        Best cold import time in seconds.
+    """
+    reports = [import_time_report(module) for _ in range(repeat)]
+    loaded = sorted(
+        name
+        for name in reports[0]
+        if any(name == f or name.startswith(f + ".") for f in forbidden)
+    )
+    if loaded:
+        msg = f"'import {module}' loads modules that should be lazy: {loaded}"
+        raise RuntimeError(msg)
+    best = min(report[module] for report in reports)
+    if best > budget_s:
+        msg = f"'import {module}' took {best:.4f}s, budget is {budget_s:.4f}s."
+        raise RuntimeError(msg)
+    return best
+
+
+def bench_rectangle_areas(n: int = 1_000_000) -> Dict[str, float]:
+    """Compare per-object `Rectangle.get_area` with the vectorized `RectangleArray.areas`.
+
+    Args:
+        n: number of rectangles.
+
+    Returns:
+        Seconds to compute all the areas with each approach.
+    """
+    import random
+
+    from .rectangle import Rectangle
+    from .rectangle_array import RectangleArray, np
+
+    rng = random.Random(0)
+    widths = [rng.random() for _ in range(n)]
+    heights = [rng.random() for _ in range(n)]
+    rectangles = list(map(Rectangle, widths, heights))
+
+    results = dict()
+    start = time.perf_counter()
+    [r.get_area() for r in rectangles]
+    results["objects_s"] = time.perf_counter() - start
+
+    backends = [False, True] if np is not None else [False]
+    for use_numpy in backends:
+        boxes = RectangleArray(widths, heights, use_numpy=use_numpy)
+        start = time.perf_counter()
+        boxes.areas()
+        name = "numpy" if use_numpy else "array"
+        results[f"{name}_s"] = time.perf_counter() - start
+    return results
+
+
+def bench_spatial_index(
+    n: int = 1_000_000, n_queries: int = 1_000, brute_force_queries: int = 10
+) -> Dict[str, float]:
+    """Compare `RectangleIndex` queries with a brute force loop over all the boxes.
+
+    Boxes up to 1 x 1 are spread uniformly over a 1000 x 1000 square.
+
+    Args:
+        n: number of boxes.
+        n_queries: number of intersection and nearest queries for the index.
+        brute_force_queries: number of intersection queries for the brute force loop.
+
+    Returns:
+        Build time and the mean time per query in seconds.
+    """
+    import random
+
+    from .spatial_index import RectangleIndex, _intersects
+
+    rng = random.Random(0)
+
+    def random_box(max_size):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        return (x, y, x + rng.uniform(0, max_size), y + rng.uniform(0, max_size))
+
+    boxes = [random_box(1) for _ in range(n)]
+    queries = [random_box(10) for _ in range(n_queries)]
+
+    results = dict()
+    start = time.perf_counter()
+    index = RectangleIndex.from_bounds(boxes)
+    results["build_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query in queries:
+        index.intersects(query)
+    results["index_intersects_s"] = (time.perf_counter() - start) / n_queries
+
+    start = time.perf_counter()
+    for query in queries:
+        index.nearest(query[:2], k=10)
+    results["index_nearest_s"] = (time.perf_counter() - start) / n_queries
+
+    start = time.perf_counter()
+    for query in queries[:brute_force_queries]:
+        [i for i, box in enumerate(boxes) if _intersects(box, query)]
+    results["brute_force_intersects_s"] = (
+        time.perf_counter() - start
+    ) / brute_force_queries
+    return results
+
+
+def bench_reductions(
+    n: int = 1_000_000, threshold_n: Optional[int] = None
+) -> Dict[str, float]:
+    """Compare `sum_number_list`/`mul_number_list` with the new reduction engines.
+
+    At `threshold_n` values, method 'auto' (serial) is also timed against 'parallel',
+    which is the measurement behind `rectangle_utils.PARALLEL_THRESHOLD`.
+
+    Args:
+        n: number of values.
+        threshold_n: number of values of the 'auto' and 'parallel' comparison. Defaults to
+            `rectangle_utils.PARALLEL_THRESHOLD`. 0 skips it.
+
+    Returns:
+        Seconds per reduction for each method, and the absolute error of each sum.
+    """
+    import math
+    import random
+
+    from . import rectangle_utils
+
+    rng = random.Random(0)
+    floats = [rng.uniform(-1, 1) * 10 ** rng.randint(-8, 8) for _ in range(n)]
+    factors = [rng.uniform(0.5, 2.0) for _ in range(n)]
+    exact = math.fsum(floats)
+
+    results = dict()
+    for method in ["loop", "builtin", "kahan", "pairwise", "fsum", "auto"]:
+        start = time.perf_counter()
+        total = rectangle_utils.sum_numbers(floats, method=method)
+        results[f"sum_{method}_s"] = time.perf_counter() - start
+        results[f"sum_{method}_error"] = abs(total - exact)
+    for method in ["loop", "math", "log"]:
+        start = time.perf_counter()
+        rectangle_utils.prod_numbers(factors, method=method)
+        results[f"prod_{method}_s"] = time.perf_counter() - start
+
+    if threshold_n is None:
+        threshold_n = rectangle_utils.PARALLEL_THRESHOLD
+    if threshold_n:
+        # The values are repeated, so the list does not hold a float object per value.
+        floats = (floats * (threshold_n // n + 1))[:threshold_n]
+        factors = (factors * (threshold_n // n + 1))[:threshold_n]
+        exact = math.fsum(floats)
+        for method in ["auto", "parallel"]:
+            start = time.perf_counter()
+            total = rectangle_utils.sum_numbers(floats, method=method)
+            results[f"sum_{method}_threshold_s"] = time.perf_counter() - start
+            results[f"sum_{method}_threshold_error"] = abs(total - exact)
+            start = time.perf_counter()
+            rectangle_utils.prod_numbers(factors, method=method)
+            results[f"prod_{method}_threshold_s"] = time.perf_counter() - start
+    return results
+
+
+def _sample_records(n: int):
+    return [
+        {"id": i, "name": f"record-{i}", "score": i / n, "tags": ["a", "b", i % 7]}
+        for i in range(n)
+    ]
+
+
+def bench_json_lines(n: int = 200_000) -> Dict[str, float]:
+    """Time writing and reading `n` small records as json lines with `r_utils`.
+
+    Returns:
+        Seconds for each of the json lines helpers.
+    """
+    import tempfile
+    from pathlib import Path
+
+    from . import r_utils
+
+    records = _sample_records(n)
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix="rpyutils_bench_") as tmp_dir:
+        path = Path(tmp_dir) / "records.jsonl"
+        start = time.perf_counter()
+        r_utils.write_json_lines(records, path)
+        results["write_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with r_utils.JSONLinesWriter(path) as writer:
+            writer.add(records)
+        results["writer_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        r_utils.read_json_lines(path)
+        results["read_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in r_utils.iter_json_lines(path):
+            pass
+        results["iter_s"] = time.perf_counter() - start
+    return results
+
+
+def bench_pickle(n: int = 200_000) -> Dict[str, float]:
+    """Time `r_utils.write_pickle` and `r_utils.read_pickle` with `n` small records."""
+    import tempfile
+    from pathlib import Path
+
+    from . import r_utils
+
+    records = _sample_records(n)
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix="rpyutils_bench_") as tmp_dir:
+        path = Path(tmp_dir) / "records.pkl"
+        start = time.perf_counter()
+        r_utils.write_pickle(records, path)
+        results["write_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        r_utils.read_pickle(path)
+        results["read_s"] = time.perf_counter() - start
+    return results
+
+
+def bench_file_lines(n: int = 1_000_000) -> Dict[str, float]:
+    """Time line counting, head and tail on a file with `n` lines.
+
+    Returns:
+        Seconds for `r_utils.count_file_lines`, `r_utils.head`, `r_utils.tail` and
+        `jsonl_ops.count_lines`.
+    """
+    import tempfile
+    from pathlib import Path
+
+    from . import jsonl_ops, r_utils
+
+    results = dict()
+    with tempfile.TemporaryDirectory(prefix="rpyutils_bench_") as tmp_dir:
+        path = Path(tmp_dir) / "lines.jsonl"
+        with open(path, "w") as f:
+            f.writelines(f'{{"id": {i}}}\n' for i in range(n))
+
+        for name, func in [
+            ("count_file_lines_s", lambda: r_utils.count_file_lines(path)),
+            ("count_lines_s", lambda: jsonl_ops.count_lines(path)),
+            ("head_s", lambda: r_utils.head(path, lines=10)),
+            ("tail_s", lambda: r_utils.tail(path, lines=10)),
+        ]:
+            start = time.perf_counter()
+            func()
+            results[name] = time.perf_counter() - start
+    return results
+
+
+def _cpu_task(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def bench_map_tqdm_scaling(
+    pool_sizes=None, n_tasks: int = 64, task_size: int = 200_000
+) -> Dict[str, float]:
+    """Time `map_tqdm` on CPU bound pure Python tasks with different pool sizes.
+
+    Args:
+        pool_sizes: pool sizes to try. Defaults to 1, 2, 4, ... up to `os.cpu_count()`.
+        n_tasks: number of tasks.
+        task_size: work per task.
+
+    Returns:
+        Wall time in seconds keyed by 'pool{pool_size}_s'.
+    """
+    if pool_sizes is None:
+        n_cpus = os.cpu_count()
+        pool_sizes = sorted({min(2**i, n_cpus) for i in range(n_cpus.bit_length() + 1)})
+    args = [(task_size,) for _ in range(n_tasks)]
+    results = dict()
+    for pool_size in pool_sizes:
+        start = time.perf_counter()
+        map_tqdm(_cpu_task, args, pool_size=pool_size)
+        results[f"pool{pool_size}_s"] = time.perf_counter() - start
+    return results
+
+
+# Benchmarks run by `rpyutils bench`. They must not depend on optional packages.
+BENCH_SUITE = {
+    "json_lines": bench_json_lines,
+    "pickle": bench_pickle,
+    "file_lines": bench_file_lines,
+    "map_tqdm": bench_map_tqdm_scaling,
+    "import": bench_import_time,
+}
+
+
+def run_suite(names: Optional[Iterable[str]] = None, repeat: int = 3) -> Dict:
+    """Run benchmarks of `BENCH_SUITE` and keep the best time of each metric.
+
+    Args:
+        names: benchmarks to run. Defaults to all of them.
+        repeat: number of runs of each benchmark.
+
+    Returns:
+        Dict with the 'environment' of the run and the 'metrics', keyed by
+        '{benchmark}.{metric}'.
+    """
+    import platform
+
+    from . import __version__
+
+    names = list(BENCH_SUITE) if names is None else list(names)
+    unknown = [name for name in names if name not in BENCH_SUITE]
+    if unknown:
+        msg = f"Unknown benchmarks {unknown}. Use some of {list(BENCH_SUITE)}."
+        raise ValueError(msg)
+
+    metrics = dict()
+    for name in names:
+        for _ in range(repeat):
+            for metric, value in BENCH_SUITE[name]().items():
+                key = f"{name}.{metric}"
+                metrics[key] = min(value, metrics.get(key, value))
+    environment = {
+        "rpyutils": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return {"environment": environment, "metrics": metrics}
+
+
+def compare_results(
+    results: Dict, baseline: Dict, threshold: float = 0.2, min_seconds: float = 1e-3
+) -> Dict[str, Dict[str, float]]:
+    """Find the timing metrics that got slower than the baseline.
+
+    Only metrics ending in '_s' are compared, since larger is worse for them.
+
+    Args:
+        results: output of `run_suite()`.
+        baseline: an earlier output of `run_suite()`.
+        threshold: allowed relative slowdown, 0.2 is 20%.
+        min_seconds: ignore metrics that take less than this in both runs. Their
+            relative changes are mostly noise.
+
+    Returns:
+        The regressed metrics with their 'baseline' and 'current' values and their 'ratio'.
+    """
+    regressions = dict()
+    for key, current in results["metrics"].items():
+        old = baseline["metrics"].get(key)
+        if not key.endswith("_s") or old is None or max(old, current) < min_seconds:
+            continue
+        ratio = current / old if old > 0 else float("inf")
+        if ratio > 1 + threshold:
+            regressions[key] = {"baseline": old, "current": current, "ratio": ratio}
+    return regressions
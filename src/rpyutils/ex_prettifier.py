@@ -3,10 +3,15 @@
 This file defines functions that use rich library to pretty print inputs to the terminal.
 """
 
-from typing import Dict
+import json
+import os
+from collections import deque
+from itertools import islice
+from numbers import Number
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
 
-import rich
-from rich.pretty import pprint
+if TYPE_CHECKING:
+    from rich.console import Console
 
 
 def style(text: str, style: str) -> str:
@@ -24,49 +29,310 @@ def style(text: str, style: str) -> str:
     return f"[{style}]{text}[/{style}]"
 
 
-def pretty_key_value(mapping: Dict) -> None:
+RICH_JSON_STYLES = {
+    "bool_true": "italic bright_green",
+    "bool_false": "italic bright_red",
+    "null": "italic magenta",
+    "number": "bold italic cyan",
+    "str": "bold italic green",
+    "key": "bold blue",
+}
+
+
+def value_style(value: Any) -> str:
+    """Returns the rich style of a value, following rich colors for json printing.
+
+    Args:
+        value (Any): The value to style.
+
+    Returns:
+        str: The name of the style.
+    """
+    if isinstance(value, bool):
+        if value:
+            return RICH_JSON_STYLES["bool_true"]
+        return RICH_JSON_STYLES["bool_false"]
+    if value is None:
+        return RICH_JSON_STYLES["null"]
+    if isinstance(value, int) or isinstance(value, float):
+        return RICH_JSON_STYLES["number"]
+    return RICH_JSON_STYLES["str"]
+
+
+def truncate(text: str, max_length: Optional[int]) -> str:
+    """Shortens text to `max_length` characters, marking the cut with an ellipsis.
+
+    Args:
+        text (str): The text to shorten.
+        max_length (Optional[int]): The maximum length. None keeps the whole text.
+
+    Returns:
+        str: The shortened text.
+    """
+    if max_length is None or len(text) <= max_length:
+        return text
+    return text[: max(max_length - 1, 0)] + "…"
+
+
+def _repr_pieces(value: Any, limit: int) -> Iterator[str]:
+    """Yields the pieces of `repr(value)` for builtin containers, lazily and item by item.
+
+    Strings are cut to `limit` characters before their repr is made. Other objects use their repr.
+    """
+    if isinstance(value, str):
+        yield repr(value[:limit])
+    elif isinstance(value, dict):
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            if i:
+                yield ", "
+            yield from _repr_pieces(key, limit)
+            yield ": "
+            yield from _repr_pieces(item, limit)
+        yield "}"
+    elif isinstance(value, (list, tuple, set, frozenset)) and (
+        value or isinstance(value, list)
+    ):
+        if isinstance(value, list):
+            opening, closing = "[", "]"
+        elif isinstance(value, tuple):
+            opening, closing = "(", ",)" if len(value) == 1 else ")"
+        elif isinstance(value, frozenset):
+            opening, closing = "frozenset({", "})"
+        else:
+            opening, closing = "{", "}"
+        yield opening
+        for i, item in enumerate(value):
+            if i:
+                yield ", "
+            yield from _repr_pieces(item, limit)
+        yield closing
+    else:
+        yield repr(value)
+
+
+def bounded_str(value: Any, max_length: Optional[int]) -> str:
+    """Returns `truncate(str(value), max_length)` without converting all of a large value.
+
+    Strings are sliced and builtin containers (dicts, lists, tuples and sets) are converted item by item
+    until `max_length` characters are reached, so the cost does not grow with their size.
+
+    Args:
+        value (Any): The value to convert.
+        max_length (Optional[int]): The maximum length. None converts the whole value.
+
+    Returns:
+        str: The shortened text.
+    """
+    if max_length is None:
+        return str(value)
+    if isinstance(value, str):
+        return truncate(value[: max_length + 1], max_length)
+    if not isinstance(value, (dict, list, tuple, set, frozenset)):
+        return truncate(str(value), max_length)
+    pieces = list()
+    length = 0
+    for piece in _repr_pieces(value, max_length):
+        pieces.append(piece)
+        length += len(piece)
+        if length > max_length:
+            break
+    return truncate("".join(pieces), max_length)
+
+
+def pretty_key_value(
+    mapping: Dict,
+    max_items: Optional[int] = None,
+    max_value_length: Optional[int] = None,
+    page_size: int = 200,
+    console: Optional["Console"] = None,
+) -> None:
     """Print colored key value mappings.
 
     Pretty print key value mappings. It follows rich colors for json printing but without the brackets.
+    Lines are built as styled `rich.text.Text` spans instead of markup, so keys and values are printed as they are
+    (e.g. '[red]' is not parsed) and nothing has to be parsed again. The output is printed in pages of `page_size` lines,
+    so only one page is held in memory at a time.
 
     Args:
         mapping (Dict): A json like mapping.
+        max_items (Optional[int]): Print at most this many items and the number of the remaining ones. Defaults to all items.
+        max_value_length (Optional[int]): Truncate values longer than this many characters, see `bounded_str()`.
+            Defaults to no truncation.
+        page_size (int): Number of lines printed at once.
+        console (Optional[Console]): The rich console to print to. Defaults to the global console.
     """
-    rich_json_styles = {
-        "bool_true": "italic bright_green",
-        "bool_false": "italic bright_red",
-        "null": "italic magenta",
-        "number": "bold italic cyan",
-        "str": "bold italic green",
-        "key": "bold blue",
-    }
-    lines = list()
-    for key, value in mapping.items():
-        if isinstance(value, bool):
-            if value:
-                value_style = rich_json_styles["bool_true"]
-            else:
-                value_style = rich_json_styles["bool_false"]
-        elif value is None:
-            value_style = rich_json_styles["null"]
-        elif isinstance(value, int) or isinstance(value, float):
-            value_style = rich_json_styles["number"]
-        elif isinstance(value, str):
-            value_style = rich_json_styles["str"]
-        else:
-            value_style = rich_json_styles["str"]
-            value = str(value)
-        lines.append(
-            style(key, rich_json_styles["key"]) + ": " + style(value, value_style)
-        )
-    msg = "\n".join(lines)
-    rich.print(msg)
+    from rich import get_console
+    from rich.text import Text
 
+    if console is None:
+        console = get_console()
 
-def pretty_json(json_object: Dict) -> None:
+    key_style = RICH_JSON_STYLES["key"]
+    num_items = len(mapping)
+    if max_items is None or max_items > num_items:
+        max_items = num_items
+
+    page = Text()
+    for i, (key, value) in enumerate(islice(mapping.items(), max_items)):
+        if i % page_size == 0 and i > 0:
+            console.print(page)
+            page = Text()
+        elif i > 0:
+            page.append("\n")
+        page.append(str(key), style=key_style)
+        page.append(": ")
+        page.append(bounded_str(value, max_value_length), style=value_style(value))
+    if max_items < num_items:
+        if max_items > 0:
+            page.append("\n")
+        page.append(f"... {num_items - max_items} more items", style="dim")
+    if page:
+        console.print(page)
+
+
+class Elided(object):
+    """Placeholder for the part of an object that a preview leaves out.
+
+    Rich pretty prints unknown objects with their repr, so it shows up without quotes.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def __repr__(self) -> str:
+        return self.text
+
+
+def preview_object(
+    obj: Any,
+    max_depth: int = 6,
+    max_length: int = 20,
+    max_string: int = 200,
+    max_nodes: int = 2_000,
+) -> Any:
+    """Make a small copy of a nested object for printing.
+
+    Only the parts that will be shown are visited, so the cost depends on the limits and not on the size of the object.
+    Left out parts are replaced by `Elided` markers with the number of items or characters that were skipped.
+    Sets and deques are shown like lists. Other objects (e.g. numpy arrays or bytes) are shown as their text cut to
+    `max_string` characters, see `bounded_str()`.
+
+    Args:
+        obj (Any): A json like object (dicts, lists, tuples, strings and numbers).
+        max_depth (int): Containers deeper than this are replaced by their size.
+        max_length (int): Show at most this many items of each container.
+        max_string (int): Show at most this many characters of each string.
+        max_nodes (int): Show at most this many values in total.
+
+    Returns:
+        Any: The preview of the object.
+    """
+    budget = max_nodes
+
+    def walk(value: Any, depth: int) -> Any:
+        nonlocal budget
+        budget -= 1
+        if isinstance(value, str):
+            if len(value) > max_string:
+                return f"{value[:max_string]}... (+{len(value) - max_string} chars)"
+            return value
+        if isinstance(value, dict):
+            if depth >= max_depth:
+                return Elided(f"{{... {len(value)} keys}}")
+            preview = dict()
+            for key, item in islice(value.items(), max_length):
+                if budget <= 0:
+                    break
+                preview[key] = walk(item, depth + 1)
+            if len(preview) < len(value):
+                preview[Elided("...")] = Elided(f"+{len(value) - len(preview)} keys")
+            return preview
+        if isinstance(value, (list, tuple, set, frozenset, deque)):
+            if depth >= max_depth:
+                return Elided(f"[... {len(value)} items]")
+            preview = list()
+            for item in islice(value, max_length):
+                if budget <= 0:
+                    break
+                preview.append(walk(item, depth + 1))
+            if len(preview) < len(value):
+                preview.append(Elided(f"... +{len(value) - len(preview)} items"))
+            return preview
+        if value is None or isinstance(value, Number):
+            return value
+        return Elided(bounded_str(value, max_string))
+
+    return walk(obj, 0)
+
+
+def pretty_json(
+    json_object: Dict,
+    preview: bool = False,
+    max_depth: int = 6,
+    max_length: int = 20,
+    max_string: int = 200,
+    max_nodes: int = 2_000,
+) -> None:
     """Pretty prints json objects using rich library.
 
     Args:
         json_object (Dict): A json object.
+        preview (bool): Print a bounded preview of the object instead of all of it. See `preview_object()` for the limits.
+            Use it for objects that may be huge, the cost of printing a preview does not depend on the size of the object.
+        max_depth (int): See `preview_object()`. Only used if `preview` is True.
+        max_length (int): See `preview_object()`. Only used if `preview` is True.
+        max_string (int): See `preview_object()`. Only used if `preview` is True.
+        max_nodes (int): See `preview_object()`. Only used if `preview` is True.
     """
+    from rich.pretty import pprint
+
+    if preview:
+        json_object = preview_object(
+            json_object,
+            max_depth=max_depth,
+            max_length=max_length,
+            max_string=max_string,
+            max_nodes=max_nodes,
+        )
     pprint(json_object, expand_all=True, indent_guides=False)
+
+
+def preview_json_lines(
+    path: os.PathLike,
+    n: int = 3,
+    sample: bool = False,
+    seed: Optional[int] = None,
+    **kwargs,
+) -> None:
+    """Pretty prints a preview of a few records of a json lines file.
+
+    The file is streamed. With `sample=False` reading stops after the first `n` records.
+    With `sample=True` the whole file is read once, but only `n` records are kept in memory.
+
+    Args:
+        path (os.PathLike): The json lines file.
+        n (int): Number of records to print.
+        sample (bool): Print `n` records sampled uniformly from the whole file instead of the first ones.
+        seed (Optional[int]): Random seed for sampling.
+        **kwargs: Limits passed to `preview_object()`.
+    """
+    from rich import get_console
+    from rich.text import Text
+
+    from .jsonl_ops import iter_lines, reservoir_sample
+
+    lines = enumerate(iter_lines(path))
+    if sample:
+        # Only the sampled lines are parsed.
+        selected = reservoir_sample(lines, n, seed=seed)
+    else:
+        selected = islice(lines, n)
+    selected = [(line_number, json.loads(line)) for line_number, line in selected]
+
+    console = get_console()
+    for line_number, record in selected:
+        console.print(Text(f"# record {line_number}", style="dim"))
+        pretty_json(record, preview=True, **kwargs)
@@ -0,0 +1,224 @@
+"""Incremental parsing of large json documents.
+
+`read_json()` loads the whole document with `json.load()`. The functions in this file read
+a document in chunks and yield the values at a path, e.g. the items of a top-level array,
+so memory use depends on the size of one item, not of the document. Only the values that
+are yielded are decoded (with `json.JSONDecoder.raw_decode()`), the rest is skipped by
+scanning for brackets and strings.
+
+Paths use the same prefixes as ijson: keys separated by '.', with 'item' for the items of
+an array. For example 'item' yields the items of a top-level array, 'data.item' the items
+of the array under the 'data' key and 'meta.info' a single value.
+"""
+
+import json
+import os
+import re
+from typing import Any, Iterator, List, TextIO, Union
+
+from .r_utils import JSONLinesWriter, open_file
+
+# Number of characters read at a time. Reads grow for values larger than this.
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Text other than brackets and strings, and whole strings.
+_SKIPPABLE = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+
+
+# Longest json literal, an error this close to the end can be a truncated literal.
+_MAX_LITERAL = len("-Infinity")
+
+
+def _truncated(error: json.JSONDecodeError, end: int) -> bool:
+    """Whether a decoding error can be caused by the text ending at `end`."""
+    return (
+        error.msg.startswith("Unterminated string") or end - error.pos <= _MAX_LITERAL
+    )
+
+
+class _Reader:
+    """Buffered reader of a text stream with a position in the buffer."""
+
+    def __init__(self, fp: TextIO, decoder: json.JSONDecoder) -> None:
+        self.fp = fp
+        self.decoder = decoder
+        self.buffer = ""
+        self.pos = 0
+        self.consumed = 0  # Characters dropped from the front of the buffer.
+        self.eof = False
+
+    def offset(self) -> int:
+        return self.consumed + self.pos
+
+    def error(self, expected: str) -> ValueError:
+        found = repr(self.buffer[self.pos]) if self.pos < len(self.buffer) else "end"
+        msg = f"Expected {expected} at character {self.offset()}, found {found}."
+        return ValueError(msg)
+
+    def fill(self) -> bool:
+        """Read more text. Returns False at the end of the stream."""
+        if self.eof:
+            return False
+        # Keep only the unparsed part. Reads grow with it, so long values are scanned
+        # a bounded number of times.
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunk = self.fp.read(max(CHUNK_SIZE, len(self.buffer)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume one of `chars` after whitespace and return it."""
+        char = self.peek()
+        if char == "" or char not in chars:
+            raise self.error(" or ".join(repr(c) for c in chars))
+        self.pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """Decode the value at the current position."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer can be completed by
+                # reading more. Other errors are raised without reading the rest.
+                if _truncated(e, len(self.buffer)) and self.fill():
+                    continue
+                raise self.error("a json value") from None
+            # A number near the end of the buffer, like '1.' or '1e', can continue in
+            # the next chunk.
+            number_end = _NUMBER_CHARS.match(self.buffer, self.pos).end()
+            if number_end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self) -> None:
+        """Move past the value at the current position without decoding it."""
+        char = self.peek()
+        if char == "" or char not in "[{":
+            self.decode()
+            return
+        depth = 0
+        while True:
+            # Jump over text and whole strings up to the next bracket.
+            self.pos = _SKIPPABLE.match(self.buffer, self.pos).end()
+            if self.pos == len(self.buffer) or self.buffer[self.pos] == '"':
+                # The end of the buffer, or a string that continues in the next chunk.
+                if not self.fill():
+                    raise self.error("the end of the value")
+                continue
+            depth += 1 if self.buffer[self.pos] in "[{" else -1
+            self.pos += 1
+            if depth == 0:
+                return
+
+
+def _walk(reader: _Reader, path: List[str], depth: int = 0) -> Iterator[Any]:
+    """Yield the values at `path[depth:]` below the value at the current position."""
+    if depth == len(path):
+        yield reader.decode()
+        return
+    char = reader.peek()
+    if char == "[" and path[depth] == "item":
+        reader.pos += 1
+        if reader.peek() == "]":
+            reader.pos += 1
+            return
+        while True:
+            yield from _walk(reader, path, depth + 1)
+            if reader.expect(",]") == "]":
+                return
+    elif char == "{":
+        reader.pos += 1
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        while True:
+            if reader.peek() != '"':
+                raise reader.error("a key")
+            key = reader.decode()
+            reader.expect(":")
+            if key == path[depth]:
+                yield from _walk(reader, path, depth + 1)
+            else:
+                reader.skip()
+            if reader.expect(",}") == "}":
+                return
+    else:
+        reader.skip()
+
+
+def iter_json_items(
+    source: Union[os.PathLike, TextIO], prefix: str = "item", **kwargs
+) -> Iterator[Any]:
+    """Yield the values at a path of a json document, reading it incrementally.
+
+    Example:
+        >>> for record in iter_json_items('export.json.gz'):  # [{...}, {...}, ...]
+        ...     print(record['id'])
+        >>> list(iter_json_items(io.StringIO('{"data": {"rows": [1, 2]}}'), 'data.rows.item'))
+        [1, 2]
+
+    Args:
+        source: file to read, or a text stream. Compressed files and '-' (stdin) are
+            supported, see `open_file()`.
+        prefix: path of the values, see the module docstring. '' yields the whole document.
+        **kwargs: keyword arguments passed to 'json.JSONDecoder()', like `object_hook`.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open_file(source, "r", encoding="utf8") as f:
+            yield from iter_json_items(f, prefix, **kwargs)
+        return
+
+    reader = _Reader(source, json.JSONDecoder(**kwargs))
+    yield from _walk(reader, prefix.split(".") if prefix else [])
+    if reader.peek() != "":
+        raise reader.error("the end of the document")
+
+
+def json_to_json_lines(
+    source: Union[os.PathLike, TextIO],
+    out_path: os.PathLike,
+    prefix: str = "item",
+    **kwargs,
+) -> int:
+    """Convert the values at a path of a json document to a json lines file.
+
+    The document is read incrementally with `iter_json_items()`, so it does not need to fit
+    in memory.
+
+    Example:
+        >>> json_to_json_lines('export.json', 'export.jsonl.gz')
+
+    Args:
+        source: json file or text stream.
+        out_path: output file. Can be compressed or '-' (stdout).
+        prefix: path of the values, see the module docstring.
+        **kwargs: keyword arguments passed to 'json.dumps()'
+
+    Returns: number of records written.
+    """
+    count = 0
+    with JSONLinesWriter(out_path, **kwargs) as writer:
+        for item in iter_json_items(source, prefix):
+            writer.add_one(item)
+            count += 1
+    return count
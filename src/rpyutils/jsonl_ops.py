@@ -0,0 +1,901 @@
+"""Streaming operations on json lines files.
+
+This file contains the functions behind the `rpyutils jsonl` command line tool.
+Inputs are read one line at a time, so memory use does not depend on the size of the files.
+Every path can be '-' for stdin or stdout, or a compressed file (see `r_utils.open_file()`).
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+from collections import deque
+from functools import partial
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .r_utils import COMPRESSED_SUFFIXES, JSONLinesWriter, open_file, write_json
+
+# Size of the blocks read by the byte level functions.
+BLOCK_SIZE = 1 << 20
+# Plain files smaller than this are counted in one process.
+PARALLEL_MIN_BYTES = 64 << 20
+# Parsed records take about this many times the size of their json text in memory.
+PARSED_SIZE_FACTOR = 8
+# At most this many sorted runs are merged at once. More runs are merged in several passes.
+MAX_MERGE_FAN_IN = 128
+# Characters buffered by one partition shard over all its buckets at most.
+MAX_PARTITION_BUFFER = 64 << 20
+
+
+def is_plain_file(path: os.PathLike) -> bool:
+    """True if `path` is a regular uncompressed file, so it can be read from any offset."""
+    path = str(path)
+    return path != "-" and not path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def byte_ranges(path: os.PathLike, n_ranges: int) -> List[Tuple[int, int]]:
+    """Split a file into about `n_ranges` (start, end) byte ranges that start at a line.
+
+    Each line belongs to exactly one range, so the ranges can be processed in parallel.
+
+    Args:
+        path: uncompressed file.
+        n_ranges: number of ranges. Fewer ranges are returned for small files.
+
+    Returns: list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(path)
+    n_ranges = max(1, min(n_ranges, size))
+    starts = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n_ranges):
+            # Move to the first line that starts at or after the cut.
+            f.seek(i * size // n_ranges - 1)
+            f.readline()
+            start = f.tell()
+            if starts[-1] < start < size:
+                starts.append(start)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _count_newlines(args) -> int:
+    path, start, end = args
+    count = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            count += block.count(b"\n")
+            remaining -= len(block)
+    return count
+
+
+def count_lines(path: os.PathLike, workers: Optional[int] = None) -> int:
+    """Count the lines of a file. A last line without a trailing newline is counted too.
+
+    Large plain files are split into byte ranges that are counted by a pool of processes.
+    Compressed files and stdin are counted in one pass over fixed size blocks.
+
+    Args:
+        path: file to count, or '-' for stdin.
+        workers: number of processes. Defaults to `os.cpu_count()`.
+
+    Returns: number of lines.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    if not is_plain_file(path):
+        count = 0
+        last = b"\n"
+        with open_file(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                count += block.count(b"\n")
+                last = block[-1:]
+        return count + (last != b"\n")
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    tasks = [(path, start, end) for start, end in byte_ranges(path, workers)]
+    if workers > 1 and len(tasks) > 1 and size >= PARALLEL_MIN_BYTES:
+        import multiprocessing as mp
+
+        with mp.Pool(processes=min(workers, len(tasks))) as pool:
+            count = sum(pool.map(_count_newlines, tasks))
+    else:
+        count = sum(map(_count_newlines, tasks))
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        last = f.read(1)
+    return count + (last != b"\n")
+
+
+def iter_lines(path: os.PathLike) -> Iterator[str]:
+    """Yield the non-empty lines of a file, always ending with a newline."""
+    with open_file(path, "r") as f:
+        for line in f:
+            if line.strip() == "":
+                continue
+            yield line if line.endswith("\n") else line + "\n"
+
+
+def cat_lines(paths: Iterable[os.PathLike]) -> Iterator[str]:
+    """Yield the non-empty lines of several files, one file after the other."""
+    for path in paths:
+        yield from iter_lines(path)
+
+
+def head_lines(path: os.PathLike, n: int = 10) -> List[str]:
+    """Return the first `n` non-empty lines of a file. Only these lines are read."""
+    return list(islice(iter_lines(path), n))
+
+
+def _tail_plain_file(path: os.PathLike, n: int) -> List[str]:
+    """Read blocks backwards from the end of the file until `n` lines are found."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b""
+        while end > 0 and data.count(b"\n") <= n:
+            start = max(0, end - BLOCK_SIZE)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    lines = [line for line in data.decode().splitlines() if line.strip() != ""]
+    return [line + "\n" for line in lines[-n:]] if n > 0 else []
+
+
+def tail_lines(path: os.PathLike, n: int = 10) -> List[str]:
+    """Return the last `n` non-empty lines of a file.
+
+    Plain files are read backwards from the end, so only the end of the file is read.
+    Compressed files and stdin are streamed and only the last `n` lines are kept in memory.
+    """
+    if is_plain_file(path):
+        return _tail_plain_file(path, n)
+    return list(deque(iter_lines(path), maxlen=n)) if n > 0 else []
+
+
+def iter_range_lines(path: os.PathLike, start: int, end: int) -> Iterator[str]:
+    """Yield the non-empty lines of a plain file that start in the byte range [start, end).
+
+    `start` must be the start of a line, like the ranges of `byte_ranges()`.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            text = line.decode()
+            if text.strip() == "":
+                continue
+            yield text if text.endswith("\n") else text + "\n"
+
+
+def _bottom_k(
+    items: Iterable,
+    k: int,
+    rng: random.Random,
+    key: Optional[Callable[[Any], Any]] = None,
+    weight: Optional[Callable[[Any], float]] = None,
+    origin: int = 0,
+) -> Dict[Any, List[Tuple]]:
+    """Keep the `k` items with the smallest random priorities of each stratum.
+
+    Uniform priorities are `u ~ U(0, 1)`. Weighted priorities are `-log(u) / w`, i.e.
+    exponential with rate `w` (Efraimidis and Spirakis). The priorities of all items are
+    independent, so the reservoirs of disjoint parts of the input are merged by keeping the
+    smallest priorities again, see `_merge_reservoirs()`.
+
+    Returns: max heaps of `(-priority, origin, position, item)` keyed by stratum.
+    """
+    heaps = dict()
+    for position, item in enumerate(items):
+        u = rng.random()
+        if weight is not None:
+            w = weight(item)
+            if w < 0:
+                msg = f"Weights must not be negative, got {w} at position {position}."
+                raise ValueError(msg)
+            if w == 0:
+                continue
+            # 1 - u is in (0, 1], so the logarithm is defined.
+            priority = -math.log(1.0 - u) / w
+        else:
+            priority = u
+        heap = heaps.setdefault(key(item) if key is not None else None, [])
+        # Positions are unique, so items are never compared.
+        if len(heap) < k:
+            heapq.heappush(heap, (-priority, origin, position, item))
+        elif priority < -heap[0][0]:
+            heapq.heapreplace(heap, (-priority, origin, position, item))
+    return heaps
+
+
+def _merge_reservoirs(reservoirs: Iterable[Dict[Any, List[Tuple]]], k: int) -> List:
+    """Merge the outputs of `_bottom_k()` and return the sampled items in input order."""
+    strata = dict()
+    for heaps in reservoirs:
+        for stratum, heap in heaps.items():
+            strata.setdefault(stratum, []).extend(heap)
+    entries = list()
+    for heap in strata.values():
+        entries.extend(heapq.nlargest(k, heap))
+    entries.sort(key=lambda e: (e[1], e[2]))
+    return [e[3] for e in entries]
+
+
+def reservoir_sample(
+    items: Iterable,
+    k: int,
+    seed: Optional[int] = None,
+    key: Optional[Callable[[Any], Any]] = None,
+    weight: Optional[Callable[[Any], float]] = None,
+) -> List:
+    """Sample `k` items of an iterable in one pass, keeping only the sample in memory.
+
+    Example:
+        >>> reservoir_sample(range(1_000_000), 3, seed=0)
+        >>> reservoir_sample(records, 10, key=lambda r: r['lang'])  # 10 of each language
+        >>> reservoir_sample(records, 10, weight=lambda r: r['count'])
+
+    Args:
+        items: any iterable, e.g. a generator.
+        k: sample size. With `key`, sample size of each stratum.
+        seed: seed of the random number generator.
+        key: function of an item that returns its stratum. `k` items are sampled from
+            each stratum.
+        weight: function of an item that returns its weight. Items are sampled with
+            probability proportional to their weight, without replacement. Items with weight
+            0 are never sampled.
+
+    Returns: the sampled items, in their input order. All items if there are at most `k`.
+    """
+    if k < 0:
+        msg = f"'k' must not be negative, got {k}."
+        raise ValueError(msg)
+    heaps = _bottom_k(items, k, random.Random(seed), key, weight)
+    return _merge_reservoirs([heaps], k)
+
+
+def _sample_range(args) -> Dict[Any, List[Tuple]]:
+    path, start, end, k, seed, key, weight, parse, origin = args
+    lines = iter_range_lines(path, start, end)
+    items = map(parse, lines) if parse is not None else lines
+    return _bottom_k(items, k, random.Random(seed), key, weight, origin=origin)
+
+
+def _sample(
+    path: os.PathLike,
+    k: int,
+    seed: Optional[int],
+    key: Optional[Callable],
+    weight: Optional[Callable],
+    parse: Optional[Callable[[str], Any]],
+    workers: int,
+) -> List:
+    """Sample the lines of a file, parsed with `parse` if given, in one or more processes."""
+    if k < 0:
+        msg = f"'k' must not be negative, got {k}."
+        raise ValueError(msg)
+    if (
+        workers > 1
+        and is_plain_file(path)
+        and os.path.getsize(path) >= PARALLEL_MIN_BYTES
+    ):
+        import multiprocessing as mp
+
+        tasks = list()
+        for i, (start, end) in enumerate(byte_ranges(path, workers)):
+            # Each range has its own random numbers, so the sample depends on `workers`.
+            range_seed = None if seed is None else f"{seed}/{i}"
+            tasks.append((path, start, end, k, range_seed, key, weight, parse, i))
+        with mp.Pool(processes=min(workers, len(tasks))) as pool:
+            return _merge_reservoirs(pool.imap_unordered(_sample_range, tasks), k)
+
+    lines = iter_lines(path)
+    items = map(parse, lines) if parse is not None else lines
+    return reservoir_sample(items, k, seed, key, weight)
+
+
+def _field_function(field: Union[str, Callable, None], default: Any = None):
+    # Dotted paths are turned into picklable functions, so they can be sent to workers.
+    if isinstance(field, str):
+        return partial(get_field, field=field, default=default)
+    return field
+
+
+def sample_lines(
+    path: os.PathLike,
+    k: int = 10,
+    seed: Optional[int] = None,
+    workers: int = 1,
+) -> List[str]:
+    """Return `k` non-empty lines picked uniformly at random, in file order.
+
+    The file is read once and only `k` lines are kept in memory, see `reservoir_sample()`.
+    Lines are not parsed.
+
+    Args:
+        path: file to read.
+        k: sample size.
+        seed: seed of the random number generator.
+        workers: number of processes for large plain files, see `sample_json_lines()`.
+
+    Returns: the sampled lines. All lines if the file has at most `k` of them.
+    """
+    return _sample(path, k, seed, None, None, None, workers)
+
+
+def sample_json_lines(
+    path: os.PathLike,
+    k: int = 10,
+    seed: Optional[int] = None,
+    key: Union[str, Callable[[Any], Any], None] = None,
+    weight: Union[str, Callable[[Any], float], None] = None,
+    workers: int = 1,
+    **kwargs,
+) -> List[Any]:
+    """Sample `k` records of a json lines file in one streaming pass.
+
+    Unlike `head_json_lines()` the sample is not biased toward the start of the file, and
+    unlike `random.sample(read_json_lines(path), k)` only the sample is kept in memory.
+    Without `key` and `weight` only the sampled lines are parsed.
+
+    Large plain files can be sampled by several processes. The file is split with
+    `byte_ranges()`, each worker samples its range, and the reservoirs are merged by their
+    random priorities, so the result is a sample of the whole file with the same
+    distribution as the one of a single pass.
+
+    Example:
+        >>> sample_json_lines('data.jsonl.gz', 100, seed=0)
+        >>> sample_json_lines('data.jsonl', 10, key='meta.lang')  # 10 per language
+        >>> sample_json_lines('data.jsonl', 100, weight='count', workers=8)
+
+    Args:
+        path: file to read. Compressed files and '-' (stdin) are read in one process.
+        k: sample size. With `key`, sample size of each stratum.
+        seed: seed of the random number generator. The sample also depends on `workers`.
+        key: stratify by this dotted field path (see `get_field()`) or function of a
+            record.
+        weight: sample proportionally to this dotted field path or function of a record.
+            Records with a missing or zero weight are never sampled. Functions must be
+            picklable if `workers > 1`.
+        workers: number of processes. Only used for plain files of at least
+            `PARALLEL_MIN_BYTES`.
+        **kwargs: keyword arguments passed to 'json.loads()'
+
+    Returns: the sampled records, in file order.
+    """
+    parse = partial(json.loads, **kwargs)
+    if key is None and weight is None:
+        lines = _sample(path, k, seed, None, None, None, workers)
+        return [parse(line) for line in lines]
+    key, weight = _field_function(key), _field_function(weight, default=0)
+    return _sample(path, k, seed, key, weight, parse, workers)
+
+
+def split_lines(
+    path: os.PathLike,
+    out_pattern: str,
+    lines: Optional[int] = None,
+    parts: Optional[int] = None,
+) -> List[str]:
+    """Split a file into several files.
+
+    Example:
+        >>> split_lines('data.jsonl.gz', 'shards/part-{index:04d}.jsonl', lines=100_000)
+
+    Args:
+        path: file to split.
+        out_pattern: path of the output files. '{index}' is replaced with the part number,
+            with 'str.format()'. Output files can be compressed.
+        lines: start a new file every `lines` lines.
+        parts: write to this many files. Lines are dealt round robin, so the input is read
+            only once and does not need to be counted.
+
+    Returns: paths of the written files.
+    """
+    if (lines is None) == (parts is None):
+        msg = "Specify exactly one of 'lines' and 'parts'."
+        raise ValueError(msg)
+    if (lines if parts is None else parts) < 1:
+        msg = f"'lines' and 'parts' must be positive, got lines={lines}, parts={parts}."
+        raise ValueError(msg)
+    if out_pattern.format(index=0) == out_pattern.format(index=1):
+        msg = f"'out_pattern' must contain '{{index}}', got '{out_pattern}'."
+        raise ValueError(msg)
+
+    out_paths = list()
+    if parts is not None:
+        out_paths = [out_pattern.format(index=i) for i in range(parts)]
+        out_files = [open_file(p, "w") for p in out_paths]
+        try:
+            for i, line in enumerate(iter_lines(path)):
+                out_files[i % parts].write(line)
+        finally:
+            for f in out_files:
+                f.close()
+        return out_paths
+
+    out_file = None
+    try:
+        for i, line in enumerate(iter_lines(path)):
+            if i % lines == 0:
+                if out_file is not None:
+                    out_file.close()
+                out_paths.append(out_pattern.format(index=len(out_paths)))
+                out_file = open_file(out_paths[-1], "w")
+            out_file.write(line)
+    finally:
+        if out_file is not None:
+            out_file.close()
+    return out_paths
+
+
+def get_field(record: Any, field: str, default: Any = None) -> Any:
+    """Get a nested value with a dotted path like 'user.name' or 'tags.0'.
+
+    Returns `default` if any part of the path is missing.
+    """
+    value = record
+    for key in field.split("."):
+        if isinstance(value, dict):
+            if key not in value:
+                return default
+            value = value[key]
+        elif isinstance(value, list) and key.lstrip("-").isdigit():
+            try:
+                value = value[int(key)]
+            except IndexError:
+                return default
+        else:
+            return default
+    return value
+
+
+def select_fields(record: Any, fields: Sequence[str]) -> Dict[str, Any]:
+    """Project a record to `fields`. Keys of the output are the dotted paths of the fields.
+
+    Missing fields are None.
+    """
+    return {field: get_field(record, field) for field in fields}
+
+
+class FieldSelector:
+    """Picklable function that applies `select_fields()`, for use with `map_json_lines()`."""
+
+    def __init__(self, fields: Sequence[str]) -> None:
+        self.fields = list(fields)
+
+    def __call__(self, record: Any) -> Dict[str, Any]:
+        return select_fields(record, self.fields)
+
+
+class RecordFilter:
+    """Picklable predicate built from a Python expression, for use with `map_json_lines()`.
+
+    The record is bound to `r`, and `get(path, default=None)` reads a dotted path of it.
+    Calling the filter returns the record if the expression is true and None otherwise.
+
+    Example:
+        >>> keep = RecordFilter("r['score'] > 0.5 and get('meta.lang') == 'en'")
+        >>> keep({'score': 0.9, 'meta': {'lang': 'en'}})
+        {'score': 0.9, 'meta': {'lang': 'en'}}
+    """
+
+    def __init__(self, expr: str) -> None:
+        self.expr = expr
+        self.code = compile(expr, "<filter>", "eval")
+
+    def __getstate__(self):
+        # Code objects can not be pickled. Workers compile the expression again.
+        return {"expr": self.expr}
+
+    def __setstate__(self, state):
+        self.__init__(state["expr"])
+
+    def __call__(self, record: Any) -> Optional[Any]:
+        scope = {
+            "r": record,
+            "get": lambda field, default=None: get_field(record, field, default),
+        }
+        return record if eval(self.code, scope) else None
+
+
+def map_records(func, lines: Iterable[str], **kwargs) -> Iterator[str]:
+    """Apply `func` to the records of json lines in this process. None outputs are dropped.
+
+    Args:
+        func: called with each record.
+        lines: json lines.
+        **kwargs: keyword arguments passed to 'json.dumps()'
+    """
+    for line in lines:
+        out = func(json.loads(line))
+        if out is not None:
+            yield json.dumps(out, **kwargs) + "\n"
+
+
+class SortKey:
+    """Picklable sort key of a record, built from dotted field paths or a function.
+
+    With field paths, missing values (None) sort after all other values, also when sorting
+    with `reverse=True` if the key is built with the same `reverse`. Several fields give a
+    list key, compared field by field.
+
+    Example:
+        >>> SortKey('user.id')({'user': {'id': 3}})
+        [False, 3]
+        >>> SortKey(['lang', 'score'])({'score': 0.5})
+        [[True, None], [False, 0.5]]
+
+    Args:
+        key: a dotted field path, a list of them, or a function of a record. Keys must be
+            json serializable and comparable with each other.
+        reverse: the keys are sorted in descending order.
+    """
+
+    def __init__(
+        self,
+        key: Union[str, Sequence[str], Callable[[Any], Any]],
+        reverse: bool = False,
+    ) -> None:
+        self.func = key if callable(key) else None
+        self.fields = [key] if isinstance(key, str) else key
+        self.single = isinstance(key, str)
+        self.reverse = reverse
+
+    def __call__(self, record: Any) -> Any:
+        if self.func is not None:
+            return self.func(record)
+        values = list()
+        for field in self.fields:
+            value = get_field(record, field)
+            # The flag sorts before the value, so None goes last in either direction.
+            values.append([(value is None) != self.reverse, value])
+        return values[0] if self.single else values
+
+
+def _unique_keys(items: Iterable[Sequence]) -> Iterator[Sequence]:
+    """Drop the `(key, record)` pairs with the same key as the previous one."""
+    previous = object()
+    for item in items:
+        if item[0] != previous:
+            previous = item[0]
+            yield item
+
+
+def _write_runs(
+    lines: Iterable[str],
+    key: Callable[[Any], Any],
+    reverse: bool,
+    unique: bool,
+    max_memory: int,
+    run_prefix: str,
+) -> List[str]:
+    """Sort the records in memory `max_memory` bytes at a time and write them as runs.
+
+    Runs are json lines files of `[key, record]`, so the keys are not computed again when
+    merging.
+    """
+    runs = list()
+    buffer = list()
+    size = 0
+
+    def write_run():
+        buffer.sort(key=lambda item: item[0], reverse=reverse)
+        runs.append(f"{run_prefix}-{len(runs):06d}.jsonl")
+        with JSONLinesWriter(runs[-1], chunk_size=10_000) as writer:
+            writer.add(_unique_keys(buffer) if unique else buffer)
+        buffer.clear()
+
+    for line in lines:
+        record = json.loads(line)
+        buffer.append((key(record), record))
+        size += len(line) * PARSED_SIZE_FACTOR
+        if size >= max_memory:
+            write_run()
+            size = 0
+    if buffer:
+        write_run()
+    return runs
+
+
+def _range_runs(args) -> List[str]:
+    path, start, end, key, reverse, unique, max_memory, run_prefix = args
+    lines = iter_range_lines(path, start, end)
+    return _write_runs(lines, key, reverse, unique, max_memory, run_prefix)
+
+
+def _iter_run(path: os.PathLike) -> Iterator[List]:
+    with open(path, "r") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _merge_runs(runs: Sequence[str], reverse: bool, unique: bool) -> Iterator[List]:
+    """K-way merge of sorted runs. Ties keep the order of the runs, so the sort is stable."""
+    merged = heapq.merge(
+        *[_iter_run(run) for run in runs], key=lambda item: item[0], reverse=reverse
+    )
+    return _unique_keys(merged) if unique else merged
+
+
+def sort_json_lines(
+    path: os.PathLike,
+    out_path: os.PathLike,
+    key: Union[str, Sequence[str], Callable[[Any], Any]],
+    reverse: bool = False,
+    unique: bool = False,
+    max_memory: int = 512 << 20,
+    workers: int = 1,
+    tmp_dir: Optional[os.PathLike] = None,
+    **kwargs,
+) -> int:
+    """Sort a json lines file by a key, also if it does not fit in memory.
+
+    External merge sort: the records are sorted in memory in runs of about `max_memory`
+    bytes, which are written to temporary files with `JSONLinesWriter` and then merged with
+    `heapq.merge()`. Each line of a run holds the key next to the record, so keys are
+    computed only once. The sort is stable.
+
+    Example:
+        >>> sort_json_lines('data.jsonl.gz', 'sorted.jsonl.gz', key='user.id')
+        >>> sort_json_lines('data.jsonl', 'dedup.jsonl', key=['url'], unique=True, workers=8)
+
+    Args:
+        path: file to sort. Compressed files and '-' (stdin) are read in one process.
+        out_path: output file. Can be compressed or '-' (stdout).
+        key: dotted field path, list of field paths or picklable function of a record, see
+            `SortKey`. Records with missing fields sort last.
+        reverse: sort in descending order.
+        unique: keep only the first record (in input order) of each key.
+        max_memory: approximate memory used by the records in memory, in bytes. Parsed
+            records are estimated at `PARSED_SIZE_FACTOR` times the size of their json.
+        workers: number of processes creating the runs. Plain files of at least
+            `PARALLEL_MIN_BYTES` are split with `byte_ranges()` and each process sorts one
+            range with `max_memory / workers` bytes.
+        tmp_dir: directory of the temporary files. Defaults to the system default.
+        **kwargs: keyword arguments passed to 'json.dumps()' for the output.
+
+    Returns: number of records written.
+    """
+    import tempfile
+
+    key = SortKey(key, reverse)
+    with tempfile.TemporaryDirectory(prefix="rpyutils-sort-", dir=tmp_dir) as tmp:
+        if (
+            workers > 1
+            and is_plain_file(path)
+            and os.path.getsize(path) >= PARALLEL_MIN_BYTES
+        ):
+            import multiprocessing as mp
+
+            tasks = list()
+            for i, (start, end) in enumerate(byte_ranges(path, workers)):
+                run_prefix = os.path.join(tmp, f"range-{i:04d}")
+                budget = max_memory // workers
+                tasks.append(
+                    (path, start, end, key, reverse, unique, budget, run_prefix)
+                )
+            with mp.Pool(processes=min(workers, len(tasks))) as pool:
+                # Runs stay in input order, which keeps the merge stable.
+                runs = [run for runs in pool.map(_range_runs, tasks) for run in runs]
+        else:
+            run_prefix = os.path.join(tmp, "run")
+            runs = _write_runs(
+                iter_lines(path), key, reverse, unique, max_memory, run_prefix
+            )
+
+        # Merge consecutive runs until few enough are left to open at once.
+        n_pass = 0
+        while len(runs) > MAX_MERGE_FAN_IN:
+            merged_runs = list()
+            for i in range(0, len(runs), MAX_MERGE_FAN_IN):
+                merged_runs.append(os.path.join(tmp, f"merge-{n_pass}-{i:06d}.jsonl"))
+                with JSONLinesWriter(merged_runs[-1], chunk_size=10_000) as writer:
+                    group = runs[i : i + MAX_MERGE_FAN_IN]
+                    writer.add(_merge_runs(group, reverse, unique))
+                for run in runs[i : i + MAX_MERGE_FAN_IN]:
+                    os.remove(run)
+            runs = merged_runs
+            n_pass += 1
+
+        merged = _merge_runs(runs, reverse, unique)
+        counter = itertools.count()
+        with JSONLinesWriter(out_path, **kwargs) as writer:
+            # zip() stops at the end of `merged` without advancing `counter`.
+            writer.add(record for (_, record), _ in zip(merged, counter))
+    return next(counter)
+
+
+def stable_bucket(value: Any, n_buckets: int) -> int:
+    """Bucket of a json serializable value, the same in every process and Python run.
+
+    Unlike `hash()`, which is salted per process for strings, this uses blake2b of the
+    canonical json of the value.
+    """
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.blake2b(text.encode("utf8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n_buckets
+
+
+def _partition_shard(args) -> Tuple[List[int], List[int]]:
+    """Route the lines of one input shard to per-bucket part files.
+
+    Lines are buffered per bucket and appended to the part file of the bucket when the
+    buffer is full, so the number of open files does not depend on `n_buckets`.
+
+    Returns: number of records and of characters written to each bucket.
+    """
+    path, start, end, key, n_buckets, part_pattern, buffer_size = args
+    lines = iter_lines(path) if start is None else iter_range_lines(path, start, end)
+    records = [0] * n_buckets
+    chars = [0] * n_buckets
+    buffers = [[] for _ in range(n_buckets)]
+    buffered = [0] * n_buckets
+
+    def flush(bucket):
+        with open_file(part_pattern.format(bucket=bucket), "a") as f:
+            f.writelines(buffers[bucket])
+        buffers[bucket].clear()
+        buffered[bucket] = 0
+
+    for line in lines:
+        bucket = stable_bucket(key(json.loads(line)), n_buckets)
+        # Lines are written as they are, without serializing the records again.
+        buffers[bucket].append(line)
+        buffered[bucket] += len(line)
+        records[bucket] += 1
+        chars[bucket] += len(line)
+        if buffered[bucket] >= buffer_size:
+            flush(bucket)
+    for bucket in range(n_buckets):
+        if buffers[bucket]:
+            flush(bucket)
+    return records, chars
+
+
+def partition_json_lines(
+    inputs: Union[os.PathLike, Sequence[os.PathLike]],
+    key: Union[str, Sequence[str], Callable[[Any], Any]],
+    n_buckets: int,
+    out_dir: os.PathLike,
+    workers: int = 1,
+    suffix: str = ".jsonl",
+    buffer_size: int = 1 << 20,
+) -> Dict[str, Any]:
+    """Hash partition json lines files into `n_buckets` files by a key.
+
+    All records with the same key end up in the same bucket file, so buckets can be grouped,
+    joined or deduplicated independently, e.g. by one process each. Records are routed by
+    `stable_bucket()` of the key, and written as they are read, without being serialized
+    again. Within a bucket, records keep their input order.
+
+    Inputs are processed by a pool of processes, one input shard at a time. Shards are the
+    input files, and plain files of at least `PARALLEL_MIN_BYTES` are split into byte ranges
+    with `byte_ranges()`. Each shard writes its own part of each bucket through buffered
+    writers, and the parts are concatenated in input order at the end.
+
+    Example:
+        >>> partition_json_lines(['a.jsonl', 'b.jsonl.gz'], 'user.id', 64, 'by_user', workers=8)
+        >>> # by_user/bucket-00000.jsonl ... by_user/bucket-00063.jsonl, by_user/manifest.json
+
+    Args:
+        inputs: one or more input files. Compressed files and '-' (stdin) are supported,
+            stdin is read by the calling process.
+        key: dotted field path, list of field paths or picklable function of a record, see
+            `SortKey`. Its value must be json serializable.
+        n_buckets: number of output files.
+        out_dir: output directory. Bucket files are named 'bucket-{index:05d}{suffix}'.
+        workers: number of processes.
+        suffix: suffix of the bucket files, e.g. '.jsonl.gz' for compressed files.
+        buffer_size: characters buffered per bucket and shard before they are written. It is
+            lowered to `MAX_PARTITION_BUFFER // n_buckets`, so the buffers of a shard hold at
+            most `MAX_PARTITION_BUFFER` characters in total.
+
+    Returns: the manifest, also written to 'manifest.json' in `out_dir`. It lists the
+        path, number of records and size on disk of each bucket.
+    """
+    import shutil
+
+    if n_buckets < 1:
+        msg = f"'n_buckets' must be positive, got {n_buckets}."
+        raise ValueError(msg)
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    key = SortKey(key)
+    buffer_size = max(min(buffer_size, MAX_PARTITION_BUFFER // n_buckets), 1)
+    out_dir = os.fspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    bucket_paths = [
+        os.path.join(out_dir, f"bucket-{bucket:05d}{suffix}")
+        for bucket in range(n_buckets)
+    ]
+
+    # Parts are appended to, so remove those left by an interrupted run.
+    for name in os.listdir(out_dir):
+        if name.startswith(".part-"):
+            os.remove(os.path.join(out_dir, name))
+
+    tasks = list()
+    for path in inputs:
+        if (
+            workers > 1
+            and is_plain_file(path)
+            and os.path.getsize(path) >= PARALLEL_MIN_BYTES
+        ):
+            ranges = byte_ranges(path, workers)
+        else:
+            ranges = [(None, None)]
+        for start, end in ranges:
+            part_pattern = os.path.join(
+                out_dir, f".part-{len(tasks):05d}-{{bucket:05d}}{suffix}"
+            )
+            tasks.append((path, start, end, key, n_buckets, part_pattern, buffer_size))
+
+    # Stdin is only readable by this process, so it is read here while the pool reads the
+    # files.
+    stdin_tasks = [i for i, task in enumerate(tasks) if str(task[0]) == "-"]
+    pool_tasks = [i for i, task in enumerate(tasks) if str(task[0]) != "-"]
+    counts = [None] * len(tasks)
+    if workers > 1 and len(pool_tasks) > 1:
+        import multiprocessing as mp
+
+        with mp.Pool(processes=min(workers, len(pool_tasks))) as pool:
+            result = pool.map_async(_partition_shard, [tasks[i] for i in pool_tasks])
+            for i in stdin_tasks:
+                counts[i] = _partition_shard(tasks[i])
+            for i, count in zip(pool_tasks, result.get()):
+                counts[i] = count
+    else:
+        counts = list(map(_partition_shard, tasks))
+
+    # Compressed streams can be concatenated too: gzip, bz2 and xz read all the members.
+    for bucket, bucket_path in enumerate(bucket_paths):
+        with open(bucket_path, "wb") as out_file:
+            for task in tasks:
+                part_path = task[5].format(bucket=bucket)
+                if os.path.exists(part_path):
+                    with open(part_path, "rb") as part_file:
+                        shutil.copyfileobj(part_file, out_file, BLOCK_SIZE)
+                    os.remove(part_path)
+
+    manifest = {
+        "inputs": [os.fspath(path) for path in inputs],
+        "key": key.fields if key.func is None else repr(key.func),
+        "n_buckets": n_buckets,
+        "records": sum(sum(records) for records, _ in counts),
+        "buckets": [
+            {
+                "path": os.path.basename(bucket_path),
+                "records": sum(records[bucket] for records, _ in counts),
+                "chars": sum(chars[bucket] for _, chars in counts),
+                "bytes": os.path.getsize(bucket_path),
+            }
+            for bucket, bucket_path in enumerate(bucket_paths)
+        ],
+    }
+    write_json(manifest, os.path.join(out_dir, "manifest.json"), indent=2)
+    return manifest
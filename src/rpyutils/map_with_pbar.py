@@ -1,31 +1,297 @@
+import json
 import multiprocessing as mp
 import os
+import queue
+import sys
+import threading
 import time
+import warnings
+from multiprocessing.util import Finalize
 
 from tqdm import tqdm as local_tqdm
 
 
+class ProgressReporter:
+    """Count finished tasks inside a worker and send them to the parent in batches.
+
+    A batch is sent once `report_every` tasks are done or `report_interval` seconds have
+    passed since the last report, whichever comes first. Counts are keyed by the worker pid,
+    so a worker that replaces a recycled one (`maxtasksperchild`) gets its own entry.
+    """
+
+    def __init__(self, progress_queue, report_every=1_000, report_interval=0.5):
+        self.queue = progress_queue
+        self.report_every = report_every
+        self.report_interval = report_interval
+        self.pid = os.getpid()
+        self.pending = 0
+        self.last_report = time.monotonic()
+        # Send the last partial batch when the worker exits after `maxtasksperchild` tasks.
+        Finalize(self, self.flush, exitpriority=10)
+
+    def task_done(self):
+        self.pending += 1
+        if (
+            self.pending >= self.report_every
+            or time.monotonic() - self.last_report >= self.report_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.queue.put((self.pid, self.pending))
+            self.pending = 0
+        self.last_report = time.monotonic()
+
+
+class ProgressMonitor(threading.Thread):
+    """Aggregate worker reports in a thread of the parent process and draw progress bars.
+
+    The main bar shows the total throughput and ETA. With `show_workers=True` there is also
+    one bar per worker process with its own throughput and the ETA of its share of the
+    remaining tasks.
+    """
+
+    def __init__(self, total, progress_queue, update_interval=0.5, show_workers=False):
+        super().__init__(daemon=True)
+        self.total = total
+        self.queue = progress_queue
+        self.update_interval = update_interval
+        self.show_workers = show_workers
+        self.pbar = local_tqdm(total=total)
+        self.worker_pbars = dict()
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.drain(timeout=self.update_interval)
+
+    def drain(self, timeout=0):
+        """Apply all the reports in the queue. Wait up to `timeout` for the first one."""
+        counts = dict()
+        try:
+            pid, n = self.queue.get(timeout=timeout)
+            counts[pid] = n
+            while True:
+                pid, n = self.queue.get_nowait()
+                counts[pid] = counts.get(pid, 0) + n
+        except queue.Empty:
+            pass
+        if counts:
+            self.update(counts)
+
+    def update(self, counts):
+        self.pbar.update(min(sum(counts.values()), self.total - self.pbar.n))
+        if not self.show_workers:
+            return
+        for pid, n in counts.items():
+            if pid not in self.worker_pbars:
+                self.worker_pbars[pid] = local_tqdm(
+                    desc=f"pid {pid}",
+                    position=len(self.worker_pbars) + 1,
+                    leave=False,
+                )
+            self.worker_pbars[pid].update(n)
+        active = [b for b in self.worker_pbars.values() if b.n]
+        remaining = self.total - self.pbar.n
+        for worker_pbar in active:
+            elapsed = worker_pbar.format_dict["elapsed"]
+            if elapsed <= 0:
+                continue
+            share = remaining / len(active)
+            eta = local_tqdm.format_interval(share * elapsed / worker_pbar.n)
+            worker_pbar.set_postfix_str(f"eta {eta}")
+
+    def finish(self, completed):
+        """Stop the thread and set the progress to `completed` tasks."""
+        self.stop_event.set()
+        self.join()
+        self.drain(timeout=0)
+        # Reports of workers killed by `pool.terminate()` never arrive. The results did.
+        self.pbar.update(completed - self.pbar.n)
+        for worker_pbar in self.worker_pbars.values():
+            worker_pbar.close()
+        self.pbar.close()
+
+
+# Thread pools of the common BLAS/OpenMP runtimes read these when they are loaded.
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# Modules that start a multi-threaded BLAS/OpenMP runtime by default.
+THREADED_MODULES = ("numpy", "scipy", "torch", "sklearn", "numexpr")
+
+
+def available_cpus():
+    """Return the set of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count()))
+
+
+def parse_cpu_list(cpu_list):
+    """Parse a Linux cpu list like '0-3,8,10-11' into a set of CPU ids."""
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if part == "":
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def numa_node_cpus(node):
+    """Return the set of CPUs that belong to a NUMA node (Linux only)."""
+    path = f"/sys/devices/system/node/node{node}/cpulist"
+    try:
+        with open(path, "r") as f:
+            return parse_cpu_list(f.read())
+    except FileNotFoundError:
+        msg = f"NUMA node {node} not found: '{path}' does not exist."
+        raise ValueError(msg)
+
+
+def worker_cpu_sets(pool_size, cpu_affinity=None, numa_node=None):
+    """Compute the CPU set of each worker slot.
+
+    Args:
+        pool_size: number of worker processes.
+        cpu_affinity: one of
+            - None: do not pin workers, unless `numa_node` is given.
+            - 'auto': split the available CPUs into `pool_size` disjoint sets.
+            - a list of CPU ids: all workers share this set.
+            - a list of lists of CPU ids: one set per worker, reused round robin.
+        numa_node: only use the CPUs of this NUMA node.
+
+    Returns:
+        List of CPU sets. Worker `i` is pinned to `cpu_sets[i % len(cpu_sets)]`.
+        The list is empty if workers are not pinned.
+    """
+    if cpu_affinity is None and numa_node is None:
+        return []
+    if not hasattr(os, "sched_setaffinity"):
+        msg = "Pinning workers to CPUs needs 'os.sched_setaffinity' (Linux only)."
+        raise RuntimeError(msg)
+
+    cpus = available_cpus()
+    if numa_node is not None:
+        cpus &= numa_node_cpus(numa_node)
+        if not cpus:
+            msg = f"None of the CPUs of NUMA node {numa_node} are available."
+            raise ValueError(msg)
+
+    if cpu_affinity is None:
+        return [cpus]
+    if cpu_affinity == "auto":
+        cpus = sorted(cpus)
+        n_sets = min(pool_size, len(cpus))
+        return [set(cpus[i::n_sets]) for i in range(n_sets)]
+    cpu_affinity = list(cpu_affinity)
+    if all(isinstance(c, int) for c in cpu_affinity):
+        cpu_sets = [set(cpu_affinity)]
+    else:
+        cpu_sets = [set(c) for c in cpu_affinity]
+    if numa_node is not None:
+        cpu_sets = [c & cpus for c in cpu_sets]
+    if not all(cpu_sets):
+        msg = f"Empty CPU set in cpu_affinity: {cpu_affinity}"
+        raise ValueError(msg)
+    return cpu_sets
+
+
+def threads_per_worker(worker_threads=None):
+    """Estimate how many BLAS/OpenMP threads each worker will start."""
+    if worker_threads is not None:
+        return worker_threads
+    env_limits = [int(os.environ[v]) for v in THREAD_ENV_VARS if v in os.environ]
+    if env_limits:
+        return max(env_limits)
+    if any(m in sys.modules for m in THREADED_MODULES):
+        return len(available_cpus())
+    return 1
+
+
+def check_oversubscription(pool_size, worker_threads=None, cpu_sets=None):
+    """Warn if the workers will start more threads than there are CPUs for them."""
+    n_threads = threads_per_worker(worker_threads)
+    if n_threads <= 1:
+        return
+    n_cpus = len(available_cpus())
+    if pool_size * n_threads > n_cpus:
+        msg = (
+            f"{pool_size} workers x {n_threads} BLAS/OpenMP threads on {n_cpus} CPUs."
+            " Pass 'worker_threads' (e.g. worker_threads=1) to avoid oversubscription."
+        )
+        warnings.warn(msg, RuntimeWarning, stacklevel=3)
+    elif cpu_sets and any(n_threads > len(c) for c in cpu_sets):
+        msg = (
+            f"Workers start {n_threads} BLAS/OpenMP threads but are pinned to as few"
+            f" as {min(len(c) for c in cpu_sets)} CPUs."
+        )
+        warnings.warn(msg, RuntimeWarning, stacklevel=3)
+
+
+def limit_worker_threads(worker_threads):
+    """Limit the BLAS/OpenMP threads of the current (worker) process.
+
+    It runs in the pool initializer, so every worker sets the variables itself, including
+    the workers that replace recycled ones, and the parent's environment is not changed.
+    The environment variables only work for libraries that are not loaded yet. With the
+    'fork' start method they may already be loaded from the parent, so `threadpoolctl` is
+    used as well when it is installed.
+    """
+    os.environ.update({v: str(worker_threads) for v in THREAD_ENV_VARS})
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    global thread_limiter
+    thread_limiter = threadpool_limits(limits=worker_threads)
+
+
+def take_worker_slot(slots):
+    """Take the lowest free slot of a shared `mp.Array` of flags and return its index.
+
+    The slot is released when the worker exits, e.g. after `maxtasksperchild` tasks, so
+    the worker that replaces it gets the same slot and the live workers never share one.
+    Only worker start-up and exit take the lock, not every task.
+    """
+    with slots.get_lock():
+        free = [i for i, used in enumerate(slots) if not used]
+        # More workers than slots only happens if a worker was killed without exiting.
+        slot = free[0] if free else os.getpid() % len(slots)
+        slots[slot] = 1
+    Finalize(None, release_worker_slot, args=(slots, slot), exitpriority=10)
+    return slot
+
+
+def release_worker_slot(slots, slot):
+    with slots.get_lock():
+        slots[slot] = 0
+
+
 def init_pool_processes(args):
-    global counter_list
-    global counter_index
-    counter_list = args["counter_list"]
-    counter_index = args["index_queue"].get()
-
-
-def pbar(total, counter_var_list, update_interval=0.5):
-    prev = 0
-    pbar = local_tqdm(total=total)
-    while True:
-        new = 0
-        for counter_var in counter_var_list:
-            counter_value = counter_var.value
-            new += counter_value
-        pbar.update(new - prev)
-        prev = new
-        if prev >= total:
-            break
-        time.sleep(update_interval)
-    pbar.close()
+    global progress_reporter
+    if args["worker_threads"] is not None:
+        limit_worker_threads(args["worker_threads"])
+    if args["cpu_sets"]:
+        slot = take_worker_slot(args["slots"])
+        os.sched_setaffinity(0, args["cpu_sets"][slot % len(args["cpu_sets"])])
+    if args["progress_queue"] is None:
+        # The caller tracks progress itself, e.g. from the returned batches.
+        progress_reporter = None
+    else:
+        progress_reporter = ProgressReporter(
+            args["progress_queue"], args["report_every"], args["report_interval"]
+        )
 
 
 def worker(args):
@@ -37,42 +303,289 @@ def worker(args):
     else:
         output = func(*func_args)
 
-    with counter_list[counter_index].get_lock():
-        counter_list[counter_index].value += 1
+    progress_reporter.task_done()
 
     return output
 
 
-def map_tqdm(func, args, pool_size=None, update_interval=0.5):
+def indexed_worker(args):
+    index, task = args
+    return index, worker(task)
+
+
+def json_lines_worker(args):
+    """Parse a batch of json lines, apply the function and serialize the outputs.
+
+    If `drop_none` is True, records for which the function returns None are skipped.
+    """
+    func, lines, json_kw, drop_none = args
+    outputs = (func(json.loads(line)) for line in lines)
+    if drop_none:
+        outputs = (out for out in outputs if out is not None)
+    out_lines = [json.dumps(out, **json_kw) for out in outputs]
+    return len(lines), "".join(line + "\n" for line in out_lines)
+
+
+def read_line_batches(fp, batch_size):
+    """Yield lists of up to `batch_size` non-empty lines from a file object.
+
+    Each list comes with the number of blank lines skipped since the previous one, so
+    progress counted in lines (e.g. with 'wc -l') can include them.
+    """
+    batch = list()
+    n_blank = 0
+    for line in fp:
+        if line.strip() == "":
+            n_blank += 1
+            continue
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch, n_blank
+            batch = list()
+            n_blank = 0
+    if batch or n_blank:
+        yield batch, n_blank
+
+
+def lpt_order(costs):
+    """Return task indices in longest-processing-time-first order.
+
+    Ties keep their original relative order, so equal costs are dispatched in input order.
+    """
+    return sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+
+
+def map_tqdm(
+    func,
+    args,
+    pool_size=None,
+    update_interval=0.5,
+    costs=None,
+    cost_func=None,
+    chunksize=None,
+    maxtasksperchild=None,
+    report_every=1_000,
+    show_workers=False,
+    worker_threads=None,
+    cpu_affinity=None,
+    numa_node=None,
+):
+    """Apply `func` to every item of `args` in a process pool and show a progress bar.
+
+    By default tasks are handed to `pool.map`, which splits them into large static chunks.
+    If the task durations are skewed, pass a cost hint per task (`costs`) or a function that
+    estimates it (`cost_func`). Tasks are then dispatched longest-processing-time first in
+    small chunks, so idle workers keep pulling work instead of waiting on one long chunk.
+
+    Args:
+        func: function to apply. It must be picklable.
+        args: list of arguments. Each item is a tuple of positional arguments or a dict of
+            keyword arguments.
+        pool_size: number of worker processes. Defaults to `os.cpu_count()`.
+        update_interval: seconds between progress bar updates.
+        costs: estimated relative cost of each task, in the same order as `args`.
+        cost_func: called with each item of `args` to estimate its cost. Ignored if `costs`
+            is given.
+        chunksize: number of tasks sent to a worker at once. Defaults to 1 for cost-aware
+            scheduling and to the `pool.map` heuristic otherwise.
+        maxtasksperchild: replace a worker process after this many tasks.
+        report_every: a worker reports its finished tasks to the progress bar after this
+            many tasks or after `update_interval` seconds, whichever comes first.
+        show_workers: also show throughput and ETA of each worker process.
+        worker_threads: cap the OpenMP, MKL and OpenBLAS threads of each worker. Use 1 if
+            `func` uses NumPy and `pool_size` is close to the number of CPUs.
+        cpu_affinity: pin workers to CPUs. See `worker_cpu_sets()` for the options.
+        numa_node: pin workers to the CPUs of this NUMA node.
+
+    Returns:
+        List of outputs in the same order as `args`.
+    """
     if pool_size is None:
         pool_size = os.cpu_count()
 
-    shared_counter_list = [mp.Value("q", 0) for _ in range(pool_size)]
+    args = list(args)
+    if costs is None and cost_func is not None:
+        costs = [cost_func(arg_) for arg_ in args]
+    if costs is not None:
+        costs = list(costs)
+        if len(costs) != len(args):
+            msg = f"Got {len(costs)} costs for {len(args)} tasks."
+            raise ValueError(msg)
 
-    init_queue = mp.Queue()
-    for sc in range(pool_size):
-        init_queue.put(sc)
+    cpu_sets = worker_cpu_sets(pool_size, cpu_affinity, numa_node)
+    check_oversubscription(pool_size, worker_threads, cpu_sets)
 
     args_with_func = [{"func": func, "args": arg_} for arg_ in args]
 
-    p = mp.Process(
-        target=pbar, args=(len(args_with_func), shared_counter_list, update_interval)
+    progress_queue = mp.Queue()
+    monitor = ProgressMonitor(
+        len(args_with_func), progress_queue, update_interval, show_workers
     )
-    p.daemon = True
-    p.start()
+    monitor.start()
 
-    with mp.Pool(
-        processes=pool_size,
-        initializer=init_pool_processes,
-        initargs=({"index_queue": init_queue, "counter_list": shared_counter_list},),
-    ) as pool:
-        out_list = pool.map(worker, args_with_func)
-
-    p.join()
+    init_args = {
+        "progress_queue": progress_queue,
+        "report_every": report_every,
+        "report_interval": update_interval,
+        "worker_threads": worker_threads,
+        "cpu_sets": cpu_sets,
+        "slots": mp.Array("b", pool_size),
+    }
+    out_list = [None] * len(args_with_func)
+    completed = 0
+    try:
+        with mp.Pool(
+            processes=pool_size,
+            initializer=init_pool_processes,
+            initargs=(init_args,),
+            maxtasksperchild=maxtasksperchild,
+        ) as pool:
+            if costs is None:
+                out_list = pool.map(worker, args_with_func, chunksize)
+                completed = len(out_list)
+            else:
+                # Results arrive in completion order; put them back in input order.
+                ordered_tasks = ((i, args_with_func[i]) for i in lpt_order(costs))
+                for index, output in pool.imap_unordered(
+                    indexed_worker, ordered_tasks, chunksize or 1
+                ):
+                    out_list[index] = output
+                    completed += 1
+    finally:
+        monitor.finish(completed)
+        progress_queue.close()
 
     return out_list
 
 
+def map_json_lines(
+    func,
+    in_path,
+    out_path,
+    pool_size=None,
+    batch_size=1_000,
+    ordered=True,
+    max_pending=None,
+    total=None,
+    worker_threads=None,
+    cpu_affinity=None,
+    numa_node=None,
+    drop_none=False,
+    progress=True,
+    **kwargs,
+):
+    """Apply `func` to every record of a json lines file in parallel and write the outputs.
+
+    Reading, processing and writing are streamed. The parent reads raw lines in batches,
+    workers parse, process and serialize a batch each, and the parent writes the returned
+    text. At most `max_pending` batches are in flight, so memory use depends on the batch
+    size and not on the file size.
+
+    Example:
+        >>> map_json_lines(add_label, 'in.jsonl', 'out.jsonl', pool_size=8)
+
+    Args:
+        func: called with each record. Its output is written as one json line. It must be
+            picklable.
+        in_path: json lines file to read. Compressed files and '-' (stdin) are supported,
+            see `r_utils.open_file()`.
+        out_path: json lines file to write. Compressed files and '-' (stdout) are supported.
+        pool_size: number of worker processes. Defaults to `os.cpu_count()`.
+        batch_size: number of records sent to a worker at once.
+        ordered: write outputs in input order. If False, batches are written as soon as they
+            are done, which keeps workers busier when batch costs are uneven.
+        max_pending: maximum number of batches read but not yet written.
+            Defaults to `2 * pool_size`.
+        total: number of records for the progress bar. Defaults to the number of lines of
+            `in_path`, counted with 'wc -l' if it is an uncompressed file. Skipped blank
+            lines also advance the bar.
+        worker_threads: see `map_tqdm()`.
+        cpu_affinity: see `map_tqdm()`.
+        numa_node: see `map_tqdm()`.
+        drop_none: do not write the records for which `func` returns None. This turns
+            `func` into a filter.
+        progress: show a progress bar.
+        **kwargs: keyword arguments passed to 'json.dumps()'
+
+    Returns:
+        Number of records read.
+    """
+    from .r_utils import COMPRESSED_SUFFIXES, count_file_lines, open_file
+
+    if pool_size is None:
+        pool_size = os.cpu_count()
+    if max_pending is None:
+        max_pending = 2 * pool_size
+    plain_input = str(in_path) != "-" and not str(in_path).endswith(COMPRESSED_SUFFIXES)
+    if total is None and progress and plain_input:
+        total = count_file_lines(in_path)
+
+    cpu_sets = worker_cpu_sets(pool_size, cpu_affinity, numa_node)
+    check_oversubscription(pool_size, worker_threads, cpu_sets)
+    init_args = {
+        "progress_queue": None,
+        "report_every": None,
+        "report_interval": None,
+        "worker_threads": worker_threads,
+        "cpu_sets": cpu_sets,
+        "slots": mp.Array("b", pool_size),
+    }
+
+    # (batch index, (num records, text)) or (batch index, exception) from pool callbacks.
+    done_queue = queue.Queue()
+    # Finished batches that wait for an earlier batch when `ordered` is True.
+    done_batches = dict()
+    next_to_write = 0
+    num_pending = 0
+    num_read = 0
+
+    def write_done_batches(fp, pbar):
+        nonlocal next_to_write, num_pending, num_read
+        index, output = done_queue.get()
+        if isinstance(output, BaseException):
+            raise output
+        if not ordered:
+            index = next_to_write
+        done_batches[index] = output
+        while next_to_write in done_batches:
+            n, text = done_batches.pop(next_to_write)
+            fp.write(text)
+            pbar.update(n)
+            next_to_write += 1
+            num_pending -= 1
+            num_read += n
+
+    pbar = local_tqdm(total=total, unit="rec", disable=not progress)
+    try:
+        with mp.Pool(
+            processes=pool_size,
+            initializer=init_pool_processes,
+            initargs=(init_args,),
+        ) as pool, open_file(in_path, "r") as in_fp, open_file(out_path, "w") as out_fp:
+            index = 0
+            for lines, n_blank in read_line_batches(in_fp, batch_size):
+                # Blank lines are in the total, but not sent to the workers.
+                pbar.update(n_blank)
+                if not lines:
+                    continue
+                pool.apply_async(
+                    json_lines_worker,
+                    ((func, lines, kwargs, drop_none),),
+                    callback=lambda out, i=index: done_queue.put((i, out)),
+                    error_callback=lambda e, i=index: done_queue.put((i, e)),
+                )
+                index += 1
+                num_pending += 1
+                while num_pending >= max_pending:
+                    write_done_batches(out_fp, pbar)
+            while num_pending:
+                write_done_batches(out_fp, pbar)
+    finally:
+        pbar.close()
+
+    return num_read
+
+
 # def test_func(arg):
 #     time.sleep(0.5)
 #     return arg
@@ -1,4 +1,23 @@
-from .jquery_datatables import fancy_table
-from .pivottablejs import pivot_ui
+import importlib
 
-__all__ = ["pivot_ui", "fancy_table"]
+# Loaded on first access (PEP 562). The submodules need pandas and IPython.
+_lazy_attributes = {
+    "fancy_table": "jquery_datatables",
+    "pivot_ui": "pivottablejs",
+    "sticky_borders_show": "sticky_borders",
+}
+
+__all__ = ["pivot_ui", "fancy_table", "sticky_borders_show"]
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_lazy_attributes[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
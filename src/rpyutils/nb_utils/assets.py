@@ -0,0 +1,359 @@
+"""JavaScript and CSS assets of the nb_utils html outputs.
+
+`fancy_table` and `pivot_ui` load jQuery, DataTables, d3, c3 and PivotTable.js. The `mode`
+of `head_html()` decides how:
+
+- 'cdn': `<script src>` and `<link>` tags that point to public CDNs.
+- 'inline': the whole bundle is copied into each output. Works offline, but each output
+  carries its own copy.
+- 'session': the bundle is sent to the notebook page once per kernel session. Outputs in
+  iframes copy it from the page, and fall back to the CDNs if the page does not have it
+  (e.g. after a page reload).
+- 'local': the bundle is written once next to the saved html file, in `ASSET_DIR_NAME`,
+  and referenced by a relative path. Outputs shown in the notebook use 'session'.
+
+The bundle of a group is the concatenation of its files, named by a hash of its content,
+so outputs of the same rpyutils version share one copy and a changed bundle never reuses
+a stale file. The files are not shipped with the package. Call `download_assets()` once on
+a machine with network access and copy the directory to air-gapped machines, or point
+`RPYUTILS_ASSET_DIR` to a directory with the files.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+from urllib.parse import urljoin
+
+MODES = ("cdn", "inline", "session", "local")
+# Default mode of `fancy_table` and `pivot_ui`.
+DEFAULT_MODE = os.environ.get("RPYUTILS_ASSETS", "cdn")
+# Directory of the bundles written next to saved html files.
+ASSET_DIR_NAME = "rpyutils_assets"
+
+# (file name, url) of the assets of each output type, in load order.
+ASSET_GROUPS: Dict[str, List[Tuple[str, str]]] = {
+    "datatables": [
+        (
+            "jquery.dataTables-1.12.1.min.css",
+            "https://cdn.datatables.net/1.12.1/css/jquery.dataTables.min.css",
+        ),
+        (
+            "fixedHeader.dataTables-3.2.4.min.css",
+            "https://cdn.datatables.net/fixedheader/3.2.4/css/fixedHeader.dataTables.min.css",
+        ),
+        (
+            "fixedColumns.dataTables-4.1.0.min.css",
+            "https://cdn.datatables.net/fixedcolumns/4.1.0/css/fixedColumns.dataTables.min.css",
+        ),
+        (
+            "searchBuilder.dataTables-1.3.4.min.css",
+            "https://cdn.datatables.net/searchbuilder/1.3.4/css/searchBuilder.dataTables.min.css",
+        ),
+        (
+            "scroller.dataTables-2.0.7.min.css",
+            "https://cdn.datatables.net/scroller/2.0.7/css/scroller.dataTables.min.css",
+        ),
+        ("jquery-3.5.1.js", "https://code.jquery.com/jquery-3.5.1.js"),
+        (
+            "jquery.dataTables-1.12.1.min.js",
+            "https://cdn.datatables.net/1.12.1/js/jquery.dataTables.min.js",
+        ),
+        (
+            "ColReorderWithResize-9ce30c6.js",
+            "https://cdn.jsdelivr.net/gh/jeffreydwalter/ColReorderWithResize@9ce30c640e394282c9e0df5787d54e5887bc8ecc/ColReorderWithResize.js",
+        ),
+        (
+            "dataTables.fixedHeader-3.2.4.min.js",
+            "https://cdn.datatables.net/fixedheader/3.2.4/js/dataTables.fixedHeader.min.js",
+        ),
+        (
+            "dataTables.fixedColumns-4.1.0.min.js",
+            "https://cdn.datatables.net/fixedcolumns/4.1.0/js/dataTables.fixedColumns.min.js",
+        ),
+        (
+            "dataTables.searchBuilder-1.3.4.min.js",
+            "https://cdn.datatables.net/searchbuilder/1.3.4/js/dataTables.searchBuilder.min.js",
+        ),
+        (
+            "dataTables.scroller-2.0.7.min.js",
+            "https://cdn.datatables.net/scroller/2.0.7/js/dataTables.scroller.min.js",
+        ),
+    ],
+    "pivottable": [
+        (
+            "c3-0.4.11.min.css",
+            "https://cdnjs.cloudflare.com/ajax/libs/c3/0.4.11/c3.min.css",
+        ),
+        (
+            "d3-3.5.5.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js",
+        ),
+        (
+            "c3-0.4.11.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/c3/0.4.11/c3.min.js",
+        ),
+        (
+            "jquery-1.11.2.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/jquery/1.11.2/jquery.min.js",
+        ),
+        (
+            "jquery-ui-1.11.4.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/jqueryui/1.11.4/jquery-ui.min.js",
+        ),
+        (
+            "jquery.csv-0.71.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/jquery-csv/0.71/jquery.csv-0.71.min.js",
+        ),
+        (
+            "pivot-2.19.0.min.css",
+            "https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/pivot.min.css",
+        ),
+        (
+            "pivot-2.19.0.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/pivot.min.js",
+        ),
+        (
+            "d3_renderers-2.19.0.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/d3_renderers.min.js",
+        ),
+        (
+            "c3_renderers-2.19.0.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/c3_renderers.min.js",
+        ),
+        (
+            "export_renderers-2.19.0.min.js",
+            "https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/export_renderers.min.js",
+        ),
+    ],
+}
+
+# Hashes of the bundles sent to the notebook page in this session.
+_session_bundles = set()
+
+
+def asset_dirs() -> List[Path]:
+    """Directories searched for the asset files, in order.
+
+    `RPYUTILS_ASSET_DIR` if set, then '~/.cache/rpyutils/nb_assets' where
+    `download_assets()` writes by default.
+    """
+    dirs = list()
+    if os.environ.get("RPYUTILS_ASSET_DIR"):
+        dirs.append(Path(os.environ["RPYUTILS_ASSET_DIR"]))
+    dirs.append(Path.home() / ".cache" / "rpyutils" / "nb_assets")
+    return dirs
+
+
+def _find_assets(group: str) -> List[Path]:
+    """Paths of the files of a group. Raises if any of them is missing."""
+    paths, missing = list(), list()
+    for file_name, _ in ASSET_GROUPS[group]:
+        found = [d / file_name for d in asset_dirs() if (d / file_name).exists()]
+        if found:
+            paths.append(found[0])
+        else:
+            missing.append(file_name)
+    if missing:
+        msg = (
+            f"The '{group}' assets {missing} are not in"
+            f" {[str(d) for d in asset_dirs()]}. They are not shipped with rpyutils, run"
+            " 'rpyutils.nb_utils.assets.download_assets()' on a machine with network"
+            " access first, or use the 'cdn' asset mode."
+        )
+        raise RuntimeError(msg)
+    return paths
+
+
+def _inline_css_urls(css: str, css_url: str) -> str:
+    """Replace the relative `url()` references of a css file with data URIs."""
+    from urllib.request import urlopen
+
+    def to_data_uri(match):
+        url = match.group(2)
+        if url.startswith(("data:", "#")):
+            return match.group(0)
+        with urlopen(urljoin(css_url, url)) as response:
+            content = response.read()
+            mime = response.headers.get_content_type()
+        data = base64.b64encode(content).decode("ascii")
+        return f'url("data:{mime};base64,{data}")'
+
+    return re.sub(r"""url\((['"]?)([^'")]+)\1\)""", to_data_uri, css)
+
+
+def download_assets(
+    dest: Union[str, os.PathLike, None] = None, overwrite: bool = False
+) -> Path:
+    """Download the files of all the asset groups.
+
+    Images referenced by the css files are embedded as data URIs, so the files do not need
+    network access once downloaded.
+
+    Args:
+        dest (Union[str, os.PathLike, None], optional): Directory to write to. Defaults to
+            the last directory of `asset_dirs()`.
+        overwrite (bool, optional): Download files that already exist. Defaults to False.
+
+    Returns:
+        Path: The directory with the files.
+    """
+    from urllib.request import urlopen
+
+    dest = Path(dest) if dest is not None else asset_dirs()[-1]
+    dest.mkdir(exist_ok=True, parents=True)
+    for file_name, url in {a for group in ASSET_GROUPS.values() for a in group}:
+        path = dest / file_name
+        if path.exists() and not overwrite:
+            continue
+        with urlopen(url) as response:
+            content = response.read().decode("utf8")
+        if file_name.endswith(".css"):
+            content = _inline_css_urls(content, url)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(content, encoding="utf8")
+        tmp_path.replace(path)
+    _bundle.cache_clear()
+    return dest
+
+
+@lru_cache(maxsize=None)
+def _bundle(group: str) -> Tuple[str, str, str]:
+    js_parts, css_parts = list(), list()
+    for path in _find_assets(group):
+        text = path.read_text(encoding="utf8")
+        (css_parts if path.name.endswith(".css") else js_parts).append(text)
+    # A newline and a semicolon keep files without a trailing one apart.
+    js = "\n;\n".join(js_parts)
+    css = "\n".join(css_parts)
+    digest = hashlib.sha256((js + "\0" + css).encode("utf8")).hexdigest()[:16]
+    return digest, js, css
+
+
+def bundle(group: str) -> Dict[str, str]:
+    """The concatenated 'js' and 'css' of an asset group and the 'hash' of their content."""
+    if group not in ASSET_GROUPS:
+        msg = f"Unknown asset group '{group}'. Use one of {list(ASSET_GROUPS)}."
+        raise ValueError(msg)
+    digest, js, css = _bundle(group)
+    return {"hash": digest, "js": js, "css": css}
+
+
+def _script_text(text: str) -> str:
+    # '</script' would end the script tag early. '<\/' means the same in JavaScript.
+    return re.sub(r"</(script)", r"<\\/\1", text, flags=re.IGNORECASE)
+
+
+def _cdn_head(group: str) -> str:
+    tags = list()
+    for file_name, url in ASSET_GROUPS[group]:
+        if file_name.endswith(".css"):
+            tags.append(f'<link rel="stylesheet" href="{url}" />')
+        else:
+            tags.append(f'<script src="{url}"></script>')
+    return "\n".join(tags)
+
+
+def write_bundle(group: str, out_dir: Union[str, os.PathLike]) -> Tuple[Path, Path]:
+    """Write the bundle of a group to `out_dir/ASSET_DIR_NAME` unless it is already there.
+
+    Returns:
+        Tuple[Path, Path]: Paths of the js and css files.
+    """
+    b = bundle(group)
+    directory = Path(out_dir) / ASSET_DIR_NAME
+    directory.mkdir(exist_ok=True, parents=True)
+    paths = list()
+    for kind in ("js", "css"):
+        path = directory / f"{group}.{b['hash']}.{kind}"
+        if not path.exists():
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            tmp_path.write_text(b[kind], encoding="utf8")
+            tmp_path.replace(path)
+        paths.append(path)
+    return paths[0], paths[1]
+
+
+def head_html(
+    group: str,
+    mode: Union[str, None] = None,
+    out_dir: Union[str, os.PathLike, None] = None,
+) -> str:
+    """The html tags that load the assets of a group, for the head of an output document.
+
+    Args:
+        group (str): One of the keys of `ASSET_GROUPS`.
+        mode (Union[str, None], optional): One of `MODES`, see the module docs. Defaults
+            to `DEFAULT_MODE`, which is read from the `RPYUTILS_ASSETS` environment variable.
+        out_dir (Union[str, os.PathLike, None], optional): Directory of the html file in
+            'local' mode.
+
+    Returns:
+        str: The html code.
+    """
+    mode = mode or DEFAULT_MODE
+    if mode not in MODES:
+        msg = f"Unknown asset mode '{mode}'. Use one of {MODES}."
+        raise ValueError(msg)
+    if mode == "cdn":
+        return _cdn_head(group)
+    # Raises before anything is written if the files were not downloaded.
+    b = bundle(group)
+    if mode == "local":
+        if out_dir is None:
+            msg = "The 'local' asset mode needs the directory of the html file."
+            raise ValueError(msg)
+        js_path, css_path = write_bundle(group, out_dir)
+        return (
+            f'<link rel="stylesheet" href="{ASSET_DIR_NAME}/{css_path.name}" />\n'
+            f'<script src="{ASSET_DIR_NAME}/{js_path.name}"></script>'
+        )
+    if mode == "inline":
+        return f"<style>\n{b['css']}\n</style>\n<script>\n{_script_text(b['js'])}\n</script>"
+    # Session mode. The bundle is run in the iframe's own window, so jQuery plugins work
+    # as if the files were loaded by script tags. 'document.write' keeps the load order of
+    # the fallback tags.
+    cdn_head = json.dumps(_cdn_head(group)).replace("</", "<\\/")
+    return f"""<script>
+(function () {{
+    var store = null;
+    try {{ store = window.parent.rpyutilsAssets; }} catch (e) {{}}
+    var b = store && store["{b['hash']}"];
+    if (!b) {{ document.write({cdn_head}); return; }}
+    var style = document.createElement("style");
+    style.textContent = b.css;
+    document.head.appendChild(style);
+    var script = document.createElement("script");
+    script.text = b.js;
+    document.head.appendChild(script);
+}})();
+</script>"""
+
+
+def session_preamble(group: str, mode: Union[str, None] = None) -> str:
+    """Html that stores the bundle in the notebook page, the first time it is needed.
+
+    Returns an empty string if the bundle was already sent in this session or if `mode`
+    does not use the page. See `head_html()` for the arguments.
+    """
+    mode = mode or DEFAULT_MODE
+    if mode not in ("session", "local"):
+        return ""
+    b = bundle(group)
+    if b["hash"] in _session_bundles:
+        return ""
+    _session_bundles.add(b["hash"])
+    value = json.dumps({"js": b["js"], "css": b["css"]})
+    return (
+        "<script>\nwindow.rpyutilsAssets = window.rpyutilsAssets || {};\n"
+        f'window.rpyutilsAssets["{b["hash"]}"] = {_script_text(value)};\n</script>'
+    )
+
+
+def forget_session_assets() -> None:
+    """Send the bundles to the notebook page again, e.g. after the page was reloaded."""
+    _session_bundles.clear()
@@ -0,0 +1,181 @@
+"""Streaming assembly of the nb_utils html outputs.
+
+The outputs nest a whole html document inside the `srcdoc` attribute of an iframe, inside
+a detail tag. Building them with string replacements keeps several full copies of a
+possibly very large table in memory. The writers in this file instead pass fragments
+through to one text stream, escaping and replacing on the fly. Written to a file, only
+the current fragment is in memory. Built as a string with `build_html()`, the buffer of
+the `io.StringIO` and the string returned by `getvalue()` exist at the end, so the peak
+is about two copies of the output, at 1, 2 or 4 bytes per character depending on the
+widest character in it.
+"""
+
+import io
+import math
+from contextlib import contextmanager
+from string import Template
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, TextIO, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Escapes for a double quoted attribute value, like `srcdoc`.
+ATTRIBUTE_ESCAPES = {"&": "&amp;", '"': "&quot;"}
+# Escapes for text content of an element.
+TEXT_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;"}
+
+# Long strings are processed in pieces of this many characters.
+CHUNK_SIZE = 1 << 20
+
+
+class EscapingWriter:
+    """Write text to `fp`, replacing characters by their escapes as it is written.
+
+    Chunks are escaped with one `str.replace` per character, which is much faster than
+    `str.translate` with multi-character escapes. '&' is escaped first, so the other
+    escapes are not escaped again.
+
+    Args:
+        fp (TextIO): Stream to write to.
+        escapes (Dict[str, str], optional): Escape of each character.
+            Defaults to `ATTRIBUTE_ESCAPES`.
+    """
+
+    def __init__(self, fp: TextIO, escapes: Dict[str, str] = ATTRIBUTE_ESCAPES) -> None:
+        self.fp = fp
+        self.escapes = sorted(escapes.items(), key=lambda item: item[0] != "&")
+
+    def write(self, text: str) -> int:
+        for start in range(0, len(text), CHUNK_SIZE):
+            chunk = text[start : start + CHUNK_SIZE]
+            for char, escape in self.escapes:
+                chunk = chunk.replace(char, escape)
+            self.fp.write(chunk)
+        return len(text)
+
+
+class ReplacingWriter:
+    """Write text to `fp`, replacing every `old` with `new`, even across `write()` calls.
+
+    Up to `len(old) - 1` characters are held back until the next write, since they can be
+    the start of a match. Call `close()` to write them.
+
+    Args:
+        fp (TextIO): Stream to write to.
+        old (str): Text to replace.
+        new (str): Replacement.
+    """
+
+    def __init__(self, fp: TextIO, old: str, new: str) -> None:
+        if not old:
+            raise ValueError("'old' must not be empty.")
+        self.fp = fp
+        self.old = old
+        self.new = new
+        self.carry = ""
+
+    def write(self, text: str) -> int:
+        size = len(self.old)
+        for start in range(0, len(text), CHUNK_SIZE):
+            data = self.carry + text[start : start + CHUNK_SIZE]
+            cut = max(len(data) - size + 1, 0)
+            # Do not cut through a match. It ends within the held back characters.
+            match = data.find(self.old, max(cut - size + 1, 0))
+            if match != -1 and match < cut:
+                cut = match + size
+            self.fp.write(data[:cut].replace(self.old, self.new))
+            self.carry = data[cut:]
+        return len(text)
+
+    def close(self) -> None:
+        self.fp.write(self.carry)
+        self.carry = ""
+
+
+def split_template(template: Template, key: str) -> Tuple[Template, Template]:
+    """Split a template at the `${key}` placeholder of the large content.
+
+    The parts are substituted separately and the content is written between them, so it is
+    never copied into the template.
+    """
+    placeholder = "${" + key + "}"
+    if template.template.count(placeholder) != 1:
+        msg = f"The template must contain '{placeholder}' exactly once."
+        raise ValueError(msg)
+    before, after = template.template.split(placeholder)
+    return Template(before), Template(after)
+
+
+@contextmanager
+def wrapped(
+    fp: TextIO, template: Template, key: str, mapping: Dict
+) -> Iterator[TextIO]:
+    """Write the parts of `template` around the content written inside the block.
+
+    Example:
+        >>> with wrapped(fp, misc_templates.detail_with_summary_template, "content_sub_key", sub_map):
+        ...     fp.write(content)
+    """
+    before, after = split_template(template, key)
+    fp.write(before.substitute(mapping))
+    yield fp
+    fp.write(after.substitute(mapping))
+
+
+def copy_text(src: TextIO, fp: TextIO) -> None:
+    """Copy a text stream in chunks."""
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), ""):
+        fp.write(chunk)
+
+
+def write_dataframe_html(
+    df: "pd.DataFrame", fp: TextIO, chunk_rows: int = 10_000, **kwargs
+) -> None:
+    """Write `df.to_html(**kwargs)` to `fp` a block of rows at a time.
+
+    `to_html()` returns the whole table as one string. Rendering `chunk_rows` rows at a time
+    and keeping only the rows of the blocks after the first bounds the size of each string.
+    Row MultiIndexes (whose rowspans would restart at each block) and the `max_rows`,
+    `min_rows` and `show_dimensions` options (which would apply to each block) are
+    rendered with a single `to_html()` call.
+
+    Args:
+        df (pd.DataFrame): The data.
+        fp (TextIO): Stream to write to.
+        chunk_rows (int, optional): Rows per block. Defaults to 10_000.
+        **kwargs: keyword arguments passed to `df.to_html()`.
+    """
+    import pandas as pd
+
+    n_rows = len(df)
+    whole_table = isinstance(df.index, pd.MultiIndex) or any(
+        kwargs.get(option) for option in ("max_rows", "min_rows", "show_dimensions")
+    )
+    if n_rows <= chunk_rows or whole_table:
+        fp.write(df.to_html(**kwargs))
+        return
+    tbody_open, tbody_close = "<tbody>\n", "  </tbody>"
+    for start in range(0, n_rows, chunk_rows):
+        html = df.iloc[start : start + chunk_rows].to_html(**kwargs)
+        first, last = start == 0, start + chunk_rows >= n_rows
+        begin = 0 if first else html.index(tbody_open) + len(tbody_open)
+        end = len(html) if last else html.rindex(tbody_close)
+        fp.write(html[begin:end])
+
+
+def json_safe_value(value):
+    """Return a value that `json.dumps(allow_nan=False)` accepts, shown like `to_html()`.
+
+    NaN becomes None (null, an empty cell) and infinities the text 'inf' or '-inf'. Other
+    values are returned unchanged.
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None if math.isnan(value) else str(value)
+    return value
+
+
+def build_html(write: Callable[[TextIO], None]) -> str:
+    """Run `write` on one `io.StringIO` and return its content."""
+    buf = io.StringIO()
+    write(buf)
+    return buf.getvalue()
@@ -1,9 +1,43 @@
-from typing import Union
+from typing import TYPE_CHECKING, Callable, TextIO, Union
 from uuid import uuid4
 
-from IPython.display import HTML
+from . import html_builder, misc_templates
 
-from . import misc_templates
+if TYPE_CHECKING:
+    from IPython.display import HTML
+
+# Html code, or a function that writes html code to a text stream.
+HTMLContent = Union[str, Callable[[TextIO], None]]
+
+
+def write_html_content(content: HTMLContent, fp: TextIO) -> None:
+    """Write html code given as a string or as a function that writes it."""
+    if isinstance(content, str):
+        fp.write(content)
+    else:
+        content(fp)
+
+
+def write_iframe_tag(
+    fp: TextIO,
+    content: HTMLContent,
+    width: str,
+    height: str,
+    iframe_id: Union[str, None] = None,
+) -> None:
+    """Write an iframe tag that embeds the html code to `fp`. See `get_iframe_tag()`.
+
+    The html code is escaped for the srcdoc attribute while it is written.
+    """
+    sub_map = {
+        "width_sub_key": width,
+        "height_sub_key": height,
+        "uuid_sub_key": iframe_id or uuid4().hex,
+    }
+    with html_builder.wrapped(
+        fp, misc_templates.iframe_tag_template, "srcdoc_sub_key", sub_map
+    ):
+        write_html_content(content, html_builder.EscapingWriter(fp))
 
 
 def get_iframe_tag(
@@ -21,13 +55,28 @@ def get_iframe_tag(
         str: the html code of the iframe tag with the embedded content.
     """
 
+    return html_builder.build_html(
+        lambda fp: write_iframe_tag(fp, html_str, width, height, iframe_id)
+    )
+
+
+def write_detail_with_summary(
+    fp: TextIO,
+    content: HTMLContent,
+    summary: str,
+    random_hue: Union[str, int],
+    close: bool = False,
+) -> None:
+    """Write html code wrapped in a detail tag to `fp`. See `wrap_in_detail_with_summary()`."""
     sub_map = {
-        "srcdoc_sub_key": html_str.replace('"', "&quot;"),
-        "width_sub_key": width,
-        "height_sub_key": height,
-        "uuid_sub_key": iframe_id or uuid4().hex,
+        "summary_sub_key": summary,
+        "random_hue_sub_key": str(random_hue),
+        "open_sub_key": " " if close else " open",
     }
-    return misc_templates.iframe_tag_template.substitute(sub_map)
+    with html_builder.wrapped(
+        fp, misc_templates.detail_with_summary_template, "content_sub_key", sub_map
+    ):
+        write_html_content(content, fp)
 
 
 def wrap_in_detail_with_summary(
@@ -45,18 +94,13 @@ def wrap_in_detail_with_summary(
         str: the html code of the detail tag
     """
 
-    random_hue = str(random_hue)
-    sub_map = {
-        "content_sub_key": content,
-        "summary_sub_key": summary,
-        "random_hue_sub_key": random_hue,
-        "open_sub_key": " " if close else " open",
-    }
-    return misc_templates.detail_with_summary_template.substitute(sub_map)
+    return html_builder.build_html(
+        lambda fp: write_detail_with_summary(fp, content, summary, random_hue, close)
+    )
 
 
 def show_html(
-    html_str: str,
+    html_str: HTMLContent,
     html_iframe_tag: bool = False,
     wrap_in_detail: bool = False,
     detail_summary: Union[str, None] = None,
@@ -65,11 +109,13 @@ def show_html(
     iframe_id: Union[str, None] = None,
     close: bool = False,
     random_hue: Union[str, int] = 100,
-) -> HTML:
+    preamble: str = "",
+) -> "HTML":
     """Create the appropriate HTML object to display the html code in a jupyter notebook
 
     Args:
-        html_str (str): the html code to display
+        html_str (HTMLContent): the html code to display, or a function that writes it to a text stream.
+            The output is assembled in one buffer, so a function avoids a separate copy of the code.
         html_iframe_tag (bool, optional): if the html code should be wrapped in an html iframe tag. Defaults to False.
         wrap_in_detail (bool, optional): if the html code (or the surrounding iframe tag) should be wrapped in a detail tag. Defaults to False.
         detail_summary (Union[str, None], optional): the content of the summary tag in a html detail tag. Defaults to None.
@@ -78,27 +124,36 @@ def show_html(
         iframe_id (Union[str, None], optional): The value for the id property of iframe tag. Defaults to None.
         close (bool, optional): if the detail tag should be closed initially. Defaults to False.
         random_hue (Union[str, int], optional): the background color of the summary text. H value in HSI. Defaults to 100.
+        preamble (str, optional): html code placed before the output, outside the iframe and detail tags. Defaults to "".
 
     Returns:
         HTML: an instance of HTML class displaying the `html_str` code
     """
 
+    from IPython.display import HTML
+
     assert not html_iframe_tag or (html_iframe_tag and width and height)
 
-    if html_iframe_tag:
-        html_str = get_iframe_tag(html_str, width, height, iframe_id)
-    else:
-        html_str = html_str.replace('"', "&quot;")
+    def write_body(fp):
+        if html_iframe_tag:
+            write_iframe_tag(fp, html_str, width, height, iframe_id)
+        else:
+            write_html_content(
+                html_str, html_builder.EscapingWriter(fp, {'"': "&quot;"})
+            )
 
-    if wrap_in_detail:
-        detail_summary = "" if detail_summary is None else detail_summary
-        html_str = wrap_in_detail_with_summary(
-            html_str, detail_summary, random_hue, close
-        )
-    return HTML(html_str)
+    def write(fp):
+        fp.write(preamble)
+        if wrap_in_detail:
+            summary = "" if detail_summary is None else detail_summary
+            write_detail_with_summary(fp, write_body, summary, random_hue, close)
+        else:
+            write_body(fp)
+
+    return HTML(html_builder.build_html(write))
 
 
-def rchange_details(close: bool) -> HTML:
+def rchange_details(close: bool) -> "HTML":
     """close or open all the detail tags in the notebook
 
     Args:
@@ -108,6 +163,8 @@ def rchange_details(close: bool) -> HTML:
         HTML: the necessary html code to close/open detail tags
     """
 
+    from IPython.display import HTML
+
     close_tag = "false" if close else "true"
     html_str = f"""
     <script>
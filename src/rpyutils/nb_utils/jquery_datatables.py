@@ -1,16 +1,117 @@
+import hashlib
+import html
+import json
 import random
+import re
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, TextIO, Union
 from uuid import uuid4
 
-import pandas as pd
-from IPython.display import HTML
+from . import assets as nb_assets
+from . import html_builder, iframe_html_utils, jquery_datatables_template, render_cache
 
-from . import iframe_html_utils, jquery_datatables_template
+if TYPE_CHECKING:
+    import pandas as pd
+    from IPython.display import HTML
+
+# DataFrames with at least this many rows use the json payload when `payload="auto"`.
+JSON_PAYLOAD_MIN_ROWS = 5_000
+
+
+def _json_default(obj):
+    # NumPy scalars have `item()`. Anything else (timestamps, ...) is shown as text.
+    if hasattr(obj, "item"):
+        return html_builder.json_safe_value(obj.item())
+    return str(obj)
+
+
+def write_dataframe_json_payload(
+    df: "pd.DataFrame",
+    fp: TextIO,
+    html_escape: bool = False,
+    html_float_fmt: str = "{:.2f}",
+) -> None:
+    """Writes a DataFrame as compact columnar json for the DataTables `data` option.
+
+    The payload is `{"data": [[values of column 0], ...], "columns": [...]}`. The index is
+    the first column. If `html_float_fmt` is like '{:.2f}', floats are rounded and kept as
+    numbers, so they sort numerically and are formatted by the browser. Other formats are
+    applied in Python. Missing values are null and shown as empty cells, infinities are the
+    text 'inf' or '-inf', like in `to_html()`.
+    Columns are encoded and written one at a time. The json is safe to embed in a
+    `<script>` tag.
+
+    Args:
+        df (pd.DataFrame): The data.
+        fp (TextIO): Stream to write to.
+        html_escape (bool, optional): Show the text of the cells instead of rendering it as html.
+        html_float_fmt (str, optional): Format of the float values.
+    """
+    import pandas as pd
+
+    def flat_name(name):
+        name = " / ".join(map(str, name)) if isinstance(name, tuple) else str(name)
+        return html.escape(name) if html_escape else name
+
+    def dump(obj):
+        text = json.dumps(
+            obj, separators=(",", ":"), allow_nan=False, default=_json_default
+        )
+        # '<' only appears inside json strings, so this can not end the script tag early.
+        return text.replace("<", "\\u003c")
+
+    match = re.fullmatch(r"\{:\.(\d+)f\}", html_float_fmt)
+    decimals = int(match.group(1)) if match else None
+
+    index_names = [name for name in df.index.names if name is not None]
+    columns = [{"title": flat_name(tuple(index_names)) if index_names else "idx"}]
+    fp.write('{"data":[')
+    index = [flat_name(i) if isinstance(i, tuple) else i for i in df.index]
+    fp.write(dump([html_builder.json_safe_value(i) for i in index]))
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        column = {"title": flat_name(df.columns[i])}
+        if pd.api.types.is_float_dtype(series.dtype):
+            if decimals is not None:
+                column["decimals"] = decimals
+                values = series.round(decimals)
+            else:
+                values = series.map(html_float_fmt.format, na_action="ignore")
+        else:
+            values = series
+            if values.dtype == object:
+                # Nested values are shown like `to_html()` shows them.
+                values = values.map(
+                    lambda v: (
+                        str(v)
+                        if isinstance(v, (dict, list, tuple, set))
+                        else html_builder.json_safe_value(v)
+                    )
+                )
+            column["escape"] = html_escape
+        values = values.astype(object).where(values.notna(), None).tolist()
+        if pd.api.types.is_float_dtype(series.dtype) and decimals is not None:
+            if series.isin([float("inf"), float("-inf")]).any():
+                values = [html_builder.json_safe_value(v) for v in values]
+        fp.write(",")
+        fp.write(dump(values))
+        columns.append(column)
+    fp.write('],"columns":')
+    fp.write(dump(columns))
+    fp.write("}")
+
+
+def dataframe_json_payload(
+    df: "pd.DataFrame", html_escape: bool = False, html_float_fmt: str = "{:.2f}"
+) -> str:
+    """Returns the output of `write_dataframe_json_payload()` as a string."""
+    return html_builder.build_html(
+        lambda fp: write_dataframe_json_payload(df, fp, html_escape, html_float_fmt)
+    )
 
 
 def fancy_table(
-    data: Union[str, pd.DataFrame],
+    data: Union[str, "pd.DataFrame"],
     fixed_columns: int = 1,
     searchable: bool = False,
     max_rows: int = 10,
@@ -24,7 +125,11 @@ def fancy_table(
     html_escape=False,
     html_float_fmt="{:.2f}",
     silent=False,
-) -> Union[HTML, None]:
+    payload: str = "html",
+    scroll_y: str = "450px",
+    assets: Union[str, None] = None,
+    cache: bool = False,
+) -> Union["HTML", None]:
     """Displays the input with [jQuery DataTables](https://datatables.net).
 
     The output is either saved to an html file or returned in a jupyter notebook HTML object.
@@ -34,7 +139,8 @@ def fancy_table(
                 the html code of a table (e.g. the output of `df.to_html()`).
         fixed_columns (int, optional): The number of frozen columns on the left when scrolling. Defaults to 1.
         searchable (bool, optional): Enable the more complex search builder. Defaults to False.
-        max_rows (int, optional): Number of rows in each page. Defaults to 10.
+        max_rows (int, optional): Number of rows in each page. Not used in 'json' mode, which scrolls
+            instead of paging. Defaults to 10.
         caption (Union[str, None], optional): Caption of the table. Defaults to None.
         height (str, optional): Height of the output in css format. Defaults to "600px".
         width (str, optional): Width of the output in css format. Defaults to "100%".
@@ -44,25 +150,69 @@ def fancy_table(
             The table is saved to file if `(save == None and file != None) or save == True`
         close (bool, optional): if the detail tag should be closed initially. Defaults to False.
         silent: If True, do not print info messages.
+        payload (str, optional): How the rows of a DataFrame are embedded. 'html' renders a full
+            html table that DataTables parses. 'json' embeds the rows once as columnar json and
+            only the rows that are scrolled into view get DOM nodes, which keeps large tables
+            small and fast to open, but it scrolls instead of paging and ignores `max_rows`.
+            'auto' uses 'json' for at least `JSON_PAYLOAD_MIN_ROWS` rows. Tables given as html
+            code always use 'html'. Defaults to "html".
+        scroll_y (str, optional): Height of the scrolling body in 'json' mode in css format.
+            Defaults to "450px".
+        assets (Union[str, None], optional): How the JavaScript and CSS libraries are loaded. One of
+            'cdn', 'inline', 'session' or 'local', see `nb_utils.assets`. Defaults to the
+            `RPYUTILS_ASSETS` environment variable or 'cdn'.
+        cache (bool, optional): Reuse the html rendered earlier for the same data and options,
+            see `nb_utils.render_cache`. The documents stay in memory, up to
+            `RPYUTILS_RENDER_CACHE_BYTES` bytes (256 MiB by default). Defaults to False.
 
     Returns:
         Union[HTML, None]: The table either in an HTML object if show is True.
     """
 
+    import pandas as pd
+
+    if payload not in ("auto", "html", "json"):
+        msg = f"'payload' must be 'auto', 'html' or 'json', got '{payload}'."
+        raise ValueError(msg)
     if isinstance(data, str):
-        orig_table_html_code = data
+        payload = "html"
     elif isinstance(data, pd.DataFrame):
-        orig_table_html_code = data.to_html(
-            escape=html_escape, float_format=lambda x: html_float_fmt.format(x)
-        )
+        if payload == "auto":
+            payload = "json" if len(data) >= JSON_PAYLOAD_MIN_ROWS else "html"
     else:
         raise ValueError
-    uuid_ = uuid4().hex
-    table_html_code = orig_table_html_code.replace(
-        "<table ", f'<table id="{uuid_}" '
-    ).replace('class="', 'class="display compact ')
 
-    dom = "Rlfrtip"
+    if payload == "html":
+        template = jquery_datatables_template.jquery_datatable_template
+        content_key = "table_html_code_sub_key"
+    else:
+        template = jquery_datatables_template.jquery_datatable_json_template
+        content_key = "json_payload_sub_key"
+    before_content, after_content = html_builder.split_template(template, content_key)
+
+    def write_content(fp):
+        if payload == "json":
+            write_dataframe_json_payload(data, fp, html_escape, html_float_fmt)
+        elif isinstance(data, str):
+            table_html_code = data.replace("<table ", f'<table id="{uuid_}" ')
+            table_html_code = table_html_code.replace(
+                'class="', 'class="display compact '
+            )
+            fp.write(table_html_code.replace("<th></th>", "<th>idx</th>"))
+        else:
+            writer = html_builder.ReplacingWriter(fp, "<th></th>", "<th>idx</th>")
+            html_builder.write_dataframe_html(
+                data,
+                writer,
+                escape=html_escape,
+                float_format=lambda x: html_float_fmt.format(x),
+                table_id=uuid_,
+                classes="display compact",
+            )
+            writer.close()
+
+    # Scroller replaces the page length menu and the paging buttons.
+    dom = "Rlfrtip" if payload == "html" else "Rfrti"
     if searchable:
         dom = "Q" + dom
 
@@ -88,10 +238,27 @@ def fancy_table(
         )
         table_colored_title = f"$('div.titlebar').html('{colored_span_tag} ');"
 
-    random_hue = str(random.randrange(0, 360, 20))
+    if cache:
+        # Ids and colors come from the key, so a cached document equals a new one.
+        if isinstance(data, str):
+            data_hash = hashlib.sha256(data.encode("utf8")).hexdigest()
+        else:
+            data_hash = render_cache.dataframe_hash(data)
+        options = [payload, fixed_columns, searchable, max_rows, provided_caption]
+        options += [html_escape, html_float_fmt, scroll_y]
+        content_key = render_cache.make_key("fancy_table", data_hash, options)
+        if isinstance(data, str):
+            size_hint = len(data)
+        else:
+            n_cells = len(data) * (data.shape[1] + 1)
+            size_hint = render_cache.estimate_size(n_cells, payload)
+        uuid_ = content_key[:32]
+        random_hue = render_cache.key_hue(content_key)
+    else:
+        uuid_ = uuid4().hex
+        random_hue = str(random.randrange(0, 360, 20))
 
     substitute_mapping = {
-        "table_html_code_sub_key": table_html_code,
         "max_rows_sub_key": max_rows,
         "table_id_sub_key": uuid_,
         "dom_sub_key": dom,
@@ -100,24 +267,55 @@ def fancy_table(
         "html_file_title_sub_key": html_file_title,
         "random_hue_sub_key": random_hue,
     }
+    if payload == "json":
+        substitute_mapping["scroll_y_sub_key"] = scroll_y
 
-    main_html_code = jquery_datatables_template.jquery_datatable_template.substitute(
-        substitute_mapping
-    )
+    def write_document(fp, assets_head):
+        mapping = dict(substitute_mapping, assets_head_sub_key=assets_head)
+        fp.write(before_content.substitute(mapping))
+        write_content(fp)
+        fp.write(after_content.substitute(mapping))
 
-    main_html_code = main_html_code.replace("<th></th>", "<th>idx</th>")
+    def document(assets_head, write=None):
+        # A string from the cache, or a function that writes the document.
+        write = write or (lambda fp: write_document(fp, assets_head))
+        if not cache:
+            return write
+        key = render_cache.make_key(content_key, assets_head)
+        return render_cache.default_cache.get_or_render(key, write, size_hint)
 
+    assets = assets or nb_assets.DEFAULT_MODE
+    path = None
     if (save == None and file != None) or save == True:
         path = Path(file or "fancy_table.html")
         path.parent.mkdir(exist_ok=True, parents=True)
+        file_head = nb_assets.head_html("datatables", assets, out_dir=path.parent)
         with path.open("wt", encoding="utf8") as f:
-            f.write(main_html_code)
+            if cache:
+                # Written straight to the file unless it is cached.
+                key = render_cache.make_key(content_key, file_head)
+                write = lambda fp: write_document(fp, file_head)
+                render_cache.default_cache.write_to(key, write, f)
+            else:
+                write_document(f, file_head)
         if not silent:
             print(f"Saved to {path}")
 
     if show:
+        # Relative asset paths do not resolve in the notebook.
+        show_assets = "session" if assets == "local" else assets
+        show_head = nb_assets.head_html("datatables", show_assets)
+        if path is not None and show_assets == assets:
+            # Copy the saved file instead of rendering the table again.
+            def copy_saved(fp):
+                with path.open("rt", encoding="utf8") as f:
+                    html_builder.copy_text(f, fp)
+
+            shown = document(show_head, copy_saved)
+        else:
+            shown = document(show_head)
         return iframe_html_utils.show_html(
-            main_html_code,
+            shown,
             html_iframe_tag=True,
             wrap_in_detail=True,
             detail_summary=detail_tag_summary,
@@ -126,4 +324,5 @@ def fancy_table(
             close=close,
             random_hue=random_hue,
             iframe_id=uuid4().hex,
+            preamble=nb_assets.session_preamble("datatables", show_assets),
         )
@@ -1,6 +1,6 @@
 from string import Template
 
-jquery_datatable_template_string = """
+jquery_datatable_head_string = """
 <!DOCTYPE html>
 <html lang="en">
 
@@ -10,18 +10,7 @@ jquery_datatable_template_string = """
     <meta name="viewport" content="width=device-width, initial-scale=1.0" />
     <title>${html_file_title_sub_key}</title>
 
-    <link rel="stylesheet" href="https://cdn.datatables.net/1.12.1/css/jquery.dataTables.min.css" />
-    <link rel="stylesheet" href="https://cdn.datatables.net/fixedheader/3.2.4/css/fixedHeader.dataTables.min.css" />
-    <link rel="stylesheet" href="https://cdn.datatables.net/fixedcolumns/4.1.0/css/fixedColumns.dataTables.min.css" />
-    <link rel="stylesheet" href="https://cdn.datatables.net/searchbuilder/1.3.4/css/searchBuilder.dataTables.min.css" />
-
-    <script src="https://code.jquery.com/jquery-3.5.1.js"></script>
-    <script src="https://cdn.datatables.net/1.12.1/js/jquery.dataTables.min.js"></script>
-    <script
-        src="https://cdn.jsdelivr.net/gh/jeffreydwalter/ColReorderWithResize@9ce30c640e394282c9e0df5787d54e5887bc8ecc/ColReorderWithResize.js"></script>
-    <script src="https://cdn.datatables.net/fixedheader/3.2.4/js/dataTables.fixedHeader.min.js"></script>
-    <script src="https://cdn.datatables.net/fixedcolumns/4.1.0/js/dataTables.fixedColumns.min.js"></script>
-    <script src="https://cdn.datatables.net/searchbuilder/1.3.4/js/dataTables.searchBuilder.min.js"></script>
+    ${assets_head_sub_key}
 
     <style>
         table.dataTable tbody tr:hover {
@@ -52,7 +41,9 @@ jquery_datatable_template_string = """
         }
     </style>
 </head>
+"""
 
+jquery_datatable_template_string = jquery_datatable_head_string + """
 <body>
     <script>
         $$(document).ready(function () {
@@ -80,3 +71,69 @@ jquery_datatable_template_string = """
 """
 
 jquery_datatable_template = Template(jquery_datatable_template_string)
+
+# The rows are embedded once as columnar json and DataTables only creates the DOM nodes
+# of the rows that are scrolled into view (deferRender and Scroller).
+jquery_datatable_json_template_string = jquery_datatable_head_string + """
+<body>
+    <table id="${table_id_sub_key}" class="display compact" style="width:100%"></table>
+    <script type="application/json" id="${table_id_sub_key}-data">${json_payload_sub_key}</script>
+    <script>
+        $$(document).ready(function () {
+            const payload = JSON.parse(
+                document.getElementById('${table_id_sub_key}-data').textContent
+            );
+            const columnData = payload.data;
+            const numRows = columnData.length ? columnData[0].length : 0;
+            const rows = new Array(numRows);
+            for (let i = 0; i < numRows; i++) {
+                const row = new Array(columnData.length);
+                for (let j = 0; j < columnData.length; j++) {
+                    row[j] = columnData[j][i];
+                }
+                rows[i] = row;
+            }
+            const columns = payload.columns.map(function (c) {
+                const column = { title: c.title, defaultContent: '' };
+                if (c.decimals !== undefined) {
+                    // Infinities are the text 'inf' or '-inf', and sort as numbers.
+                    column.type = 'num';
+                    column.render = function (d, type) {
+                        if (typeof d === 'string') {
+                            if (type === 'display' || type === 'filter') return d;
+                            return d === '-inf' ? -Infinity : Infinity;
+                        }
+                        return type === 'display' && typeof d === 'number' ? d.toFixed(c.decimals) : d;
+                    };
+                } else if (c.escape) {
+                    column.render = $$.fn.dataTable.render.text();
+                }
+                return column;
+            });
+            $$('#${table_id_sub_key}').DataTable({
+                data: rows,
+                columns: columns,
+                deferRender: true,
+                scroller: true,
+                scrollY: '${scroll_y_sub_key}',
+                scrollCollapse: true,
+                autoWidth: false,
+                dom: '${dom_sub_key}',
+                scrollX: true,
+                order: [],
+                fixedColumns: {
+                left: ${fixed_columns_sub_key},
+                  },
+          });
+                  ${toolbar_title_sub_key}
+        const element = document.getElementById("rcaptionid");
+        element.style.backgroundColor = "hsl(" + ${random_hue_sub_key} + ", 75%, 75%)";
+      });
+    </script>
+</body>
+
+</html>
+
+"""
+
+jquery_datatable_json_template = Template(jquery_datatable_json_template_string)
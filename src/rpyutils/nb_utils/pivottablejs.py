@@ -1,17 +1,141 @@
 # Adapted from https://github.com/nicolaskruchten/jupyter_pivottablejs
 import json
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, List, TextIO, Union
 from uuid import uuid4
 
-import pandas as pd
-from IPython.display import HTML
+from . import assets as nb_assets
+from . import html_builder, iframe_html_utils, pivottablejs_template, render_cache
 
-from . import iframe_html_utils, pivottablejs_template
+if TYPE_CHECKING:
+    import pandas as pd
+    from IPython.display import HTML
+
+# DataFrames with at least this many rows use the json payload when `payload="auto"`.
+JSON_PAYLOAD_MIN_ROWS = 5_000
+# Name of the column with the number of rows of each group when `group_by` is given.
+COUNT_COLUMN = "count"
+
+
+def _flat_name(name) -> str:
+    return " / ".join(map(str, name)) if isinstance(name, tuple) else str(name)
+
+
+def prepare_pivot_data(
+    df: "pd.DataFrame",
+    group_by: Union[List[str], None] = None,
+    max_rows: Union[int, None] = None,
+    seed: int = 0,
+) -> "pd.DataFrame":
+    """Reduces a DataFrame to the rows that are sent to the browser.
+
+    Named index levels become columns. If `max_rows` is given, at most that many rows are
+    kept, picked uniformly at random in their original order. If `group_by` is given, the
+    rows are then grouped by these columns in pandas: the numeric columns are summed and
+    `COUNT_COLUMN` holds the number of rows of each group, so the output has one row per
+    combination of values. Counts and sums stay exact, other aggregations should be
+    derived from them.
+
+    Args:
+        df (pd.DataFrame): Input dataframe.
+        group_by (Union[List[str], None], optional): Dimensions to group by. Defaults to None.
+        max_rows (Union[int, None], optional): Sample this many rows. Defaults to None.
+        seed (int, optional): Seed of the sample. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The reduced data.
+    """
+    import numpy as np
+    import pandas as pd
+
+    named_levels = [name for name in df.index.names if name is not None]
+    if named_levels:
+        df = df.reset_index(level=named_levels)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.set_axis([_flat_name(c) for c in df.columns], axis=1)
+
+    if max_rows is not None and len(df) > max_rows:
+        positions = np.random.default_rng(seed).choice(len(df), max_rows, replace=False)
+        positions.sort()
+        df = df.iloc[positions]
+
+    if group_by is None:
+        return df
+    missing = [c for c in group_by if c not in df.columns]
+    if missing:
+        msg = f"'group_by' columns {missing} are not in the DataFrame."
+        raise ValueError(msg)
+    if COUNT_COLUMN in df.columns:
+        msg = f"The DataFrame already has a '{COUNT_COLUMN}' column."
+        raise ValueError(msg)
+    measures = [
+        c
+        for c in df.columns
+        if c not in group_by
+        and pd.api.types.is_numeric_dtype(df[c].dtype)
+        and not pd.api.types.is_bool_dtype(df[c].dtype)
+    ]
+    groups = df.groupby(list(group_by), observed=True, dropna=False, sort=False)
+    out = groups[measures].sum() if measures else groups.size().to_frame()[[]]
+    out[COUNT_COLUMN] = groups.size()
+    return out.reset_index()
+
+
+def write_pivot_json_payload(df: "pd.DataFrame", fp: TextIO) -> None:
+    """Writes a DataFrame as columnar json with dictionary encoded text columns.
+
+    The payload is `{"columns": [...], "data": [[values of column 0], ...], "dicts": [...]}`.
+    Numeric columns are arrays of numbers with null for missing values and the text 'inf'
+    or '-inf' for infinities, as in the csv payload. Other columns (strings, categories,
+    dates, ...) are arrays of integer codes into the matching entry of `dicts`, which lists
+    their distinct values as text, with -1 for missing values. The size of a text column
+    then depends on its number of distinct values more than on its length. The index is
+    not written. Columns are encoded one at a time. The json is safe
+    to embed in a `<script>` tag.
+
+    Args:
+        df (pd.DataFrame): The data.
+        fp (TextIO): Stream to write to.
+    """
+    import pandas as pd
+
+    def dump(obj):
+        text = json.dumps(
+            obj,
+            separators=(",", ":"),
+            allow_nan=False,
+            default=lambda v: html_builder.json_safe_value(v.item()),
+        )
+        # '<' only appears inside json strings, so this can not end the script tag early.
+        return text.replace("<", "\\u003c")
+
+    dicts = list()
+    fp.write('{"columns":')
+    fp.write(dump([_flat_name(c) for c in df.columns]))
+    fp.write(',"data":[')
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if i > 0:
+            fp.write(",")
+        if pd.api.types.is_numeric_dtype(series.dtype) and not (
+            pd.api.types.is_bool_dtype(series.dtype)
+        ):
+            dicts.append(None)
+            values = series.to_numpy(dtype=object, na_value=None).tolist()
+            if series.isin([float("inf"), float("-inf")]).any():
+                values = [html_builder.json_safe_value(v) for v in values]
+            fp.write(dump(values))
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            dicts.append(uniques.astype(str).tolist())
+            fp.write(dump(codes.tolist()))
+    fp.write('],"dicts":')
+    fp.write(dump(dicts))
+    fp.write("}")
 
 
 def pivot_ui(
-    df: pd.DataFrame,
+    df: "pd.DataFrame",
     caption: Union[str, None] = None,
     height: str = "600px",
     width: str = "100%",
@@ -19,8 +143,13 @@ def pivot_ui(
     file: Union[str, None] = None,
     save: Union[bool, None] = None,
     close: bool = False,
+    assets: Union[str, None] = None,
+    cache: bool = False,
+    payload: str = "auto",
+    group_by: Union[List[str], None] = None,
+    max_rows: Union[int, None] = None,
     **kwargs,
-) -> Union[HTML, None]:
+) -> Union["HTML", None]:
     """Crates a pivot table from the pandas dataframe with [pivottablejs](https://github.com/nicolaskruchten/pivottable)
 
     The output is either saved to an html file or returned in a jupyter notebook HTML object.
@@ -35,30 +164,120 @@ def pivot_ui(
         save (Union[bool, None], optional): Save the table in an html file. Can be True/False/None. Defaults to None.
             The table is saved to file if `(save == None and file != None) or save == True`
         close (bool, optional): If the detail tag should be closed initially. Defaults to False.
+        assets (Union[str, None], optional): How the JavaScript and CSS libraries are loaded. One of
+            'cdn', 'inline', 'session' or 'local', see `nb_utils.assets`. Defaults to the
+            `RPYUTILS_ASSETS` environment variable or 'cdn'.
+        cache (bool, optional): Reuse the html rendered earlier for the same data and options,
+            see `nb_utils.render_cache`. The documents stay in memory, up to
+            `RPYUTILS_RENDER_CACHE_BYTES` bytes (256 MiB by default). Defaults to False.
+        payload (str, optional): How the rows are embedded. 'csv' embeds `df.to_csv()`, which
+            the browser parses. 'json' embeds columnar json with dictionary encoded text
+            columns, see `write_pivot_json_payload()`. 'auto' uses 'json' for at least
+            `JSON_PAYLOAD_MIN_ROWS` rows. Defaults to "auto".
+        group_by (Union[List[str], None], optional): Aggregate the rows by these columns in
+            pandas before embedding them, see `prepare_pivot_data()`. The table then shows the
+            sum of `COUNT_COLUMN` unless `aggregatorName` is given. Defaults to None.
+        max_rows (Union[int, None], optional): Embed a random sample of at most this many
+            rows, taken before grouping. Defaults to None.
+        **kwargs: options of `pivotUI()`, like `rows`, `cols`, `aggregatorName` and `vals`.
 
     Returns:
         Union[HTML, None]: The table either in an HTML object if show is True.
     """
 
-    csv = df.to_csv(encoding="utf8")
-    if hasattr(csv, "decode"):
-        csv = csv.decode("utf8")
-    main_html_code = pivottablejs_template.pivottablejs_template % dict(
-        csv=csv, kwargs=json.dumps(kwargs)
-    )
+    if payload not in ("auto", "csv", "json"):
+        msg = f"'payload' must be 'auto', 'csv' or 'json', got '{payload}'."
+        raise ValueError(msg)
+    if payload == "auto":
+        payload = "json" if len(df) >= JSON_PAYLOAD_MIN_ROWS else "csv"
+    if group_by is not None:
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+        if "aggregatorName" not in kwargs:
+            kwargs = dict(kwargs, aggregatorName="Integer Sum", vals=[COUNT_COLUMN])
 
+    reduced = None
+
+    def pivot_data():
+        # Reduced once, on the first render.
+        nonlocal reduced
+        if reduced is None:
+            if group_by is None and max_rows is None:
+                reduced = df
+            else:
+                reduced = prepare_pivot_data(df, group_by, max_rows)
+        return reduced
+
+    if payload == "csv":
+        template, content_key = pivottablejs_template.pivottablejs_template, "%(csv)s"
+    else:
+        template = pivottablejs_template.pivottablejs_json_template
+        content_key = "%(json)s"
+    before_content, after_content = template.split(content_key)
+
+    def write_document(fp, assets_head):
+        mapping = dict(kwargs=json.dumps(kwargs), assets_head=assets_head)
+        fp.write(before_content % mapping)
+        if payload == "csv":
+            # The csv is streamed into the div, escaped as html text. The page reads it
+            # back with jQuery's `.text()`, which undoes the escapes.
+            writer = html_builder.EscapingWriter(fp, html_builder.TEXT_ESCAPES)
+            pivot_data().to_csv(writer)
+        else:
+            write_pivot_json_payload(pivot_data(), fp)
+        fp.write(after_content % mapping)
+
+    if cache:
+        options = [payload, group_by, max_rows, kwargs]
+        content_key = render_cache.make_key(
+            "pivot_ui", render_cache.dataframe_hash(df), options
+        )
+        # Grouped data can be much smaller than the DataFrame.
+        size_hint = None
+        if group_by is None:
+            n_rows = len(df) if max_rows is None else min(len(df), max_rows)
+            size_hint = render_cache.estimate_size(n_rows * df.shape[1], payload)
+
+    def document(assets_head, write=None):
+        # A string from the cache, or a function that writes the document.
+        write = write or (lambda fp: write_document(fp, assets_head))
+        if not cache:
+            return write
+        key = render_cache.make_key(content_key, assets_head)
+        return render_cache.default_cache.get_or_render(key, write, size_hint)
+
+    assets = assets or nb_assets.DEFAULT_MODE
+    path = None
     if (save == None and file != None) or save == True:
         path = Path(file or "fancy_table.html")
         path.parent.mkdir(exist_ok=True, parents=True)
+        file_head = nb_assets.head_html("pivottable", assets, out_dir=path.parent)
         with path.open("wt", encoding="utf8") as f:
-            f.write(main_html_code)
+            if cache:
+                # Written straight to the file unless it is cached.
+                key = render_cache.make_key(content_key, file_head)
+                write = lambda fp: write_document(fp, file_head)
+                render_cache.default_cache.write_to(key, write, f)
+            else:
+                write_document(f, file_head)
         print(f"Saved to {path}")
 
     detail_summary_val = (caption or "Pivottable JS").title()
 
     if show:
+        # Relative asset paths do not resolve in the notebook.
+        show_assets = "session" if assets == "local" else assets
+        show_head = nb_assets.head_html("pivottable", show_assets)
+        if path is not None and show_assets == assets:
+            # Copy the saved file instead of converting the DataFrame again.
+            def copy_saved(fp):
+                with path.open("rt", encoding="utf8") as f:
+                    html_builder.copy_text(f, fp)
+
+            shown = document(show_head, copy_saved)
+        else:
+            shown = document(show_head)
         return iframe_html_utils.show_html(
-            main_html_code,
+            shown,
             html_iframe_tag=True,
             wrap_in_detail=True,
             detail_summary=detail_summary_val,
@@ -66,4 +285,5 @@ def pivot_ui(
             height=height,
             close=close,
             iframe_id=uuid4().hex,
+            preamble=nb_assets.session_preamble("pivottable", show_assets),
         )
@@ -1,4 +1,4 @@
-pivottablejs_template = """
+pivottablejs_head = """
 <!DOCTYPE html>
 <html>
 
@@ -6,25 +6,7 @@ pivottablejs_template = """
     <meta charset="UTF-8" />
     <title>PivotTable.js</title>
 
-    <!-- external libs from cdnjs -->
-    <link rel="stylesheet" type="text/css" href="https://cdnjs.cloudflare.com/ajax/libs/c3/0.4.11/c3.min.css" />
-    <script type="text/javascript" src="https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js"></script>
-    <script type="text/javascript" src="https://cdnjs.cloudflare.com/ajax/libs/c3/0.4.11/c3.min.js"></script>
-    <script type="text/javascript" src="https://cdnjs.cloudflare.com/ajax/libs/jquery/1.11.2/jquery.min.js"></script>
-    <script type="text/javascript"
-        src="https://cdnjs.cloudflare.com/ajax/libs/jqueryui/1.11.4/jquery-ui.min.js"></script>
-    <script type="text/javascript"
-        src="https://cdnjs.cloudflare.com/ajax/libs/jquery-csv/0.71/jquery.csv-0.71.min.js"></script>
-
-    <link rel="stylesheet" type="text/css"
-        href="https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/pivot.min.css" />
-    <script type="text/javascript" src="https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/pivot.min.js"></script>
-    <script type="text/javascript"
-        src="https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/d3_renderers.min.js"></script>
-    <script type="text/javascript"
-        src="https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/c3_renderers.min.js"></script>
-    <script type="text/javascript"
-        src="https://cdnjs.cloudflare.com/ajax/libs/pivottable/2.19.0/export_renderers.min.js"></script>
+    %(assets_head)s
 
     <style>
         body {
@@ -74,6 +56,9 @@ pivottablejs_template = """
     </style>
 </head>
 
+"""
+
+pivottablejs_template = pivottablejs_head + """
 <body>
     <script type="text/javascript">
         $(function () {
@@ -101,3 +86,50 @@ pivottablejs_template = """
 </html>
 
 """
+
+pivottablejs_json_template = pivottablejs_head + """
+<body>
+    <script type="application/json" id="data">%(json)s</script>
+    <script type="text/javascript">
+        $(function () {
+            if (window.location != window.parent.location)
+                $("<a>", {target: "_blank", href: ""})
+                    .text("[pop out]").prependTo($("body"));
+
+            // Columns are arrays of values, or of codes into a dictionary of the distinct
+            // values. Missing values are null (code -1) and shown as empty strings.
+            var payload = JSON.parse(document.getElementById("data").textContent);
+            var input = function (record) {
+                var names = payload.columns, data = payload.data, dicts = payload.dicts;
+                var n = names.length ? data[0].length : 0;
+                for (var i = 0; i < n; i++) {
+                    var row = {};
+                    for (var j = 0; j < names.length; j++) {
+                        var v = data[j][i];
+                        if (dicts[j] !== null) v = v < 0 ? null : dicts[j][v];
+                        row[names[j]] = v === null ? "" : v;
+                    }
+                    record(row);
+                }
+            };
+
+            $("#output").pivotUI(
+                input,
+                $.extend({
+                    renderers: $.extend(
+                        $.pivotUtilities.renderers,
+                        $.pivotUtilities.c3_renderers,
+                        $.pivotUtilities.d3_renderers,
+                        $.pivotUtilities.export_renderers
+                    ),
+                    hiddenAttributes: [""]
+                }, %(kwargs)s)
+            ).show();
+        });
+    </script>
+    <div id="output" style="display: none"></div>
+</body>
+
+</html>
+
+"""
@@ -0,0 +1,219 @@
+"""Cache of rendered nb_utils html documents.
+
+Re-running a notebook cell renders the same html again for an unchanged DataFrame. The
+documents are cached by a hash of the DataFrame content (`pd.util.hash_pandas_object`) and
+of the rendering options, in memory and optionally on disk, with least recently used
+eviction by size. Everything that used to be random in a document (the table id, the
+caption hue) is derived from the key, so a cached document is identical to a new one.
+
+Caching is opt-in with `cache=True`, because the cached documents stay in the memory of the
+kernel. The size of the default cache is set with the `RPYUTILS_RENDER_CACHE_BYTES`
+environment variable or `configure_cache()`.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, TextIO, Union
+
+from . import html_builder
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Fewest bytes per cell of each payload, e.g. '<td>0.12</td>' plus indentation in html.
+CELL_BYTES = {"html": 16, "json": 4, "csv": 4}
+
+
+def dataframe_hash(df: "pd.DataFrame") -> str:
+    """Hash of the values, index, column names and dtypes of a DataFrame.
+
+    Uses `pd.util.hash_pandas_object`. Frames with unhashable cells (e.g. lists) are
+    hashed through pickle.
+    """
+    import pandas as pd
+
+    h = hashlib.sha256()
+    meta = (df.shape, list(df.columns), list(df.dtypes), list(df.index.names))
+    h.update(repr(meta).encode("utf8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        h.update(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Hex digest of json serializable parts, like a content hash and options."""
+    from .. import __version__
+
+    text = json.dumps([__version__, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf8")).hexdigest()
+
+
+def estimate_size(n_cells: int, payload: str) -> int:
+    """A rough lower estimate of the size in bytes of a document with `n_cells` cells.
+
+    Used to skip the cache before rendering a document that can not fit in it.
+    """
+    return n_cells * CELL_BYTES.get(payload, 0)
+
+
+def _num_bytes(html: str) -> int:
+    # Size of the utf8 encoding, which is the length for ASCII text.
+    return len(html) if html.isascii() else len(html.encode("utf8"))
+
+
+def key_hue(key: str) -> str:
+    """A hue in steps of 20 degrees derived from a key, like `random.randrange(0, 360, 20)`."""
+    return str(int(key[:8], 16) % 18 * 20)
+
+
+class RenderCache:
+    """Least recently used cache of html strings, bounded by their total size.
+
+    Sizes are the bytes of the utf8 encoded documents.
+
+    Args:
+        max_bytes (int, optional): Size of the in-memory cache. Documents larger than this
+            are not cached. Defaults to 256 MiB.
+        cache_dir (Union[str, os.PathLike, None], optional): Also keep documents in this
+            directory, so they survive kernel restarts. Defaults to None.
+        max_disk_bytes (int, optional): Size of the disk cache. Defaults to 2 GiB.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 << 20,
+        cache_dir: Union[str, os.PathLike, None] = None,
+        max_disk_bytes: int = 2 << 30,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.html"
+
+    def get(self, key: str) -> Union[str, None]:
+        """The cached document or None."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        if self.cache_dir is not None:
+            path = self._disk_path(key)
+            try:
+                html = path.read_text(encoding="utf8")
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                self._put_memory(key, html)
+                return html
+        self.misses += 1
+        return None
+
+    def put(self, key: str, html: str) -> None:
+        """Cache a document, evicting the least recently used ones if needed."""
+        size = _num_bytes(html)
+        self._put_memory(key, html, size)
+        if self.cache_dir is not None and size <= self.max_disk_bytes:
+            self.cache_dir.mkdir(exist_ok=True, parents=True)
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(html, encoding="utf8")
+            tmp_path.replace(path)
+            self._evict_disk()
+
+    def _put_memory(self, key: str, html: str, size: Union[int, None] = None) -> None:
+        size = _num_bytes(html) if size is None else size
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.num_bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (html, size)
+        self.num_bytes += size
+        while self.num_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.num_bytes -= evicted_size
+
+    def _evict_disk(self) -> None:
+        files = [(p.stat(), p) for p in self.cache_dir.glob("*.html")]
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, path in sorted(files, key=lambda f: f[0].st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+    def get_or_render(
+        self,
+        key: str,
+        write: Callable[[TextIO], None],
+        size_hint: Union[int, None] = None,
+    ) -> Union[str, Callable[[TextIO], None]]:
+        """The cached document, or the output of `write` on a new buffer, which is cached.
+
+        If `size_hint` (see `estimate_size()`) is larger than the cache, `write` is returned
+        as it is, so the caller can stream the document instead of building it as a string.
+        """
+        html = self.get(key)
+        if html is None:
+            if size_hint is not None and size_hint > self._max_size():
+                return write
+            html = html_builder.build_html(write)
+            self.put(key, html)
+        return html
+
+    def _max_size(self) -> int:
+        if self.cache_dir is None:
+            return self.max_bytes
+        return max(self.max_bytes, self.max_disk_bytes)
+
+    def write_to(self, key: str, write: Callable[[TextIO], None], fp: TextIO) -> None:
+        """Write the cached document to `fp`, or run `write` on `fp` without caching.
+
+        The output of `write` goes straight to `fp`, so it is never held in memory.
+        """
+        html = self.get(key)
+        if html is None:
+            write(fp)
+        else:
+            fp.write(html)
+
+    def clear(self) -> None:
+        """Empty the in-memory cache and the disk cache."""
+        self.entries.clear()
+        self.num_bytes = 0
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob("*.html"):
+                path.unlink(missing_ok=True)
+
+
+# The cache used by `fancy_table`, `pivot_ui` and `sticky_borders_show` with `cache=True`.
+# `RPYUTILS_RENDER_CACHE_BYTES` sets the size of the in-memory cache (0 keeps nothing in
+# memory) and `RPYUTILS_RENDER_CACHE_DIR` enables the disk cache.
+default_cache = RenderCache(
+    max_bytes=int(os.environ.get("RPYUTILS_RENDER_CACHE_BYTES", 256 << 20)),
+    cache_dir=os.environ.get("RPYUTILS_RENDER_CACHE_DIR"),
+)
+
+
+def configure_cache(
+    max_bytes: int = 256 << 20,
+    cache_dir: Union[str, os.PathLike, None] = None,
+    max_disk_bytes: int = 2 << 30,
+) -> RenderCache:
+    """Replace the default cache. See `RenderCache` for the arguments."""
+    global default_cache
+    default_cache = RenderCache(max_bytes, cache_dir, max_disk_bytes)
+    return default_cache
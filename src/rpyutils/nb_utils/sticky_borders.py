@@ -62,6 +62,84 @@ def sticky_borders_show_private(target_html):
     return HTML(final_html)
 
 
-def sticky_borders_show():
-    # sticky_borders_show_private(target_html)
-    raise NotImplementedError
+def sticky_borders_show(
+    df,
+    caption=None,
+    max_height=600,
+    min_width=100,
+    row_height=24,
+    width="100%",
+    close=False,
+    html_escape=False,
+    html_float_fmt="{:.2f}",
+    cache=False,
+):
+    """Displays a DataFrame in a scrollable table with sticky header and index.
+
+    Unlike `sticky_borders_code()`, the rows are not rendered as one html table. The data is
+    embedded once as columnar json (see `jquery_datatables.write_dataframe_json_payload()`)
+    and only the cells in view are created when scrolling, so the size of the page does not
+    grow with the number of rows and columns.
+
+    Args:
+        df (pd.DataFrame): Input dataframe.
+        caption (Union[str, None], optional): Caption of the table. Defaults to None.
+        max_height (int, optional): Height of the table in pixels. Defaults to 600.
+        min_width (int, optional): Minimum width of the columns in pixels. Defaults to 100.
+        row_height (int, optional): Height of the rows in pixels. Defaults to 24.
+        width (str, optional): Width of the output in css format. Defaults to "100%".
+        close (bool, optional): If the detail tag should be closed initially. Defaults to False.
+        html_escape (bool, optional): Show the text of the cells instead of rendering it as html.
+            Defaults to False.
+        html_float_fmt (str, optional): Format of the float values. Defaults to "{:.2f}".
+        cache (bool, optional): Reuse the html rendered earlier for the same data and options,
+            see `nb_utils.render_cache`. The documents stay in memory, up to
+            `RPYUTILS_RENDER_CACHE_BYTES` bytes (256 MiB by default). Defaults to False.
+
+    Returns:
+        HTML: The table in an HTML object.
+    """
+    from uuid import uuid4
+
+    from . import html_builder, iframe_html_utils, render_cache
+    from .jquery_datatables import write_dataframe_json_payload
+    from .sticky_borders_template import sticky_viewer_template
+
+    before_payload, after_payload = html_builder.split_template(
+        sticky_viewer_template, "json_payload_sub_key"
+    )
+    mapping = {
+        "html_file_title_sub_key": (caption or "sticky table").title(),
+        "max_height_sub_key": max_height,
+        "min_width_sub_key": min_width,
+        "row_height_sub_key": row_height,
+    }
+
+    def write_document(fp):
+        fp.write(before_payload.substitute(mapping))
+        write_dataframe_json_payload(df, fp, html_escape, html_float_fmt)
+        fp.write(after_payload.substitute(mapping))
+
+    if cache:
+        options = [caption, max_height, min_width, row_height, html_escape]
+        options.append(html_float_fmt)
+        key = render_cache.make_key(
+            "sticky_borders_show", render_cache.dataframe_hash(df), options
+        )
+        size_hint = render_cache.estimate_size(len(df) * (df.shape[1] + 1), "json")
+        document = render_cache.default_cache.get_or_render(
+            key, write_document, size_hint
+        )
+    else:
+        document = write_document
+
+    return iframe_html_utils.show_html(
+        document,
+        html_iframe_tag=True,
+        wrap_in_detail=True,
+        detail_summary=caption or "sticky table",
+        width=width,
+        height=f"{max_height + 20}px",
+        close=close,
+        iframe_id=uuid4().hex,
+    )
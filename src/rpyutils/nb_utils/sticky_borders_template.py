@@ -0,0 +1,172 @@
+from string import Template
+
+sticky_viewer_template_string = """
+<!DOCTYPE html>
+<html lang="en">
+
+<head>
+    <meta charset="UTF-8" />
+    <title>${html_file_title_sub_key}</title>
+    <style>
+        body {
+            margin: 0;
+            font-size: 13px;
+            font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI",
+                Roboto, Oxygen, Ubuntu, Cantarell, "Open Sans", "Helvetica Neue",
+                sans-serif;
+        }
+
+        .viewport {
+            max-height: ${max_height_sub_key}px;
+            height: 100vh;
+            overflow: auto;
+        }
+
+        .sizer {
+            position: relative;
+        }
+
+        .window {
+            position: -webkit-sticky; /* for Safari */
+            position: sticky;
+            top: 0;
+            left: 0;
+            overflow: hidden;
+        }
+
+        .cell {
+            position: absolute;
+            box-sizing: border-box;
+            height: ${row_height_sub_key}px;
+            line-height: ${row_height_sub_key}px;
+            padding: 0 6px;
+            overflow: hidden;
+            white-space: nowrap;
+            text-overflow: ellipsis;
+            text-align: right;
+            border-bottom: 1px solid #f0f0f0;
+        }
+
+        .odd {
+            background: #f5f5f5;
+        }
+
+        .head,
+        .index {
+            background: #E5E7E9;
+            color: black;
+            font-weight: bold;
+            z-index: 1;
+        }
+
+        .corner {
+            z-index: 2;
+        }
+    </style>
+</head>
+
+<body>
+    <script type="application/json" id="data">${json_payload_sub_key}</script>
+    <div class="viewport" id="viewport">
+        <div class="sizer" id="sizer">
+            <div class="window" id="window"></div>
+        </div>
+    </div>
+    <script type="text/javascript">
+        (function () {
+            var payload = JSON.parse(document.getElementById("data").textContent);
+            var viewport = document.getElementById("viewport");
+            var sizer = document.getElementById("sizer");
+            var win = document.getElementById("window");
+            var ROW = ${row_height_sub_key}, MIN_WIDTH = ${min_width_sub_key};
+            // Browsers cap the height of an element, so long tables scroll in scaled steps.
+            var MAX_BODY = 8000000, OVERSCAN = 2;
+            var data = payload.data, columns = payload.columns;
+            var nRows = data[0].length, nCols = columns.length - 1;
+
+            var escapeElement = document.createElement("div");
+            function escapeText(text) {
+                escapeElement.textContent = text;
+                return escapeElement.innerHTML;
+            }
+            function cellText(j, i) {
+                var v = data[j][i], c = columns[j];
+                if (v === null) return "";
+                if (c.decimals !== undefined && typeof v === "number") v = v.toFixed(c.decimals);
+                return c.escape ? escapeText(String(v)) : String(v);
+            }
+
+            // Column widths are estimated from the titles and the first rows.
+            var widths = columns.map(function (c, j) {
+                var chars = c.title.length;
+                for (var i = 0; i < Math.min(nRows, 200); i++) {
+                    var v = data[j][i];
+                    if (v !== null) chars = Math.max(chars, String(v).length);
+                }
+                return Math.max(MIN_WIDTH, Math.min(400, chars * 8 + 16));
+            });
+            var indexWidth = widths[0], lefts = [0];
+            for (var j = 1; j <= nCols; j++) lefts.push(lefts[j - 1] + widths[j]);
+            var bodyHeight = nRows * ROW, scaledHeight = Math.min(bodyHeight, MAX_BODY);
+            sizer.style.width = indexWidth + lefts[nCols] + "px";
+            sizer.style.height = ROW + scaledHeight + "px";
+
+            function cell(cls, left, top, width, html) {
+                return '<div class="cell ' + cls + '" style="left:' + left + "px;top:" + top
+                    + "px;width:" + width + 'px">' + html + "</div>";
+            }
+
+            function render() {
+                var width = viewport.clientWidth, height = viewport.clientHeight;
+                win.style.width = width + "px";
+                win.style.height = height + "px";
+                var view = Math.max(0, height - ROW);
+                var scrollTop = viewport.scrollTop, top = scrollTop;
+                if (scaledHeight < bodyHeight && scaledHeight > view)
+                    top = scrollTop * (bodyHeight - view) / (scaledHeight - view);
+                var left = viewport.scrollLeft;
+
+                var r0 = Math.max(0, Math.floor(top / ROW) - OVERSCAN);
+                var r1 = Math.min(nRows, Math.ceil((top + view) / ROW) + OVERSCAN);
+                var c0 = 1;
+                while (c0 <= nCols && lefts[c0] <= left) c0++;
+                var c1 = c0;
+                while (c1 <= nCols && lefts[c1 - 1] < left + width - indexWidth) c1++;
+
+                var html = [cell("head corner", 0, 0, indexWidth, columns[0].title)];
+                for (var j = c0; j < c1; j++) {
+                    var x = indexWidth + lefts[j - 1] - left;
+                    html.push(cell("head", x, 0, widths[j], columns[j].title));
+                }
+                for (var i = r0; i < r1; i++) {
+                    var y = ROW + i * ROW - top, odd = i % 2 ? " odd" : "";
+                    html.push(cell("index" + odd, 0, y, indexWidth, cellText(0, i)));
+                    for (var j = c0; j < c1; j++) {
+                        var x = indexWidth + lefts[j - 1] - left;
+                        html.push(cell(odd, x, y, widths[j], cellText(j, i)));
+                    }
+                }
+                win.innerHTML = html.join("");
+            }
+
+            var pending = false;
+            function schedule() {
+                if (pending) return;
+                pending = true;
+                window.requestAnimationFrame(function () {
+                    pending = false;
+                    render();
+                });
+            }
+            viewport.addEventListener("scroll", schedule, { passive: true });
+            window.addEventListener("resize", schedule);
+            render();
+        })();
+    </script>
+</body>
+
+</html>
+
+"""
+
+sticky_viewer_template = Template(sticky_viewer_template_string)
@@ -7,14 +7,59 @@ import inspect
 import json
 import os
 import pickle as pkl
+import sys
 import time
 from contextlib import contextmanager
 from pathlib import Path
 from subprocess import CalledProcessError, run
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
 from tqdm import tqdm
 
+# Files with these suffixes are (de)compressed on the fly by `open_file()`.
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".lzma")
+
+
+def open_file(path: os.PathLike, mode: str = "rt", **kwargs):
+    """Open a file, a compressed file or a standard stream.
+
+    '-' is stdin when reading and stdout when writing. The standard stream is not closed
+    with the returned file object. Files ending in '.gz', '.bz2', '.xz' or '.lzma' are
+    (de)compressed on the fly. Parent directories are created when writing.
+
+    Args:
+        path: file to open or '-'.
+        mode: like the mode of 'open()'. Text mode is the default, also for compressed files.
+        **kwargs: keyword arguments passed to the underlying 'open()' function.
+
+    Returns: a file object.
+    """
+    if "b" not in mode and "t" not in mode:
+        mode += "t"
+    reading = "r" in mode
+    if str(path) == "-":
+        stream = sys.stdin if reading else sys.stdout
+        if not reading:
+            stream.flush()
+        return open(stream.fileno(), mode, closefd=False, **kwargs)
+    path = Path(path)
+    if not reading:
+        path.parent.mkdir(exist_ok=True, parents=True)
+    suffix = path.suffix.lower()
+    if suffix == ".gz":
+        import gzip
+
+        return gzip.open(path, mode, **kwargs)
+    if suffix == ".bz2":
+        import bz2
+
+        return bz2.open(path, mode, **kwargs)
+    if suffix in (".xz", ".lzma"):
+        import lzma
+
+        return lzma.open(path, mode, **kwargs)
+    return open(path, mode, **kwargs)
+
 
 class JSONLinesWriter:
     def __init__(
@@ -28,12 +73,11 @@ class JSONLinesWriter:
             ...     writer.add_one({'c': 3})
 
         Args:
-            path: file to open.
+            path: file to open. Compressed files and '-' (stdout) are supported, see `open_file()`.
             chunk_size: flush the buffer every 'chunk_size' records.
             **kwargs: keyword arguments passed to 'json.dumps()'
         """
-        Path(path).parent.mkdir(exist_ok=True, parents=True)
-        self.fp = open(path, "w")
+        self.fp = open_file(path, "w")
         self.json_kw = kwargs
         if chunk_size is None:
             self.chunk_size = 1_000
@@ -95,6 +139,22 @@ def read_json_lines(path, **kwargs):
     return obj_list
 
 
+def iter_json_lines(path: os.PathLike, **kwargs) -> Iterator[Any]:
+    """Read a json lines file one record at a time.
+
+    Unlike `read_json_lines()`, memory use does not grow with the size of the file.
+
+    Args:
+        path: file to read. Compressed files and '-' (stdin) are supported, see `open_file()`.
+        **kwargs: keyword arguments passed to 'json.loads()'
+    """
+    with open_file(path, "r") as f:
+        for line in f:
+            if line.strip() == "":
+                continue
+            yield json.loads(line, **kwargs)
+
+
 def write_json_lines(obj_list, path, **kwargs):
     path = Path(path)
     path.parent.mkdir(exist_ok=True, parents=True)
@@ -134,6 +194,7 @@ def sizeof_fmt(num, suffix="B"):
 
 def used_mem(msg=None, echo=True, echo_bytes=False):
     import psutil
+
     process = psutil.Process()
     mem_bytes = process.memory_info().rss
     if not echo:
@@ -186,6 +247,7 @@ def format_bytes(
 
 def get_relative_file_path(path):
     import pyrootutils
+
     try:
         root = Path(pyrootutils.find_root())
     except FileNotFoundError:
@@ -381,6 +443,108 @@ def tail_json_lines(
     return objs
 
 
+def follow_json_lines(
+    path: os.PathLike,
+    offset: Optional[int] = None,
+    poll_interval: float = 0.05,
+    max_interval: float = 1.0,
+    backoff: float = 2.0,
+    idle_timeout: Optional[float] = None,
+    with_offset: bool = False,
+    **kwargs,
+) -> Iterator[Any]:
+    """Yield the records appended to a json lines file, like `tail -F`.
+
+    Unlike calling `tail_json_lines()` in a loop, the file is kept open and only the bytes
+    after the last read position are read. A last line without a newline is held back until
+    it is complete. If the file is truncated (e.g. overwritten), it is read again from the
+    start. If it is replaced by another file (e.g. log rotation), the rest of the old file
+    is read and the new file is followed from its start.
+
+    When there is no new data, the file is checked again after `poll_interval` seconds, and
+    the interval grows by `backoff` up to `max_interval`, so idle followers mostly sleep.
+
+    Example:
+        >>> for record in follow_json_lines('train_log.jsonl', offset=0):
+        ...     print(record['loss'])
+
+    Args:
+        path: file to follow. It does not need to exist yet.
+        offset: byte offset to start from, e.g. 0 for the start of the file or an offset
+            yielded earlier with `with_offset=True`. Defaults to the end of the file, or
+            its start if it does not exist yet.
+        poll_interval: shortest wait between checks for new data, in seconds.
+        max_interval: longest wait between checks for new data, in seconds.
+        backoff: factor of the wait after each check without new data.
+        idle_timeout: stop after this many seconds without new data. Defaults to never.
+        with_offset: yield `(offset, record)` tuples, where `offset` is the byte offset
+            after the line of the record, to resume from later.
+        **kwargs: keyword arguments passed to 'json.loads()'
+    """
+    path = Path(path)
+    f = None
+    position = 0  # Offset of the end of `buffer` in the file.
+    buffer = b""
+    interval = poll_interval
+    idle_since = time.monotonic()
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = path.open("rb")
+                except FileNotFoundError:
+                    # A file created after the start is read from its start.
+                    offset = 0
+                else:
+                    size = os.fstat(f.fileno()).st_size
+                    position = size if offset is None else min(offset, size)
+                    f.seek(position)
+                    # The offset applies to the first file only. Later files start at 0.
+                    offset = 0
+
+            data = b""
+            if f is not None:
+                data = f.read(1 << 20)
+                if not data:
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        stat = None
+                    if stat is not None and stat.st_ino != os.fstat(f.fileno()).st_ino:
+                        # Rotated. The old file was read to its end above.
+                        f.close()
+                        f, buffer = None, b""
+                        continue
+                    if stat is not None and stat.st_size < position:
+                        # Truncated. Partial lines of the old content are dropped.
+                        f.seek(0)
+                        position, buffer = 0, b""
+                        continue
+
+            if data:
+                line_start = position - len(buffer)
+                position += len(data)
+                lines = (buffer + data).split(b"\n")
+                buffer = lines.pop()
+                for line in lines:
+                    line_start += len(line) + 1
+                    if line.strip():
+                        record = json.loads(line, **kwargs)
+                        yield (line_start, record) if with_offset else record
+                interval = poll_interval
+                idle_since = time.monotonic()
+                continue
+
+            if idle_timeout is not None:
+                if time.monotonic() - idle_since >= idle_timeout:
+                    return
+            time.sleep(interval)
+            interval = min(interval * backoff, max_interval)
+    finally:
+        if f is not None:
+            f.close()
+
+
 def echo_rule(char="-") -> None:
     """Draw a line filling the width of the terminal using the given character."""
     rule = char * os.get_terminal_size().columns
@@ -1,25 +1,35 @@
-import json
 import random
 import string
-from pathlib import Path
+from functools import lru_cache
 
-pardir = Path(__file__).parent.joinpath("data_files")
 
-with pardir.joinpath("names.json").open("r") as f:
-    NAMES = json.load(f)
+@lru_cache(maxsize=None)
+def load_words(kind):
+    """Load a word list ('names' or 'adjectives') on first use."""
+    import json
+    from pathlib import Path
 
+    pardir = Path(__file__).parent.joinpath("data_files")
+    with pardir.joinpath(f"{kind}.json").open("r") as f:
+        return json.load(f)
 
-with pardir.joinpath("adjectives.json").open("r") as f:
-    ADJECTIVES = json.load(f)
+
+def __getattr__(name):
+    # Keep `NAMES` and `ADJECTIVES` as module attributes without reading the files on import.
+    if name == "NAMES":
+        return load_words("names")
+    if name == "ADJECTIVES":
+        return load_words("adjectives")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def generate(n=1, t="n"):
     assert t in ["n", "a"]
     assert n > 0
     if t == "n":
-        curr_list = NAMES
+        curr_list = load_words("names")
     else:
-        curr_list = ADJECTIVES
+        curr_list = load_words("adjectives")
 
     if n == 1:
         return random.choice(curr_list)
@@ -32,3 +42,104 @@ def generate(n=1, t="n"):
             ]
 
         return random.sample(curr_list, k=min(len(curr_list), n)) + others_
+
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(x):
+    """The splitmix64 finalizer. Scrambles the bits of a 64 bit integer."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class NameGenerator:
+    """Unique, reproducible names like 'admiring_agnesi_0042' for a huge number of items.
+
+    Index `i` is mapped to a name through a seeded permutation of the adjective x name x
+    suffix product space, so different indices always get different names. Nothing is
+    stored, each name costs O(1), and workers can split the work by index ranges:
+
+    Example:
+        >>> gen = NameGenerator(seed=13)
+        >>> gen[0], gen[1]
+        >>> names_of_worker_2 = list(gen.names(2_000_000, 3_000_000))
+
+    The permutation is a Feistel network on the smallest power of 4 that covers the space.
+    Values outside the space are mapped again (cycle walking), which takes less than four
+    rounds on average.
+
+    Args:
+        seed: the same seed always gives the same index -> name mapping.
+        suffix_digits: number of digits of the numeric suffix. The space has
+            `len(ADJECTIVES) * len(NAMES) * 10 ** suffix_digits` names. Use 0 for no suffix.
+        sep: separator between the parts of a name.
+        rounds: number of Feistel rounds.
+    """
+
+    def __init__(self, seed=0, suffix_digits=4, sep="_", rounds=4):
+        self.seed = seed
+        self.suffix_digits = suffix_digits
+        self.sep = sep
+        self.adjectives = load_words("adjectives")
+        self.names_list = load_words("names")
+        self.num_adjectives = len(self.adjectives)
+        self.num_names = len(self.names_list)
+        self.size = self.num_adjectives * self.num_names * 10**suffix_digits
+        self.half_bits = max(1, ((self.size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        rng = random.Random(seed)
+        self.round_keys = [rng.getrandbits(64) for _ in range(rounds)]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.name(index)
+
+    def permute(self, index):
+        """Map an index to a unique position in the name space."""
+        if not 0 <= index < self.size:
+            msg = f"Index {index} out of range for a space of {self.size} names."
+            raise IndexError(msg)
+        x = index
+        while True:
+            left, right = x >> self.half_bits, x & self.half_mask
+            for key in self.round_keys:
+                left, right = right, left ^ (
+                    mix64((right + key) & MASK64) & self.half_mask
+                )
+            x = (left << self.half_bits) | right
+            if x < self.size:
+                return x
+
+    def name(self, index):
+        """Return the name of `index`. It is unique in `range(len(self))`."""
+        x = self.permute(index)
+        x, adjective = divmod(x, self.num_adjectives)
+        suffix, name = divmod(x, self.num_names)
+        parts = [self.adjectives[adjective], self.names_list[name]]
+        if self.suffix_digits:
+            parts.append(f"{suffix:0{self.suffix_digits}d}")
+        return self.sep.join(parts)
+
+    def names(self, start=0, stop=None):
+        """Yield the names of indices `start` to `stop - 1`."""
+        if stop is None:
+            stop = self.size
+        for index in range(start, stop):
+            yield self.name(index)
+
+
+def generate_unique(n=1, seed=0, start=0, suffix_digits=4):
+    """Return `n` unique names. See `NameGenerator` for details.
+
+    Args:
+        n: number of names.
+        seed: the same seed always gives the same names.
+        start: index of the first name. Use disjoint `[start, start + n)` ranges to get
+            names that are unique across calls, e.g. one range per worker.
+        suffix_digits: number of digits of the numeric suffix.
+    """
+    return list(NameGenerator(seed, suffix_digits).names(start, start + n))
@@ -5,6 +5,8 @@ The rectangle class contains the height and width of a rectangle.
 It also provides methods to calculate the area and perimeter of the rectangle.
 """
 
+from typing import Tuple
+
 from . import rectangle_utils
 
 
@@ -12,17 +14,63 @@ class Rectangle(object):
     """Providing the necessary tools to work with a rectangle.
 
     This class stores the width and height of a rectangle. It also provides methods for calculating the area and perimeter of the rectangle.
+    The rectangle can optionally be positioned by the (x, y) coordinates of its lower left corner, e.g. for bounding boxes.
 
     Args:
         width (Number): The width of the rectangle.
         height (Number): The height of the rectangle.
+        x (Number): The x coordinate of the lower left corner. Defaults to 0.
+        y (Number): The y coordinate of the lower left corner. Defaults to 0.
     """
 
+    # No per-instance __dict__, which makes many rectangles much smaller in memory.
+    __slots__ = ("width", "height", "x", "y")
+
     def __init__(
-        self, width: rectangle_utils.Number, height: rectangle_utils.Number
+        self,
+        width: rectangle_utils.Number,
+        height: rectangle_utils.Number,
+        x: rectangle_utils.Number = 0,
+        y: rectangle_utils.Number = 0,
     ) -> None:
         self.width = width
         self.height = height
+        self.x = x
+        self.y = y
+
+    def get_bounds(self) -> Tuple[rectangle_utils.Number, ...]:
+        """Returns the bounds of the rectangle.
+
+        Returns:
+            Tuple[Number, ...]: The (x_min, y_min, x_max, y_max) coordinates of the rectangle.
+        """
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    def intersects(self, other: "Rectangle") -> bool:
+        """Returns True if the two rectangles overlap or touch.
+
+        Args:
+            other (Rectangle): The other rectangle.
+        """
+        return (
+            self.x <= other.x + other.width
+            and other.x <= self.x + self.width
+            and self.y <= other.y + other.height
+            and other.y <= self.y + self.height
+        )
+
+    def contains(self, other: "Rectangle") -> bool:
+        """Returns True if the other rectangle is inside this one (edges may touch).
+
+        Args:
+            other (Rectangle): The other rectangle.
+        """
+        return (
+            self.x <= other.x
+            and self.y <= other.y
+            and other.x + other.width <= self.x + self.width
+            and other.y + other.height <= self.y + self.height
+        )
 
     def get_area(self) -> rectangle_utils.Number:
         """Returns the area of the rectangle.
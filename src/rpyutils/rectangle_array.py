@@ -0,0 +1,219 @@
+"""Defines the RectangleArray class.
+
+This file contains the definition of the RectangleArray class.
+It stores the widths, heights and positions of many rectangles in contiguous arrays (struct of arrays)
+instead of one Python object per rectangle, so bulk computations run without a Python call per rectangle.
+NumPy arrays are used when NumPy is installed, otherwise `array('d')` from the standard library.
+"""
+
+import numbers
+import operator
+from array import array
+from typing import Iterable, List, Optional, Sequence, Union
+
+from . import rectangle_utils
+from .rectangle import Rectangle
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RectangleArray(object):
+    """Providing vectorized tools to work with many rectangles at once.
+
+    Values are stored as 64 bit floats.
+
+    Example:
+        >>> boxes = RectangleArray([1, 2, 3], [4, 5, 6])
+        >>> boxes.areas()
+        >>> big = boxes.filter(boxes.areas() > 5).sort(key="area")
+        >>> big.to_rectangles()
+
+    Args:
+        widths (Iterable[Number]): The widths of the rectangles.
+        heights (Iterable[Number]): The heights of the rectangles.
+        xs (Optional[Iterable[Number]]): The x coordinates of the lower left corners. Defaults to zeros.
+        ys (Optional[Iterable[Number]]): The y coordinates of the lower left corners. Defaults to zeros.
+        use_numpy (Optional[bool]): Use NumPy arrays. Defaults to True if NumPy is installed.
+    """
+
+    def __init__(
+        self,
+        widths: Iterable[rectangle_utils.Number],
+        heights: Iterable[rectangle_utils.Number],
+        xs: Optional[Iterable[rectangle_utils.Number]] = None,
+        ys: Optional[Iterable[rectangle_utils.Number]] = None,
+        use_numpy: Optional[bool] = None,
+    ) -> None:
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise ImportError("NumPy is not installed.")
+        self.use_numpy = use_numpy
+        self.widths = self._as_array(widths)
+        self.heights = self._as_array(heights)
+        n = len(self.widths)
+        self.xs = self._as_array(xs) if xs is not None else self._zeros(n)
+        self.ys = self._as_array(ys) if ys is not None else self._zeros(n)
+        if not len(self.heights) == len(self.xs) == len(self.ys) == n:
+            msg = (
+                f"Got {n} widths, {len(self.heights)} heights,"
+                f" {len(self.xs)} xs and {len(self.ys)} ys."
+            )
+            raise ValueError(msg)
+
+    def _as_array(self, values):
+        if self.use_numpy:
+            return np.ascontiguousarray(values, dtype=np.float64)
+        if isinstance(values, array) and values.typecode == "d":
+            return values
+        return array("d", values)
+
+    def _zeros(self, n):
+        if self.use_numpy:
+            return np.zeros(n, dtype=np.float64)
+        return array("d", bytes(8 * n))
+
+    def _new(self, widths, heights, xs, ys) -> "RectangleArray":
+        return type(self)(widths, heights, xs, ys, use_numpy=self.use_numpy)
+
+    @classmethod
+    def from_rectangles(
+        cls, rectangles: Iterable[Rectangle], use_numpy: Optional[bool] = None
+    ) -> "RectangleArray":
+        """Creates an array from `Rectangle` objects.
+
+        Args:
+            rectangles (Iterable[Rectangle]): The rectangles.
+            use_numpy (Optional[bool]): See the class docs.
+
+        Returns:
+            RectangleArray: The rectangles as an array.
+        """
+        rectangles = list(rectangles)
+        widths = [r.width for r in rectangles]
+        heights = [r.height for r in rectangles]
+        xs = [r.x for r in rectangles]
+        ys = [r.y for r in rectangles]
+        return cls(widths, heights, xs, ys, use_numpy=use_numpy)
+
+    def to_rectangles(self) -> List[Rectangle]:
+        """Returns a list of `Rectangle` objects."""
+        return list(
+            map(
+                Rectangle,
+                self.widths.tolist(),
+                self.heights.tolist(),
+                self.xs.tolist(),
+                self.ys.tolist(),
+            )
+        )
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def __iter__(self):
+        return iter(self.to_rectangles())
+
+    def __getitem__(self, index) -> Union[Rectangle, "RectangleArray"]:
+        """Returns one `Rectangle` for an integer index, else a new `RectangleArray`.
+
+        Slices are supported by both backends. Boolean masks and integer index arrays are
+        supported through `filter()` and `take()`, or directly with the NumPy backend.
+        """
+        if isinstance(index, numbers.Integral):
+            return Rectangle(
+                float(self.widths[index]),
+                float(self.heights[index]),
+                float(self.xs[index]),
+                float(self.ys[index]),
+            )
+        if isinstance(index, slice) or self.use_numpy:
+            return self._new(
+                self.widths[index], self.heights[index], self.xs[index], self.ys[index]
+            )
+        raise TypeError(f"Unsupported index type: {type(index).__name__}")
+
+    def __repr__(self) -> str:
+        backend = "numpy" if self.use_numpy else "array"
+        return f"{type(self).__name__}(n={len(self)}, backend={backend})"
+
+    def bounds(self):
+        """Returns the (x_min, y_min, x_max, y_max) arrays of all the rectangles."""
+        if self.use_numpy:
+            return self.xs, self.ys, self.xs + self.widths, self.ys + self.heights
+        x_max = array("d", map(operator.add, self.xs, self.widths))
+        y_max = array("d", map(operator.add, self.ys, self.heights))
+        return self.xs, self.ys, x_max, y_max
+
+    def areas(self):
+        """Returns the areas of all the rectangles.
+
+        Returns:
+            The areas in a NumPy array or an `array('d')`, depending on the backend.
+        """
+        if self.use_numpy:
+            return self.widths * self.heights
+        return array("d", map(operator.mul, self.widths, self.heights))
+
+    def perimeters(self):
+        """Returns the perimeters of all the rectangles.
+
+        Returns:
+            The perimeters in a NumPy array or an `array('d')`, depending on the backend.
+        """
+        if self.use_numpy:
+            return 2 * (self.widths + self.heights)
+        return array("d", [2 * (w + h) for w, h in zip(self.widths, self.heights)])
+
+    def _key_values(self, key: str):
+        key_funcs = {
+            "area": self.areas,
+            "perimeter": self.perimeters,
+            "width": lambda: self.widths,
+            "height": lambda: self.heights,
+        }
+        if key not in key_funcs:
+            msg = f"Unknown sort key '{key}'. Use one of {list(key_funcs)}."
+            raise ValueError(msg)
+        return key_funcs[key]()
+
+    def take(self, indices: Sequence[int]) -> "RectangleArray":
+        """Returns the rectangles at `indices` as a new array."""
+        columns = (self.widths, self.heights, self.xs, self.ys)
+        if self.use_numpy:
+            indices = np.asarray(indices, dtype=np.intp)
+            return self._new(*[c[indices] for c in columns])
+        return self._new(*[array("d", [c[i] for i in indices]) for c in columns])
+
+    def filter(self, mask: Sequence[bool]) -> "RectangleArray":
+        """Returns the rectangles where `mask` is True as a new array.
+
+        Example:
+            >>> boxes.filter(boxes.areas() > 100)  # NumPy backend
+            >>> boxes.filter([a > 100 for a in boxes.areas()])  # any backend
+        """
+        if self.use_numpy:
+            mask = np.asarray(mask, dtype=bool)
+            return self._new(
+                self.widths[mask], self.heights[mask], self.xs[mask], self.ys[mask]
+            )
+        return self.take([i for i, keep in enumerate(mask) if keep])
+
+    def argsort(self, key: str = "area", reverse: bool = False):
+        """Returns the indices that sort the rectangles by `key`.
+
+        Args:
+            key (str): One of 'area', 'perimeter', 'width' or 'height'.
+            reverse (bool): Sort in descending order.
+        """
+        values = self._key_values(key)
+        if self.use_numpy:
+            return np.argsort(-values if reverse else values, kind="stable")
+        return sorted(range(len(values)), key=values.__getitem__, reverse=reverse)
+
+    def sort(self, key: str = "area", reverse: bool = False) -> "RectangleArray":
+        """Returns a new array sorted by `key`. See `argsort()` for the arguments."""
+        return self.take(self.argsort(key=key, reverse=reverse))
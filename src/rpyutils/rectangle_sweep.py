@@ -0,0 +1,368 @@
+"""Defines sweep line algorithms over collections of positioned rectangles.
+
+This file contains functions that compute the union area, the overlapping pairs and the maximum overlap depth of many rectangles.
+A vertical line sweeps over the x axis and a segment tree keeps track of the y intervals that are covered at the current x.
+Rectangles are treated as half open boxes [x_min, x_max) x [y_min, y_max), so rectangles that only touch do not overlap.
+"""
+
+import heapq
+import os
+import tempfile
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
+
+from .rectangle import Rectangle
+from .rectangle_array import RectangleArray, np
+
+Rectangles = Union[Iterable[Rectangle], RectangleArray, Iterable[Sequence[float]]]
+
+# Fields of an event: x, kind (END sorts before START), y_min, y_max, rectangle index.
+END, START = 0.0, 1.0
+EVENT_FIELDS = 5
+
+
+def iter_bounds(rectangles: Rectangles) -> Iterator[Tuple[float, float, float, float]]:
+    """Yields the (x_min, y_min, x_max, y_max) bounds of rectangles.
+
+    Args:
+        rectangles (Rectangles): `Rectangle` objects, a `RectangleArray` or bounds tuples.
+    """
+    if isinstance(rectangles, RectangleArray):
+        yield from zip(*[b.tolist() for b in rectangles.bounds()])
+        return
+    for r in rectangles:
+        yield r.get_bounds() if isinstance(r, Rectangle) else tuple(r)
+
+
+def _spill(events: List[Tuple], directory: str) -> str:
+    """Writes sorted events to a temporary binary file and returns its path."""
+    events.sort()
+    fd, path = tempfile.mkstemp(suffix=".events", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        array("d", (v for e in events for v in e)).tofile(f)
+    return path
+
+
+def _read_events(path: str, chunk_events: int = 65_536) -> Iterator[Tuple]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = array("d")
+            try:
+                chunk.fromfile(f, chunk_events * EVENT_FIELDS)
+            except EOFError:
+                pass
+            if not chunk:
+                return
+            for i in range(0, len(chunk), EVENT_FIELDS):
+                yield tuple(chunk[i : i + EVENT_FIELDS])
+
+
+class _SortedEvents(object):
+    """Sorted sweep events and the sorted distinct y coordinates of a rectangle collection.
+
+    Events are sorted in memory while there are at most `max_events_in_memory` of them.
+    Beyond that, sorted runs are spilled to temporary files and merged lazily with `heapq.merge`,
+    so the input never has to fit in memory as Python objects.
+    The y coordinates are kept in a compact `array('d')` and deduplicated with `numpy.unique`.
+    Without NumPy they are sorted as Python floats, which needs memory for all of them.
+    """
+
+    def __init__(self, rectangles: Rectangles, max_events_in_memory: int, tmp_dir=None):
+        self.ys = array("d")
+        self.run_paths = list()
+        self.tmp_dir = None
+        events = list()
+        count = 0
+        for count, (x1, y1, x2, y2) in enumerate(iter_bounds(rectangles), start=1):
+            if x1 >= x2 or y1 >= y2:
+                continue
+            idx = float(count - 1)
+            events.append((x1, START, y1, y2, idx))
+            events.append((x2, END, y1, y2, idx))
+            self.ys.append(y1)
+            self.ys.append(y2)
+            if len(events) >= max_events_in_memory:
+                if self.tmp_dir is None:
+                    self.tmp_dir = tempfile.mkdtemp(
+                        prefix="rpyutils_sweep_", dir=tmp_dir
+                    )
+                self.run_paths.append(_spill(events, self.tmp_dir))
+                events = list()
+        events.sort()
+        self.events = events
+        if np is not None:
+            # Sorted and deduplicated as C doubles, without a Python float per value.
+            self.ys = array(
+                "d", np.unique(np.frombuffer(self.ys, dtype=float)).tobytes()
+            )
+        else:
+            self.ys = array("d", sorted(set(self.ys)))
+
+    def __iter__(self) -> Iterator[Tuple]:
+        if not self.run_paths:
+            return iter(self.events)
+        runs = [_read_events(p) for p in self.run_paths]
+        return heapq.merge(iter(self.events), *runs)
+
+    def close(self) -> None:
+        for path in self.run_paths:
+            os.remove(path)
+        if self.tmp_dir is not None:
+            os.rmdir(self.tmp_dir)
+        self.run_paths = list()
+        self.tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+
+class _CoverTree(object):
+    """Segment tree over elementary y intervals that tracks the total covered length."""
+
+    def __init__(self, ys: Sequence[float]) -> None:
+        self.ys = ys
+        self.size = max(len(ys) - 1, 1)
+        self.count = [0] * (4 * self.size)
+        self.covered = [0.0] * (4 * self.size)
+
+    def add(self, lo: int, hi: int, delta: int) -> None:
+        """Adds `delta` to the cover count of elementary intervals lo..hi-1."""
+        self._add(1, 0, self.size, lo, hi, delta)
+
+    def _add(self, node, node_lo, node_hi, lo, hi, delta):
+        if hi <= node_lo or node_hi <= lo:
+            return
+        if lo <= node_lo and node_hi <= hi:
+            self.count[node] += delta
+        else:
+            mid = (node_lo + node_hi) // 2
+            self._add(2 * node, node_lo, mid, lo, hi, delta)
+            self._add(2 * node + 1, mid, node_hi, lo, hi, delta)
+        if self.count[node] > 0:
+            self.covered[node] = self.ys[node_hi] - self.ys[node_lo]
+        elif node_hi - node_lo == 1:
+            self.covered[node] = 0.0
+        else:
+            self.covered[node] = self.covered[2 * node] + self.covered[2 * node + 1]
+
+    def total(self) -> float:
+        return self.covered[1]
+
+
+class _DepthTree(object):
+    """Segment tree over elementary y intervals with range add and global maximum."""
+
+    def __init__(self, size: int) -> None:
+        self.size = max(size, 1)
+        self.added = [0] * (4 * self.size)
+        self.best = [0] * (4 * self.size)
+
+    def add(self, lo: int, hi: int, delta: int) -> None:
+        self._add(1, 0, self.size, lo, hi, delta)
+
+    def _add(self, node, node_lo, node_hi, lo, hi, delta):
+        if hi <= node_lo or node_hi <= lo:
+            return
+        if lo <= node_lo and node_hi <= hi:
+            self.added[node] += delta
+        else:
+            mid = (node_lo + node_hi) // 2
+            self._add(2 * node, node_lo, mid, lo, hi, delta)
+            self._add(2 * node + 1, mid, node_hi, lo, hi, delta)
+        if node_hi - node_lo == 1:
+            self.best[node] = self.added[node]
+        else:
+            children = max(self.best[2 * node], self.best[2 * node + 1])
+            self.best[node] = self.added[node] + children
+
+    def max(self) -> int:
+        return self.best[1]
+
+
+class _StabbingTree(object):
+    """Segment tree over elementary y intervals that stores each interval in its canonical nodes.
+
+    `stab(i)` yields the stored intervals that cover elementary interval i in O(log n + k).
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = max(size, 1)
+        self.nodes = dict()  # Node -> set of the indices of the intervals stored there.
+
+    def add(self, lo: int, hi: int, idx: int) -> None:
+        self._update(1, 0, self.size, lo, hi, idx, True)
+
+    def remove(self, lo: int, hi: int, idx: int) -> None:
+        self._update(1, 0, self.size, lo, hi, idx, False)
+
+    def _update(self, node, node_lo, node_hi, lo, hi, idx, insert):
+        if hi <= node_lo or node_hi <= lo:
+            return
+        if lo <= node_lo and node_hi <= hi:
+            if insert:
+                self.nodes.setdefault(node, set()).add(idx)
+            else:
+                stored = self.nodes[node]
+                stored.discard(idx)
+                if not stored:
+                    del self.nodes[node]
+            return
+        mid = (node_lo + node_hi) // 2
+        self._update(2 * node, node_lo, mid, lo, hi, idx, insert)
+        self._update(2 * node + 1, mid, node_hi, lo, hi, idx, insert)
+
+    def stab(self, i: int) -> Iterator[int]:
+        node, node_lo, node_hi = 1, 0, self.size
+        while True:
+            yield from self.nodes.get(node, ())
+            if node_hi - node_lo == 1:
+                return
+            mid = (node_lo + node_hi) // 2
+            if i < mid:
+                node, node_hi = 2 * node, mid
+            else:
+                node, node_lo = 2 * node + 1, mid
+
+
+class _PointTree(object):
+    """Segment tree of indices at y positions that reports the indices in a position range.
+
+    Subtrees without indices are skipped, so a query costs O(log n) per reported position.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = max(size, 1)
+        self.count = [0] * (4 * self.size)
+        self.leaves = dict()  # Position -> set of indices.
+
+    def add(self, pos: int, idx: int) -> None:
+        self.leaves.setdefault(pos, set()).add(idx)
+        self._count(pos, 1)
+
+    def remove(self, pos: int, idx: int) -> None:
+        stored = self.leaves[pos]
+        stored.discard(idx)
+        if not stored:
+            del self.leaves[pos]
+        self._count(pos, -1)
+
+    def _count(self, pos, delta):
+        node, node_lo, node_hi = 1, 0, self.size
+        while True:
+            self.count[node] += delta
+            if node_hi - node_lo == 1:
+                return
+            mid = (node_lo + node_hi) // 2
+            if pos < mid:
+                node, node_hi = 2 * node, mid
+            else:
+                node, node_lo = 2 * node + 1, mid
+
+    def report(self, lo: int, hi: int) -> List[int]:
+        """The indices at positions lo..hi-1."""
+        found = list()
+        if lo < hi:
+            self._report(1, 0, self.size, lo, hi, found)
+        return found
+
+    def _report(self, node, node_lo, node_hi, lo, hi, found):
+        if hi <= node_lo or node_hi <= lo or self.count[node] == 0:
+            return
+        if node_hi - node_lo == 1:
+            found.extend(self.leaves[node_lo])
+            return
+        mid = (node_lo + node_hi) // 2
+        self._report(2 * node, node_lo, mid, lo, hi, found)
+        self._report(2 * node + 1, mid, node_hi, lo, hi, found)
+
+
+def union_area(
+    rectangles: Rectangles,
+    max_events_in_memory: int = 10_000_000,
+    tmp_dir=None,
+) -> float:
+    """Returns the area covered by at least one rectangle. Overlaps are counted once.
+
+    Runs in O(n log n) time.
+
+    Example:
+        >>> union_area([Rectangle(2, 2), Rectangle(2, 2, x=1, y=1)])
+        7.0
+
+    Args:
+        rectangles (Rectangles): `Rectangle` objects, a `RectangleArray` or (x_min, y_min, x_max, y_max) tuples.
+        max_events_in_memory (int): Sort at most this many events in memory. Larger inputs are sorted in runs on disk.
+        tmp_dir: Directory for the sorted runs. Defaults to the system temporary directory.
+
+    Returns:
+        float: The union area.
+    """
+    with _SortedEvents(rectangles, max_events_in_memory, tmp_dir) as events:
+        ys = events.ys
+        tree = _CoverTree(ys)
+        area = 0.0
+        prev_x = None
+        for x, kind, y1, y2, _ in events:
+            if prev_x is not None:
+                area += tree.total() * (x - prev_x)
+            prev_x = x
+            delta = 1 if kind == START else -1
+            tree.add(bisect_left(ys, y1), bisect_left(ys, y2), delta)
+    return area
+
+
+def max_overlap_depth(
+    rectangles: Rectangles,
+    max_events_in_memory: int = 10_000_000,
+    tmp_dir=None,
+) -> int:
+    """Returns the largest number of rectangles that cover one point.
+
+    Runs in O(n log n) time. See `union_area()` for the arguments.
+    """
+    with _SortedEvents(rectangles, max_events_in_memory, tmp_dir) as events:
+        ys = events.ys
+        tree = _DepthTree(len(ys) - 1)
+        depth = 0
+        for _, kind, y1, y2, _ in events:
+            delta = 1 if kind == START else -1
+            tree.add(bisect_left(ys, y1), bisect_left(ys, y2), delta)
+            if delta > 0:
+                depth = max(depth, tree.max())
+    return depth
+
+
+def intersecting_pairs(
+    rectangles: Rectangles,
+    max_events_in_memory: int = 10_000_000,
+    tmp_dir=None,
+) -> Iterator[Tuple[int, int]]:
+    """Yields the (i, j) index pairs, i < j, of the rectangles that overlap with a positive area.
+
+    Indices are positions in the input. When a rectangle enters the sweep, the active rectangles
+    that overlap it in y either contain its y_min (a stabbing query on a segment tree) or start
+    strictly inside its y range (a range query on the active y_min values). Both report only
+    the matches, so it runs in O((n + k) log n) time for k pairs, even when nothing overlaps.
+    See `union_area()` for the arguments.
+    """
+    with _SortedEvents(rectangles, max_events_in_memory, tmp_dir) as events:
+        ys = events.ys
+        spans = _StabbingTree(len(ys) - 1)
+        starts = _PointTree(len(ys))
+        for _, kind, y1, y2, idx in events:
+            idx = int(idx)
+            lo, hi = bisect_left(ys, y1), bisect_left(ys, y2)
+            if kind == END:
+                spans.remove(lo, hi, idx)
+                starts.remove(lo, idx)
+                continue
+            others = list(spans.stab(lo))
+            others.extend(starts.report(lo + 1, hi))
+            for other in others:
+                yield (other, idx) if other < idx else (idx, other)
+            spans.add(lo, hi, idx)
+            starts.add(lo, idx)
@@ -1,4 +1,6 @@
-from typing import Union, List
+import math
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 Number = Union[int, float]
 
@@ -55,3 +57,207 @@ def mul_number_list(number_list: List[Number]) -> Number:
     for number in number_list:
         total = mul_two(number, total)
     return total
+
+
+# Length at which `benchmarks.bench_reductions` compares method "auto" with "parallel". "auto" stays serial:
+# pickling the chunks to the workers costs more than `math.fsum` or `math.prod` of them.
+PARALLEL_THRESHOLD = 20_000_000
+
+
+def _is_array(numbers) -> bool:
+    """Checks for NumPy arrays without importing NumPy."""
+    return hasattr(numbers, "dtype") and hasattr(numbers, "ndim")
+
+
+def kahan_sum(number_list: Iterable[Number]) -> float:
+    """Calculates the sum of numbers with compensated (Kahan-Babuska-Neumaier) summation.
+    It carries the rounding error of every addition in a separate term, so the error does not grow with the length of the input.
+    Args:
+        number_list (Iterable[Number]): The numbers to add.
+    Returns:
+        float: The sum of the numbers.
+    """
+    total = 0.0
+    compensation = 0.0
+    for number in number_list:
+        new_total = total + number
+        if abs(total) >= abs(number):
+            compensation += (total - new_total) + number
+        else:
+            compensation += (number - new_total) + total
+        total = new_total
+    return total + compensation
+
+
+def pairwise_sum(number_list: Sequence[Number], block_size: int = 128) -> Number:
+    """Calculates the sum of numbers by recursively adding the sums of the two halves.
+    The rounding error grows with log(n) instead of n. Blocks of `block_size` numbers are added with the builtin sum.
+    Args:
+        number_list (Sequence[Number]): The numbers to add.
+        block_size (int): The size of the blocks that are added directly.
+    Returns:
+        Number: The sum of the numbers.
+    """
+
+    def _sum_range(start: int, stop: int) -> Number:
+        if stop - start <= block_size:
+            return sum(number_list[start:stop])
+        middle = (start + stop) // 2
+        return _sum_range(start, middle) + _sum_range(middle, stop)
+
+    return _sum_range(0, len(number_list))
+
+
+def log_prod(number_list: Iterable[Number]) -> Tuple[int, float]:
+    """Calculates the product of numbers in log space, which does not overflow or underflow.
+    The product is `sign * math.exp(log_abs)`.
+    Args:
+        number_list (Iterable[Number]): The numbers to multiply.
+    Returns:
+        Tuple[int, float]: The sign (-1, 0 or 1) and the natural log of the absolute value of the product.
+    """
+    sign = 1
+    logs = list()
+    for number in number_list:
+        if number == 0:
+            return 0, -math.inf
+        if number < 0:
+            sign = -sign
+        logs.append(math.log(abs(number)))
+    return sign, math.fsum(logs)
+
+
+def _chunks(number_list: Iterable[Number], chunk_size: int) -> Iterator[List[Number]]:
+    iterator = iter(number_list)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _sum_chunk(chunk: Sequence[Number]) -> Number:
+    # `math.fsum` converts to float, so exact types (int, Fraction, Decimal) keep the `sum`.
+    # A float total means there were floats, which are added again correctly rounded.
+    total = sum(chunk)
+    return math.fsum(chunk) if isinstance(total, float) else total
+
+
+def _numpy_sum(number_list) -> Number:
+    import numpy as np
+
+    array = np.asarray(number_list)
+    if array.dtype.kind in "iu" and array.size:
+        # NumPy integers silently overflow, so large totals are added as Python ints.
+        peak = max(abs(int(array.min())), abs(int(array.max())))
+        if peak * array.size >= 2**63:
+            return sum(array.tolist())
+    return np.sum(array).item()
+
+
+def parallel_reduce(
+    number_list: Iterable[Number],
+    operation: str = "sum",
+    chunk_size: int = 1_000_000,
+    pool_size: Optional[int] = None,
+) -> Union[Number, Tuple[int, float]]:
+    """Reduces a very large sequence in chunks on a process pool.
+    Every chunk is reduced exactly (`math.fsum`) or in log space (`log_prod`) and the partial results are combined the same way.
+    Args:
+        number_list (Iterable[Number]): The numbers to reduce.
+        operation (str): 'sum' or 'log_prod'.
+        chunk_size (int): The number of values sent to a worker at once.
+        pool_size (Optional[int]): The number of worker processes. Defaults to `os.cpu_count()`.
+    Returns:
+        Union[Number, Tuple[int, float]]: The sum, or the (sign, log_abs) of the product.
+    """
+    import multiprocessing as mp
+
+    funcs = {"sum": _sum_chunk, "log_prod": log_prod}
+    if operation not in funcs:
+        raise ValueError(f"Unknown operation '{operation}'. Use one of {list(funcs)}.")
+    with mp.Pool(pool_size) as pool:
+        partials = pool.map(funcs[operation], _chunks(number_list, chunk_size))
+    if operation == "sum":
+        return _sum_chunk(partials)
+    sign = 1
+    for partial_sign, _ in partials:
+        sign *= partial_sign
+    if sign == 0:
+        return 0, -math.inf
+    return sign, math.fsum(log_abs for _, log_abs in partials)
+
+
+def sum_numbers(number_list: Iterable[Number], method: str = "auto") -> Number:
+    """Calculates the sum of numbers fast and without avoidable rounding errors.
+    With method 'auto' the strategy depends on the input: NumPy arrays use `numpy.sum` (pairwise, integer arrays whose total
+    could overflow are added as Python ints), ints are added exactly by the builtin sum, and floats use `math.fsum`, which is correctly rounded.
+    'auto' never uses the process pool of method 'parallel', see `PARALLEL_THRESHOLD`.
+    Args:
+        number_list (Iterable[Number]): The numbers to add. A list, any iterable or a NumPy array.
+        method (str): One of 'auto', 'builtin', 'fsum', 'kahan', 'pairwise', 'numpy', 'parallel' or 'loop' (`sum_number_list`).
+    Returns:
+        Number: The sum of the numbers.
+    """
+    if method == "auto":
+        if _is_array(number_list):
+            method = "numpy"
+        else:
+            if not isinstance(number_list, Sequence):
+                number_list = list(number_list)
+            return _sum_chunk(number_list)
+    if method == "numpy":
+        return _numpy_sum(number_list)
+    methods = {
+        "builtin": sum,
+        "fsum": math.fsum,
+        "kahan": kahan_sum,
+        "pairwise": lambda n: pairwise_sum(list(n)),
+        "parallel": parallel_reduce,
+        "loop": sum_number_list,
+    }
+    if method not in methods:
+        raise ValueError(
+            f"Unknown method '{method}'. Use 'auto' or one of {list(methods)}."
+        )
+    return methods[method](number_list)
+
+
+def prod_numbers(number_list: Iterable[Number], method: str = "auto") -> Number:
+    """Calculates the product of numbers fast.
+    With method 'auto' the strategy depends on the input: float NumPy arrays use `numpy.prod`, integer arrays are converted to Python ints first
+    because NumPy integers silently overflow, and anything else uses `math.prod`. The approximate log space product is only used with
+    method 'log' or 'parallel'. Use `log_prod` directly to keep products that do not fit in a float.
+    Args:
+        number_list (Iterable[Number]): The numbers to multiply. A list, any iterable or a NumPy array.
+        method (str): One of 'auto', 'math', 'numpy', 'log', 'parallel' or 'loop' (`mul_number_list`).
+    Returns:
+        Number: The product of the numbers.
+    """
+    if method == "auto":
+        if _is_array(number_list):
+            if number_list.dtype.kind in "iub":
+                return math.prod(number_list.tolist())
+            method = "numpy"
+        else:
+            method = "math"
+    if method == "math":
+        return math.prod(number_list)
+    if method == "numpy":
+        import numpy as np
+
+        return np.prod(np.asarray(number_list)).item()
+    if method in ("log", "parallel"):
+        if method == "log":
+            sign, log_abs = log_prod(number_list)
+        else:
+            sign, log_abs = parallel_reduce(number_list, operation="log_prod")
+        if sign == 0:
+            return 0
+        try:
+            return sign * math.exp(log_abs)
+        except OverflowError:
+            return sign * math.inf
+    if method == "loop":
+        return mul_number_list(number_list)
+    raise ValueError(f"Unknown method '{method}'.")
@@ -0,0 +1,371 @@
+"""Defines a spatial index for positioned rectangles.
+
+This file contains the definition of the RectangleIndex class, an R-tree over axis aligned rectangles.
+The tree is bulk loaded with the Sort-Tile-Recursive (STR) algorithm and supports incremental inserts and deletes.
+It answers intersection, containment and k-nearest queries without looking at every rectangle.
+"""
+
+import heapq
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .rectangle import Rectangle
+from .rectangle_array import RectangleArray
+
+Bounds = Tuple[float, float, float, float]
+Query = Union[Rectangle, Sequence[float]]
+
+
+class _Node(object):
+    """A node of the R-tree.
+
+    Leaves hold `(x_min, y_min, x_max, y_max, item_id)` entries, inner nodes hold child nodes.
+    """
+
+    __slots__ = ("leaf", "entries", "bounds")
+
+    def __init__(self, leaf: bool, entries: List) -> None:
+        self.leaf = leaf
+        self.entries = entries
+        self.bounds = None
+        self.update_bounds()
+
+    def update_bounds(self) -> None:
+        if not self.entries:
+            self.bounds = None
+            return
+        if self.leaf:
+            boxes = self.entries
+        else:
+            boxes = [child.bounds for child in self.entries]
+        self.bounds = (
+            min(b[0] for b in boxes),
+            min(b[1] for b in boxes),
+            max(b[2] for b in boxes),
+            max(b[3] for b in boxes),
+        )
+
+
+def _as_bounds(query: Query) -> Bounds:
+    """Returns the bounds of a rectangle, a point `(x, y)` or bounds `(x_min, y_min, x_max, y_max)`."""
+    if isinstance(query, Rectangle):
+        return query.get_bounds()
+    if len(query) == 2:
+        return (query[0], query[1], query[0], query[1])
+    return tuple(query)
+
+
+def _intersects(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _contains(outer: Bounds, inner: Bounds) -> bool:
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[2] <= outer[2]
+        and inner[3] <= outer[3]
+    )
+
+
+def _union(a: Bounds, b: Bounds) -> Bounds:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(b: Bounds) -> float:
+    return (b[2] - b[0]) * (b[3] - b[1])
+
+
+def _min_dist(a: Bounds, b: Bounds) -> float:
+    """Euclidean distance between the closest points of two boxes. 0 if they intersect."""
+    dx = max(a[0] - b[2], b[0] - a[2], 0.0)
+    dy = max(a[1] - b[3], b[1] - a[3], 0.0)
+    return math.hypot(dx, dy)
+
+
+def _str_pack(boxes: List, max_entries: int) -> List[List]:
+    """Group boxes into runs of `max_entries` with Sort-Tile-Recursive.
+
+    Sort by x center, cut into vertical slices, sort every slice by y center and cut it into groups.
+    """
+    num_groups = math.ceil(len(boxes) / max_entries)
+    num_slices = math.ceil(math.sqrt(num_groups))
+    slice_size = num_slices * max_entries
+    boxes = sorted(boxes, key=lambda b: b[0] + b[2])
+    groups = list()
+    for start in range(0, len(boxes), slice_size):
+        vertical_slice = sorted(
+            boxes[start : start + slice_size], key=lambda b: b[1] + b[3]
+        )
+        for group_start in range(0, len(vertical_slice), max_entries):
+            groups.append(vertical_slice[group_start : group_start + max_entries])
+    return groups
+
+
+class RectangleIndex(object):
+    """Providing fast queries over many positioned rectangles with an R-tree.
+
+    Items are identified by an id. Query methods return the ids of the matching items.
+
+    Example:
+        >>> boxes = [Rectangle(2, 1, x=0, y=0), Rectangle(1, 1, x=5, y=5)]
+        >>> index = RectangleIndex.from_rectangles(boxes)
+        >>> index.intersects(Rectangle(1, 1, x=1, y=0))
+        [0]
+        >>> index.nearest((4, 4), k=1)
+        [1]
+        >>> index.insert(Rectangle(1, 1, x=9, y=9), item_id="new")
+        >>> index.delete(0)
+
+    Args:
+        max_entries (int): The maximum number of entries in a node.
+    """
+
+    def __init__(self, max_entries: int = 16) -> None:
+        if max_entries < 2:
+            raise ValueError("max_entries must be at least 2.")
+        self.max_entries = max_entries
+        self.root = _Node(leaf=True, entries=[])
+        self.bounds: Dict[Hashable, Bounds] = dict()
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self.bounds
+
+    @classmethod
+    def from_bounds(
+        cls,
+        bounds: Iterable[Bounds],
+        item_ids: Optional[Iterable[Hashable]] = None,
+        max_entries: int = 16,
+    ) -> "RectangleIndex":
+        """Bulk loads an index with Sort-Tile-Recursive packing.
+
+        This is much faster than inserting the items one by one and gives a better tree.
+
+        Args:
+            bounds (Iterable[Bounds]): The (x_min, y_min, x_max, y_max) of every item.
+            item_ids (Optional[Iterable[Hashable]]): The id of every item. Defaults to 0, 1, 2, ...
+            max_entries (int): The maximum number of entries in a node.
+
+        Returns:
+            RectangleIndex: The index.
+        """
+        index = cls(max_entries=max_entries)
+        if item_ids is None:
+            entries = [(*b, i) for i, b in enumerate(bounds)]
+            index._next_id = len(entries)
+        else:
+            entries = [(*b, i) for b, i in zip(bounds, item_ids)]
+        index.bounds = {e[4]: e[:4] for e in entries}
+        if len(index.bounds) != len(entries):
+            raise ValueError("Item ids must be unique.")
+        if not entries:
+            return index
+
+        nodes = [
+            _Node(leaf=True, entries=group) for group in _str_pack(entries, max_entries)
+        ]
+        while len(nodes) > 1:
+            groups = _str_pack([(*n.bounds, n) for n in nodes], max_entries)
+            nodes = [
+                _Node(leaf=False, entries=[g[4] for g in group]) for group in groups
+            ]
+        index.root = nodes[0]
+        return index
+
+    @classmethod
+    def from_rectangles(
+        cls,
+        rectangles: Union[Iterable[Rectangle], RectangleArray],
+        item_ids: Optional[Iterable[Hashable]] = None,
+        max_entries: int = 16,
+    ) -> "RectangleIndex":
+        """Bulk loads an index from `Rectangle` objects or a `RectangleArray`.
+
+        See `from_bounds()` for the arguments.
+        """
+        if isinstance(rectangles, RectangleArray):
+            bounds = zip(*[b.tolist() for b in rectangles.bounds()])
+        else:
+            bounds = (r.get_bounds() for r in rectangles)
+        return cls.from_bounds(bounds, item_ids=item_ids, max_entries=max_entries)
+
+    def insert(self, item: Query, item_id: Optional[Hashable] = None) -> Hashable:
+        """Inserts one item.
+
+        Args:
+            item (Query): A `Rectangle` or (x_min, y_min, x_max, y_max) bounds.
+            item_id (Optional[Hashable]): The id of the item. Defaults to the next free integer.
+
+        Returns:
+            Hashable: The id of the item.
+        """
+        if item_id is None:
+            while self._next_id in self.bounds:
+                self._next_id += 1
+            item_id = self._next_id
+            self._next_id += 1
+        if item_id in self.bounds:
+            raise KeyError(f"Item id already in the index: {item_id!r}")
+        bounds = _as_bounds(item)
+        self.bounds[item_id] = bounds
+
+        # Go down by least area enlargement and remember the path for the updates.
+        path = [self.root]
+        node = self.root
+        while not node.leaf:
+            node = min(
+                node.entries,
+                key=lambda c: (
+                    _area(_union(c.bounds, bounds)) - _area(c.bounds),
+                    _area(c.bounds),
+                ),
+            )
+            path.append(node)
+        node.entries.append((*bounds, item_id))
+
+        split = None
+        for node in reversed(path):
+            if split is not None:
+                node.entries.append(split)
+            split = self._split(node) if len(node.entries) > self.max_entries else None
+            node.update_bounds()
+        if split is not None:
+            self.root = _Node(leaf=False, entries=[self.root, split])
+        return item_id
+
+    def _split(self, node: _Node) -> _Node:
+        """Moves half of the entries of an overflowing node into a new sibling node.
+
+        Entries are sorted by center along the axis with the larger spread and cut in half.
+        """
+        boxes = node.entries if node.leaf else [c.bounds for c in node.entries]
+        x_spread = max(b[2] for b in boxes) - min(b[0] for b in boxes)
+        y_spread = max(b[3] for b in boxes) - min(b[1] for b in boxes)
+        axis = 0 if x_spread >= y_spread else 1
+        order = sorted(
+            range(len(boxes)), key=lambda i: boxes[i][axis] + boxes[i][axis + 2]
+        )
+        half = len(order) // 2
+        entries = node.entries
+        node.entries = [entries[i] for i in order[:half]]
+        sibling = _Node(leaf=node.leaf, entries=[entries[i] for i in order[half:]])
+        node.update_bounds()
+        return sibling
+
+    def delete(self, item_id: Hashable) -> None:
+        """Deletes one item.
+
+        Empty nodes are removed. Under-full nodes are kept as they are, which keeps deletes cheap.
+
+        Args:
+            item_id (Hashable): The id of the item.
+
+        Raises:
+            KeyError: if the id is not in the index.
+        """
+        bounds = self.bounds.pop(item_id)
+        path = self._find_leaf(self.root, bounds, item_id, [])
+        leaf = path[-1]
+        leaf.entries = [e for e in leaf.entries if e[4] != item_id]
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            if not node.entries and depth > 0:
+                path[depth - 1].entries.remove(node)
+            node.update_bounds()
+        while not self.root.leaf and len(self.root.entries) == 1:
+            self.root = self.root.entries[0]
+        if not self.root.leaf and not self.root.entries:
+            self.root = _Node(leaf=True, entries=[])
+
+    def _find_leaf(
+        self, node: _Node, bounds: Bounds, item_id: Hashable, path: List[_Node]
+    ) -> List[_Node]:
+        path = path + [node]
+        if node.leaf:
+            if any(e[4] == item_id for e in node.entries):
+                return path
+            return []
+        for child in node.entries:
+            if _contains(child.bounds, bounds):
+                found = self._find_leaf(child, bounds, item_id, path)
+                if found:
+                    return found
+        return []
+
+    def _search(self, query: Bounds, inner_test, leaf_test) -> List[Hashable]:
+        if self.root.bounds is None:
+            return []
+        result = list()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.leaf:
+                result.extend(e[4] for e in node.entries if leaf_test(e, query))
+            else:
+                stack.extend(c for c in node.entries if inner_test(c.bounds, query))
+        return result
+
+    def intersects(self, query: Query) -> List[Hashable]:
+        """Returns the ids of the items that overlap or touch the query.
+
+        Args:
+            query (Query): A `Rectangle`, a point (x, y) or bounds (x_min, y_min, x_max, y_max).
+        """
+        return self._search(_as_bounds(query), _intersects, _intersects)
+
+    def contains(self, query: Query) -> List[Hashable]:
+        """Returns the ids of the items that contain the query, e.g. all boxes around a point.
+
+        Args:
+            query (Query): A `Rectangle`, a point (x, y) or bounds (x_min, y_min, x_max, y_max).
+        """
+        return self._search(_as_bounds(query), _contains, _contains)
+
+    def within(self, query: Query) -> List[Hashable]:
+        """Returns the ids of the items that are inside the query.
+
+        Args:
+            query (Query): A `Rectangle` or bounds (x_min, y_min, x_max, y_max).
+        """
+        return self._search(
+            _as_bounds(query), _intersects, lambda e, q: _contains(q, e)
+        )
+
+    def nearest(self, query: Query, k: int = 1) -> List[Hashable]:
+        """Returns the ids of the `k` items closest to the query, closest first.
+
+        The distance is between the closest points of the two boxes, so it is 0 for items that intersect the query.
+        Nodes are visited best first, so only the part of the tree near the query is read.
+
+        Args:
+            query (Query): A `Rectangle`, a point (x, y) or bounds (x_min, y_min, x_max, y_max).
+            k (int): The number of items.
+        """
+        query = _as_bounds(query)
+        if self.root.bounds is None or k <= 0:
+            return []
+        result = list()
+        # (distance, tie breaker, is_item, node or item id)
+        heap = [(_min_dist(self.root.bounds, query), 0, False, self.root)]
+        counter = 1
+        while heap and len(result) < k:
+            _, _, is_item, value = heapq.heappop(heap)
+            if is_item:
+                result.append(value)
+                continue
+            for entry in value.entries:
+                if value.leaf:
+                    heapq.heappush(
+                        heap, (_min_dist(entry[:4], query), counter, True, entry[4])
+                    )
+                else:
+                    heapq.heappush(
+                        heap, (_min_dist(entry.bounds, query), counter, False, entry)
+                    )
+                counter += 1
+        return result
@@ -0,0 +1,89 @@
+import gzip
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import rpyutils
+
+RECORDS = [
+    {"id": i, "k": i % 3, "meta": {"lang": "en" if i % 2 else "de"}} for i in range(10)
+]
+TEXT = "".join(json.dumps(r) + "\n" for r in RECORDS)
+
+
+def _run(args, stdin=None, cwd=None):
+    env = {"PYTHONPATH": str(Path(rpyutils.__file__).parent.parent)}
+    return subprocess.run(
+        [sys.executable, "-m", "rpyutils", "jsonl", *args],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=cwd,
+    )
+
+
+def _lines(records):
+    return [json.dumps(r) for r in records]
+
+
+CASES = [
+    (["count"], ["10"]),
+    (["head", "-n", "3"], _lines(RECORDS[:3])),
+    (["tail", "-n", "2"], _lines(RECORDS[-2:])),
+    (["cat"], _lines(RECORDS)),
+    (["sample", "-k", "20"], _lines(RECORDS)),
+    (["sort", "-k", "k"], _lines(sorted(RECORDS, key=lambda r: r["k"]))),
+    (["filter", "r['k'] == 1"], _lines([r for r in RECORDS if r["k"] == 1])),
+]
+
+
+@pytest.mark.parametrize("args, expected", CASES)
+@pytest.mark.parametrize("source", ["gzip", "stdin"])
+def test_jsonl_commands_read_gzip_files_and_stdin(tmp_path, args, expected, source):
+    if source == "gzip":
+        path = tmp_path / "in.jsonl.gz"
+        with gzip.open(path, "wt") as f:
+            f.write(TEXT)
+        result = _run([*args, str(path)])
+    else:
+        result = _run(args, stdin=TEXT)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == expected
+
+
+def test_jsonl_select_reads_gzip_files_and_stdin(tmp_path):
+    path = tmp_path / "in.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(TEXT)
+    expected = _lines({"id": r["id"], "meta.lang": r["meta"]["lang"]} for r in RECORDS)
+    for args, stdin in ((["-i", str(path)], None), ([], TEXT)):
+        result = _run(["select", "id", "meta.lang", *args], stdin=stdin)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.splitlines() == expected
+
+
+def test_jsonl_partition_and_split_write_gzip_files_from_stdin(tmp_path):
+    result = _run(
+        ["partition", "-k", "k", "-n", "2", "-o", "buckets", "--suffix", ".jsonl.gz"],
+        TEXT,
+        tmp_path,
+    )
+    assert result.returncode == 0, result.stderr
+    records = list()
+    for path in sorted((tmp_path / "buckets").glob("bucket-*.jsonl.gz")):
+        with gzip.open(path, "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    assert sorted(records, key=lambda r: r["id"]) == RECORDS
+
+    result = _run(
+        ["split", "--parts", "3", "-o", "part-{index}.jsonl.gz"], TEXT, tmp_path
+    )
+    assert result.returncode == 0, result.stderr
+    for index, path in enumerate(result.stdout.split()):
+        with gzip.open(tmp_path / path, "rt") as f:
+            # Lines are dealt round robin.
+            assert f.read().splitlines() == _lines(RECORDS[index::3])
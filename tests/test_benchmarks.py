@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from rpyutils import app, benchmarks
+
+
+def _results(**metrics):
+    return {"environment": {}, "metrics": metrics}
+
+
+def test_compare_results_reports_slower_timings_only():
+    baseline = _results(**{"a.x_s": 1.0, "a.y_s": 1.0, "a.z_s": 1.0, "a.rate": 100.0})
+    results = _results(
+        **{"a.x_s": 1.5, "a.y_s": 1.1, "a.z_s": 0.5, "a.rate": 1.0, "b.new_s": 9.0}
+    )
+    regressions = benchmarks.compare_results(results, baseline, threshold=0.2)
+    assert regressions == {"a.x_s": {"baseline": 1.0, "current": 1.5, "ratio": 1.5}}
+
+
+def test_compare_results_ignores_tiny_timings():
+    baseline = _results(**{"a.x_s": 1e-5, "a.y_s": 0.0})
+    results = _results(**{"a.x_s": 5e-4, "a.y_s": 0.1})
+    regressions = benchmarks.compare_results(results, baseline, min_seconds=1e-3)
+    assert list(regressions) == ["a.y_s"]
+    assert regressions["a.y_s"]["ratio"] == float("inf")
+
+
+def test_run_suite_keeps_the_best_time(monkeypatch):
+    times = iter([0.3, 0.1, 0.2])
+    monkeypatch.setattr(
+        benchmarks, "BENCH_SUITE", {"fake": lambda: {"t_s": next(times)}}
+    )
+    assert benchmarks.run_suite(repeat=3)["metrics"] == {"fake.t_s": 0.1}
+    with pytest.raises(ValueError):
+        benchmarks.run_suite(["missing"])
+
+
+@pytest.mark.parametrize("baseline_s, status", [(0.1, 1), (0.5, 0)])
+def test_bench_command_fails_on_regressions(tmp_path, monkeypatch, baseline_s, status):
+    monkeypatch.setattr(benchmarks, "BENCH_SUITE", {"fake": lambda: {"t_s": 0.5}})
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(_results(**{"fake.t_s": baseline_s})))
+    output = tmp_path / "results.json"
+    argv = [
+        "rpyutils",
+        "bench",
+        "--repeat",
+        "1",
+        "--baseline",
+        str(baseline),
+        "-o",
+        str(output),
+    ]
+    assert app.run(argv) == status
+    assert json.loads(output.read_text())["metrics"] == {"fake.t_s": 0.5}
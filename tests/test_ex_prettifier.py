@@ -0,0 +1,85 @@
+import io
+from collections import deque
+
+import pytest
+
+from rpyutils.ex_prettifier import Elided, bounded_str, pretty_key_value, preview_object
+
+pytest.importorskip("rich")
+
+
+class _Items(list):
+    """A list that counts how many of its items are read."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reads = 0
+
+    def __iter__(self):
+        for item in super().__iter__():
+            self.reads += 1
+            yield item
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {
+            "a": [1, 2, (3,)],
+            "b": 'x"y',
+            "c": {1, 2},
+            "d": frozenset({3}),
+            "e": set(),
+            "f": (),
+            "g": [],
+            "h": {},
+        },
+        (1, None, True, 1.5),
+        "plain text that is long",
+        12345,
+    ],
+)
+@pytest.mark.parametrize("max_length", [1, 5, 12, 1000])
+def test_bounded_str_matches_truncated_str(value, max_length):
+    expected = str(value)
+    if len(expected) > max_length:
+        expected = expected[: max_length - 1] + "…"
+    assert bounded_str(value, max_length) == expected
+
+
+def test_bounded_str_reads_only_the_needed_items():
+    value = _Items(range(100_000))
+    assert bounded_str(value, 20) == str(list(range(10)))[:19] + "…"
+    assert value.reads < 20
+
+
+def test_pretty_key_value_truncates_large_values():
+    from rich.console import Console
+
+    file = io.StringIO()
+    mapping = {"big": list(range(1_000_000)), "text": "x" * 1_000_000}
+    pretty_key_value(mapping, max_value_length=10, console=Console(file=file, width=80))
+    assert file.getvalue().splitlines() == ["big: [0, 1, 2,…", "text: xxxxxxxxx…"]
+
+
+def test_preview_object_elides_sets_and_deques_like_lists():
+    preview = preview_object(
+        {"s": set(range(1000)), "d": deque(range(1000)), "t": tuple(range(1000))},
+        max_length=3,
+    )
+    for key in "sdt":
+        assert len(preview[key]) == 4
+        assert repr(preview[key][-1]) == "... +997 items"
+
+
+def test_preview_object_cuts_the_text_of_other_objects():
+    preview = preview_object([b"x" * 10_000, 1.5, None, True], max_string=20)
+    assert isinstance(preview[0], Elided)
+    assert repr(preview[0]) == str(b"x" * 10_000)[:19] + "…"
+    assert preview[1:] == [1.5, None, True]
+
+
+def test_preview_object_bounds_numpy_arrays():
+    np = pytest.importorskip("numpy")
+    preview = preview_object({"a": np.arange(1_000_000)}, max_string=30)
+    assert len(repr(preview["a"])) <= 30
@@ -0,0 +1,18 @@
+"""`-X importtime` regression test of `import rpyutils`."""
+
+import os
+from pathlib import Path
+
+import rpyutils
+from rpyutils import benchmarks
+
+
+def test_import_is_fast_and_lazy(monkeypatch):
+    # The fresh interpreter imports the package under test, also without installing it.
+    src = str(Path(rpyutils.__file__).parent.parent)
+    monkeypatch.setenv(
+        "PYTHONPATH", os.pathsep.join([src, os.environ.get("PYTHONPATH", "")])
+    )
+    # Raises if the import loads a heavy module or exceeds the budget.
+    best = benchmarks.check_import_budget("rpyutils")
+    assert best <= 0.02
@@ -0,0 +1,30 @@
+import io
+
+import pytest
+
+from rpyutils import json_stream
+
+
+class _CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_values_split_across_chunks(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 4)
+    text = '{"data": [{"a": "a long string"}, 1.5e3, true, -Infinity, [1, [2]]]}'
+    items = list(json_stream.iter_json_items(io.StringIO(text), "data.item"))
+    assert items == [{"a": "a long string"}, 1500.0, True, float("-inf"), [1, [2]]]
+
+
+def test_malformed_value_is_raised_without_reading_the_rest(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 64)
+    source = _CountingReader("[[1, ]" + ", 2" * 100000 + "]")
+    with pytest.raises(ValueError, match="at character 1,"):
+        list(json_stream.iter_json_items(source))
+    assert source.reads == 1
@@ -0,0 +1,170 @@
+import json
+import random
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+import rpyutils
+from rpyutils import jsonl_ops
+
+SCRIPT = """
+import json, sys
+from rpyutils.jsonl_ops import partition_json_lines
+manifest = partition_json_lines(json.loads(sys.argv[1]), "k", 2, sys.argv[2], workers=2)
+print(manifest["records"])
+"""
+
+
+def _partition(inputs, stdin, out_dir):
+    env_path = str(Path(rpyutils.__file__).parent.parent)
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, json.dumps(inputs), str(out_dir)],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"PYTHONPATH": env_path},
+    )
+    return int(result.stdout)
+
+
+def _records(out_dir):
+    return sorted(
+        json.loads(line)["k"]
+        for path in Path(out_dir).glob("bucket-*.jsonl")
+        for line in path.read_text().splitlines()
+    )
+
+
+def test_partition_reads_stdin_with_workers(tmp_path):
+    for name, keys in (("b.jsonl", [3, 4]), ("c.jsonl", [5, 6])):
+        lines = "".join(json.dumps({"k": k}) + "\n" for k in keys)
+        (tmp_path / name).write_text(lines)
+    stdin = '{"k": 1}\n{"k": 2}\n'
+
+    inputs = ["-", str(tmp_path / "b.jsonl")]
+    assert _partition(inputs, stdin, tmp_path / "two") == 4
+    assert _records(tmp_path / "two") == [1, 2, 3, 4]
+
+    inputs = [str(tmp_path / "b.jsonl"), "-", str(tmp_path / "c.jsonl")]
+    assert _partition(inputs, stdin, tmp_path / "three") == 6
+    assert _records(tmp_path / "three") == [1, 2, 3, 4, 5, 6]
+
+
+def _write_records(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+
+
+def _read_records(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+
+def _random_records(n, seed=0):
+    rng = random.Random(seed)
+    records = list()
+    for i in range(n):
+        record = {"id": i}
+        if rng.random() < 0.8:
+            record["k"] = rng.randint(0, 20)
+        records.append(record)
+    return records
+
+
+def test_sort_json_lines_matches_sorted(tmp_path):
+    records = _random_records(500)
+    _write_records(tmp_path / "in.jsonl", records)
+    present = [r for r in records if "k" in r]
+    missing = [r for r in records if "k" not in r]
+    for reverse in (False, True):
+        out_path = tmp_path / f"sorted-{reverse}.jsonl"
+        n = jsonl_ops.sort_json_lines(
+            tmp_path / "in.jsonl", out_path, "k", reverse=reverse, max_memory=2_000
+        )
+        # Missing keys sort last in both directions, ties keep the input order.
+        expected = sorted(present, key=lambda r: r["k"], reverse=reverse) + missing
+        assert n == len(records)
+        assert _read_records(out_path) == expected
+
+
+def test_sort_json_lines_unique_keeps_first_record_per_key(tmp_path):
+    records = _random_records(500, seed=1)
+    _write_records(tmp_path / "in.jsonl", records)
+    out_path = tmp_path / "dedup.jsonl"
+    jsonl_ops.sort_json_lines(
+        tmp_path / "in.jsonl", out_path, ["k"], unique=True, max_memory=2_000
+    )
+    first = dict()
+    for record in records:
+        first.setdefault(record.get("k"), record)
+    expected = sorted(first.values(), key=lambda r: (r.get("k") is None, r.get("k")))
+    assert _read_records(out_path) == expected
+
+
+def test_partition_buffers_are_capped_per_shard(tmp_path, monkeypatch):
+    records = _random_records(300, seed=2)
+    _write_records(tmp_path / "in.jsonl", records)
+    buffer_sizes = list()
+    partition_shard = jsonl_ops._partition_shard
+
+    def spy(task):
+        buffer_sizes.append(task[-1])
+        return partition_shard(task)
+
+    monkeypatch.setattr(jsonl_ops, "MAX_PARTITION_BUFFER", 800)
+    monkeypatch.setattr(jsonl_ops, "_partition_shard", spy)
+    manifest = jsonl_ops.partition_json_lines(
+        tmp_path / "in.jsonl", "id", 8, tmp_path / "out"
+    )
+    assert buffer_sizes == [100]
+    assert manifest["records"] == len(records)
+    key = jsonl_ops.SortKey("id")
+    for bucket in range(8):
+        expected = [r for r in records if jsonl_ops.stable_bucket(key(r), 8) == bucket]
+        assert (
+            _read_records(tmp_path / "out" / f"bucket-{bucket:05d}.jsonl") == expected
+        )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sample_json_lines_is_an_ordered_subset(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(jsonl_ops, "PARALLEL_MIN_BYTES", 0)
+    records = _random_records(200, seed=3)
+    _write_records(tmp_path / "in.jsonl", records)
+    path = tmp_path / "in.jsonl"
+    assert jsonl_ops.sample_json_lines(path, 500, seed=0, workers=workers) == records
+    sample = jsonl_ops.sample_json_lines(path, 20, seed=0, workers=workers)
+    assert len(sample) == 20
+    assert sample == [r for r in records if r in sample]
+    assert sample == jsonl_ops.sample_json_lines(path, 20, seed=0, workers=workers)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sample_json_lines_by_key_and_weight(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(jsonl_ops, "PARALLEL_MIN_BYTES", 0)
+    records = _random_records(300, seed=4)
+    _write_records(tmp_path / "in.jsonl", records)
+    path = tmp_path / "in.jsonl"
+    sample = jsonl_ops.sample_json_lines(path, 3, seed=1, key="k", workers=workers)
+    counts = Counter(r.get("k") for r in records)
+    assert Counter(r.get("k") for r in sample) == {
+        k: min(n, 3) for k, n in counts.items()
+    }
+    assert sample == [r for r in records if r in sample]
+
+    sample = jsonl_ops.sample_json_lines(path, 50, seed=1, weight="k", workers=workers)
+    assert len(sample) == 50
+    assert all(r.get("k") for r in sample)
+
+
+def test_sample_json_lines_is_uniform(tmp_path):
+    _write_records(tmp_path / "in.jsonl", [{"id": i} for i in range(5)])
+    counts = Counter(
+        r["id"]
+        for seed in range(2_000)
+        for r in jsonl_ops.sample_json_lines(tmp_path / "in.jsonl", 2, seed=seed)
+    )
+    # Each record is in the sample with probability 2 / 5.
+    assert all(700 < counts[i] < 900 for i in range(5))
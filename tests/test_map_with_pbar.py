@@ -0,0 +1,107 @@
+import multiprocessing as mp
+import os
+
+from rpyutils import map_with_pbar
+
+
+def _init_slot(slots):
+    global slot
+    slot = map_with_pbar.take_worker_slot(slots)
+
+
+def _slot(_):
+    return slot
+
+
+def _omp_threads():
+    return os.environ.get("OMP_NUM_THREADS")
+
+
+def test_worker_slots_are_reused_across_worker_replacement():
+    slots = mp.Array("b", 2)
+    with mp.Pool(2, _init_slot, (slots,), maxtasksperchild=1) as pool:
+        assert set(pool.map(_slot, range(20), chunksize=1)) <= {0, 1}
+
+
+def test_thread_limits_are_set_in_replacement_workers(monkeypatch):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    outputs = map_with_pbar.map_tqdm(
+        _omp_threads, [()] * 6, pool_size=2, maxtasksperchild=1, worker_threads=1
+    )
+    assert outputs == ["1"] * 6
+    assert "OMP_NUM_THREADS" not in os.environ
+
+
+class _Bar:
+    instances = list()
+
+    def __init__(self, total=None, **kwargs):
+        self.total = total
+        self.n = 0
+        _Bar.instances.append(self)
+
+    def update(self, n):
+        self.n += n
+
+    def close(self):
+        pass
+
+
+def _double(record):
+    return {"x": record["x"] * 2}
+
+
+def test_map_json_lines_progress_counts_blank_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(map_with_pbar, "local_tqdm", _Bar)
+    in_path, out_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    in_path.write_text('{"x": 1}\n\n{"x": 2}\n  \n{"x": 3}\n\n')
+    for ordered in (True, False):
+        n = map_with_pbar.map_json_lines(
+            _double, in_path, out_path, pool_size=2, batch_size=1, ordered=ordered
+        )
+        assert n == 3
+        assert _Bar.instances[-1].n == _Bar.instances[-1].total == 6
+        lines = out_path.read_text().splitlines()
+        assert sorted(lines) == ['{"x": 2}', '{"x": 4}', '{"x": 6}']
+        if ordered:
+            assert lines == ['{"x": 2}', '{"x": 4}', '{"x": 6}']
+
+
+def _square(x):
+    return x * x
+
+
+def _cost(arg_):
+    return arg_[0] % 7
+
+
+def test_map_tqdm_keeps_input_order_with_costs():
+    args = [(x,) for x in range(50)]
+    expected = [x * x for x in range(50)]
+    assert map_with_pbar.map_tqdm(_square, args, pool_size=2) == expected
+    costs = [x % 5 for x in range(50)]
+    assert map_with_pbar.map_tqdm(_square, args, pool_size=2, costs=costs) == expected
+    outputs = map_with_pbar.map_tqdm(_square, args, pool_size=2, cost_func=_cost)
+    assert outputs == expected
+
+
+def _report(progress_queue, n):
+    reporter = map_with_pbar.ProgressReporter(progress_queue, report_interval=3600)
+    for _ in range(n):
+        reporter.task_done()
+
+
+def test_progress_reporter_sends_pending_tasks_when_the_worker_exits():
+    progress_queue = mp.Queue()
+    process = mp.Process(target=_report, args=(progress_queue, 3))
+    process.start()
+    assert progress_queue.get(timeout=30) == (process.pid, 3)
+    process.join()
+
+
+def test_map_tqdm_progress_total_with_worker_replacement(monkeypatch):
+    monkeypatch.setattr(map_with_pbar, "local_tqdm", _Bar)
+    args = [(x,) for x in range(20)]
+    outputs = map_with_pbar.map_tqdm(_square, args, pool_size=2, maxtasksperchild=3)
+    assert outputs == [x * x for x in range(20)]
+    assert _Bar.instances[-1].n == _Bar.instances[-1].total == 20
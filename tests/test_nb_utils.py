@@ -0,0 +1,154 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("IPython")
+
+from rpyutils.nb_utils import (  # noqa: E402
+    assets,
+    html_builder,
+    jquery_datatables,
+    pivottablejs,
+    render_cache,
+    sticky_borders,
+)
+
+INF = float("inf")
+NAN = float("nan")
+
+
+def _frame(n_rows):
+    return pd.DataFrame(
+        {
+            "x": [1.0, INF, -INF, NAN] * (n_rows // 4),
+            "o": ["a", INF, None, 1] * (n_rows // 4),
+        },
+        index=[NAN, 1.5, INF, 2.0] * (n_rows // 4),
+    )
+
+
+def test_json_payload_encodes_non_finite_values():
+    payload = json.loads(jquery_datatables.dataframe_json_payload(_frame(4)))
+    index, x, o = payload["data"]
+    assert index == [None, 1.5, "inf", 2.0]
+    assert x == [1.0, "inf", "-inf", None]
+    assert o == ["a", "inf", None, 1]
+    assert payload["columns"][1]["decimals"] == 2
+
+    payload = jquery_datatables.dataframe_json_payload(
+        _frame(4), html_float_fmt="{:.1e}"
+    )
+    assert json.loads(payload)["data"][1] == ["1.0e+00", "inf", "-inf", None]
+
+
+def test_large_fancy_table_with_non_finite_values():
+    df = _frame(jquery_datatables.JSON_PAYLOAD_MIN_ROWS)
+    table = jquery_datatables.fancy_table(df, cache=False, assets="cdn", payload="auto")
+    assert "&quot;inf&quot;" in table.data
+
+
+def test_large_fancy_table_pages_by_default():
+    df = _frame(jquery_datatables.JSON_PAYLOAD_MIN_ROWS)
+    table = jquery_datatables.fancy_table(df, cache=False, assets="cdn", max_rows=25)
+    assert "Rlfrtip" in table.data
+    assert "pageLength: 25" in table.data
+
+
+def test_pivot_json_payload_encodes_non_finite_values():
+    df = _frame(4).astype({"o": str})
+    payload = json.loads(
+        html_builder.build_html(
+            lambda fp: pivottablejs.write_pivot_json_payload(df, fp)
+        )
+    )
+    assert payload["data"][0] == [1.0, "inf", "-inf", None]
+
+
+def test_sticky_borders_show_with_non_finite_values():
+    table = sticky_borders.sticky_borders_show(_frame(8), cache=False)
+    assert "[null,1.5,&quot;inf&quot;,2.0," in table.data
+    assert "&quot;-inf&quot;" in table.data
+
+
+@pytest.mark.parametrize("mode", ["inline", "local"])
+def test_missing_assets_fail_before_writing(tmp_path, monkeypatch, mode):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("RPYUTILS_ASSET_DIR", raising=False)
+    assets._bundle.cache_clear()
+    path = tmp_path / "out" / "table.html"
+    with pytest.raises(RuntimeError, match="download_assets"):
+        jquery_datatables.fancy_table(
+            _frame(4), file=str(path), assets=mode, show=False, silent=True
+        )
+    assert not path.exists()
+
+
+def test_saved_table_is_streamed_and_shown_from_the_file(tmp_path, monkeypatch):
+    cache = render_cache.RenderCache()
+    monkeypatch.setattr(render_cache, "default_cache", cache)
+    path = tmp_path / "table.html"
+    shown = jquery_datatables.fancy_table(
+        _frame(8), file=str(path), assets="cdn", silent=True, cache=True
+    )
+    saved = path.read_text(encoding="utf8")
+    assert [html for html, _ in cache.entries.values()] == [saved]
+    assert saved.replace("&", "&amp;").replace('"', "&quot;") in shown.data
+
+
+def test_render_cache_counts_bytes_and_skips_large_documents():
+    cache = render_cache.RenderCache(max_bytes=10)
+    cache.put("a", "éééé")
+    assert cache.num_bytes == 8
+    cache.put("b", "xxxx")
+    assert list(cache.entries) == ["b"]
+
+    calls = list()
+    write = lambda fp: calls.append(fp.write("x" * 20))
+    assert cache.get_or_render("c", write, size_hint=20) is write
+    assert calls == [] and "c" not in cache.entries
+    assert cache.get_or_render("d", write, size_hint=5) == "x" * 20
+    assert "d" not in cache.entries
+
+
+def test_renderers_do_not_cache_by_default(monkeypatch):
+    cache = render_cache.RenderCache()
+    monkeypatch.setattr(render_cache, "default_cache", cache)
+    jquery_datatables.fancy_table(_frame(8), assets="cdn")
+    pivottablejs.pivot_ui(_frame(8).astype({"o": str}), assets="cdn")
+    sticky_borders.sticky_borders_show(_frame(8))
+    assert not cache.entries and cache.misses == 0
+
+
+def test_render_cache_size_comes_from_the_environment():
+    script = "from rpyutils.nb_utils import render_cache; print(render_cache.default_cache.max_bytes)"
+    env = {"PYTHONPATH": str(Path(render_cache.__file__).parents[2])}
+    env["RPYUTILS_RENDER_CACHE_BYTES"] = "1234"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    assert result.stdout.strip() == "1234"
+
+
+@pytest.mark.parametrize(
+    "index, kwargs",
+    [
+        (None, {}),
+        (None, {"max_rows": 20, "show_dimensions": True}),
+        (pd.MultiIndex.from_product([range(5), range(10)]), {}),
+        (pd.MultiIndex.from_product([range(5), range(10)]), {"sparsify": False}),
+    ],
+)
+def test_chunked_dataframe_html_equals_to_html(index, kwargs):
+    df = pd.DataFrame({"a": range(50), "b": [x / 3 for x in range(50)]}, index=index)
+    chunked = html_builder.build_html(
+        lambda fp: html_builder.write_dataframe_html(df, fp, chunk_rows=7, **kwargs)
+    )
+    assert chunked == df.to_html(**kwargs)
@@ -0,0 +1,14 @@
+import threading
+
+from rpyutils.r_utils import follow_json_lines
+
+
+def test_follow_reads_a_file_created_later_from_its_start(tmp_path):
+    path = tmp_path / "log.jsonl"
+    timer = threading.Timer(0.1, path.write_text, ['{"step": 1}\n{"step": 2}\n'])
+    timer.start()
+    try:
+        records = list(follow_json_lines(path, poll_interval=0.01, idle_timeout=0.5))
+    finally:
+        timer.join()
+    assert records == [{"step": 1}, {"step": 2}]
@@ -0,0 +1,26 @@
+import pytest
+
+from rpyutils import random_words
+
+
+@pytest.mark.parametrize("seed, suffix_digits", [(0, 0), (13, 0), (7, 1)])
+def test_name_generator_is_a_permutation_of_the_full_space(seed, suffix_digits):
+    gen = random_words.NameGenerator(seed, suffix_digits)
+    assert sorted(map(gen.permute, range(len(gen)))) == list(range(len(gen)))
+    assert len(set(gen.names())) == len(gen)
+
+
+def test_name_generator_is_reproducible_and_splits_by_index():
+    gen = random_words.NameGenerator(seed=3)
+    names = random_words.generate_unique(100, seed=3)
+    assert names == [gen[i] for i in range(100)]
+    assert random_words.generate_unique(40, seed=3, start=60) == names[60:]
+    assert [gen[i] for i in range(100)] != random_words.generate_unique(100, seed=4)
+
+
+def test_name_generator_rejects_out_of_range_indices():
+    gen = random_words.NameGenerator(suffix_digits=0)
+    with pytest.raises(IndexError):
+        gen[len(gen)]
+    with pytest.raises(IndexError):
+        gen[-1]
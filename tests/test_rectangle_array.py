@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from rpyutils.rectangle import Rectangle
+from rpyutils.rectangle_array import RectangleArray, np
+
+BACKENDS = [False] + ([True] if np is not None else [])
+
+
+def _rectangles(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        Rectangle(
+            rng.randint(1, 9), rng.randint(1, 9), rng.randint(-5, 5), rng.randint(-5, 5)
+        )
+        for _ in range(n)
+    ]
+
+
+def _as_tuples(rectangles):
+    return [(r.width, r.height, r.x, r.y) for r in rectangles]
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_rectangle_array_matches_rectangles(use_numpy):
+    rectangles = _rectangles(100)
+    boxes = RectangleArray.from_rectangles(rectangles, use_numpy=use_numpy)
+    assert len(boxes) == len(rectangles)
+    assert _as_tuples(boxes.to_rectangles()) == _as_tuples(rectangles)
+    assert list(boxes.areas()) == [r.get_area() for r in rectangles]
+    assert list(boxes.perimeters()) == [r.get_perimeter() for r in rectangles]
+    assert list(zip(*boxes.bounds())) == [r.get_bounds() for r in rectangles]
+    assert _as_tuples([boxes[3]]) == _as_tuples([rectangles[3]])
+    assert _as_tuples(boxes[10:20]) == _as_tuples(rectangles[10:20])
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+@pytest.mark.parametrize("key", ["area", "perimeter", "width", "height"])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_rectangle_array_sort_matches_sorted(use_numpy, key, reverse):
+    rectangles = _rectangles(100, seed=1)
+    boxes = RectangleArray.from_rectangles(rectangles, use_numpy=use_numpy)
+    key_funcs = {
+        "area": Rectangle.get_area,
+        "perimeter": Rectangle.get_perimeter,
+        "width": lambda r: r.width,
+        "height": lambda r: r.height,
+    }
+    expected = sorted(rectangles, key=key_funcs[key], reverse=reverse)
+    assert _as_tuples(boxes.sort(key, reverse)) == _as_tuples(expected)
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_rectangle_array_filter_and_take(use_numpy):
+    rectangles = _rectangles(50, seed=2)
+    boxes = RectangleArray.from_rectangles(rectangles, use_numpy=use_numpy)
+    mask = [r.get_area() > 20 for r in rectangles]
+    expected = [r for r, keep in zip(rectangles, mask) if keep]
+    assert _as_tuples(boxes.filter(mask)) == _as_tuples(expected)
+    assert _as_tuples(boxes.take([4, 0, 4])) == _as_tuples(
+        [rectangles[i] for i in (4, 0, 4)]
+    )
+
+
+def test_rectangle_array_rejects_columns_of_different_lengths():
+    with pytest.raises(ValueError):
+        RectangleArray([1, 2], [1], use_numpy=False)
@@ -0,0 +1,40 @@
+import math
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from rpyutils import rectangle_utils
+
+
+def test_sum_chunk_keeps_exact_types():
+    assert rectangle_utils._sum_chunk([Fraction(1, 3)] * 3) == 1
+    assert isinstance(rectangle_utils._sum_chunk([Fraction(1, 3)] * 3), Fraction)
+    assert rectangle_utils._sum_chunk([Decimal("0.1")] * 3) == Decimal("0.3")
+    assert rectangle_utils._sum_chunk([0.1] * 10) == 1.0
+
+
+def test_prod_numbers_of_long_int_lists_is_exact():
+    numbers = list(range(1, 40))
+    product = rectangle_utils.prod_numbers(numbers)
+    assert isinstance(product, int)
+    assert product == rectangle_utils.prod_numbers(numbers, method="math")
+
+
+def test_sum_numbers_of_long_fraction_lists_is_exact():
+    assert rectangle_utils.sum_numbers([Fraction(1, 7)] * 70) == 10
+
+
+def test_prod_numbers_auto_is_math_prod_for_floats():
+    numbers = [1.0 + i / 1000 for i in range(1000)]
+    assert rectangle_utils.prod_numbers(numbers) == math.prod(numbers)
+    assert rectangle_utils.prod_numbers(iter(numbers)) == math.prod(numbers)
+
+
+def test_sum_numbers_of_int_arrays_does_not_overflow():
+    np = pytest.importorskip("numpy")
+    numbers = np.full(4, 2**62, dtype=np.int64)
+    assert rectangle_utils.sum_numbers(numbers) == 2**64
+    assert rectangle_utils.sum_numbers(numbers, method="numpy") == 2**64
+    assert rectangle_utils.sum_numbers(np.arange(10)) == 45
+    assert rectangle_utils.sum_numbers(np.arange(0)) == 0
@@ -0,0 +1,84 @@
+import math
+import random
+
+import pytest
+
+from rpyutils.rectangle import Rectangle
+from rpyutils.spatial_index import RectangleIndex
+
+
+def _bounds(n, seed=0):
+    rng = random.Random(seed)
+    bounds = list()
+    for _ in range(n):
+        x, y = rng.randint(0, 100), rng.randint(0, 100)
+        bounds.append((x, y, x + rng.randint(0, 10), y + rng.randint(0, 10)))
+    return bounds
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _contains(outer, inner):
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[2] <= outer[2]
+        and inner[3] <= outer[3]
+    )
+
+
+def _distance(a, b):
+    dx = max(a[0] - b[2], b[0] - a[2], 0)
+    dy = max(a[1] - b[3], b[1] - a[3], 0)
+    return math.hypot(dx, dy)
+
+
+def _check_queries(index, items, rng):
+    for _ in range(50):
+        query = _bounds(1, seed=rng.random())[0]
+        assert sorted(index.intersects(query)) == sorted(
+            i for i, b in items.items() if _intersects(b, query)
+        )
+        assert sorted(index.within(query)) == sorted(
+            i for i, b in items.items() if _contains(query, b)
+        )
+        point = query[:2]
+        assert sorted(index.contains(point)) == sorted(
+            i for i, b in items.items() if _contains(b, point * 2)
+        )
+        nearest = index.nearest(query, k=5)
+        distances = sorted(_distance(b, query) for b in items.values())[:5]
+        assert [_distance(items[i], query) for i in nearest] == distances
+
+
+@pytest.mark.parametrize("max_entries", [2, 4, 16])
+def test_bulk_loaded_index_matches_brute_force(max_entries):
+    bounds = _bounds(500)
+    index = RectangleIndex.from_bounds(bounds, max_entries=max_entries)
+    assert len(index) == len(bounds)
+    _check_queries(index, dict(enumerate(bounds)), random.Random(1))
+
+
+@pytest.mark.parametrize("max_entries", [2, 4, 16])
+def test_index_matches_brute_force_after_inserts_and_deletes(max_entries):
+    rng = random.Random(2)
+    index = RectangleIndex.from_bounds(_bounds(100), max_entries=max_entries)
+    items = dict(enumerate(_bounds(100)))
+    for bounds in _bounds(300, seed=3):
+        items[index.insert(bounds)] = bounds
+    for item_id in rng.sample(sorted(items), 250):
+        index.delete(item_id)
+        del items[item_id]
+    assert len(index) == len(items)
+    _check_queries(index, items, rng)
+
+
+def test_index_from_rectangles_uses_their_bounds():
+    rectangles = [Rectangle(2, 1, x=0, y=0), Rectangle(1, 1, x=5, y=5)]
+    index = RectangleIndex.from_rectangles(rectangles)
+    assert index.intersects(Rectangle(1, 1, x=1, y=0)) == [0]
+    assert index.nearest((4, 4), k=1) == [1]
+    with pytest.raises(KeyError):
+        index.insert(Rectangle(1, 1), item_id=0)